@@ -2,4 +2,6 @@ float getHeading();
 void initCompass();
 float getMagX();
 float getMagY();
-void calibrateMag(void * pvParameters);
\ No newline at end of file
+void calibrateMag(void * pvParameters);
+void setMagFit(bool active, float offsetX, float offsetY, const float matrix[4], bool saveToPreferences = true);
+void clearMagFit(bool saveToPreferences = true);
\ No newline at end of file
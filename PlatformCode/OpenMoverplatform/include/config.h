@@ -21,4 +21,7 @@
 #define batteryADCPin 14
 #define MagCalibrationTime 20000
 #define MagCalibrationSpeed 20
-#define BTSerialBufferSize 512
\ No newline at end of file
+#define BTSerialBufferSize 512
+#define MaxStreamRate 50
+#define MaxSerialCommands 16
+#define PROTOCOL_VERSION 5
\ No newline at end of file
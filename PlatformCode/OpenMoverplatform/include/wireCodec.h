@@ -0,0 +1,32 @@
+#include <Arduino.h>
+
+// binary frames, see PlatformHelper/wirecodec.py for the layouts:
+// A5 5A | type u8 | seq u8 | length u16 | payload | CRC-16/CCITT-FALSE u16
+#define WIRE_VERSION 1
+#define WIRE_MAGIC0 0xA5
+#define WIRE_MAGIC1 0x5A
+#define WIRE_HEADER_SIZE 6
+#define WIRE_MAX_PAYLOAD 512
+#define WIRE_TYPE_TABLE 1
+#define WIRE_TYPE_COORDINATES 5
+#define WIRE_TYPE_STATUS 6
+#define WIRE_TYPE_MAG 9
+#define WIRE_ROUTE_HEADER_SIZE 9
+#define WIRE_STATUS_SIZE 42
+#define WIRE_MAG_SIZE 24
+
+uint16_t wireCrc16(const uint8_t* data, size_t len, uint16_t crc = 0xFFFF);
+bool wireReadFrame(Stream& stream, uint8_t& type, uint8_t& seq, uint8_t* payload, uint16_t& len);
+void wireWriteFrame(Stream& stream, uint8_t type, uint8_t seq, const uint8_t* payload, uint16_t len);
+
+bool wireDecodeRoute(const uint8_t* payload, uint16_t len, double* table, int tableSize);
+uint16_t wireEncodeTable(const double* table, int tableSize, uint8_t* out);
+uint32_t wireRouteHash(const double* table, int tableSize);
+
+void wirePutU8(uint8_t*& p, uint8_t value);
+void wirePutU16(uint8_t*& p, uint16_t value);
+void wirePutU32(uint8_t*& p, uint32_t value);
+void wirePutI16(uint8_t*& p, int16_t value);
+void wirePutI32(uint8_t*& p, int32_t value);
+void wirePutF32(uint8_t*& p, float value);
+void wirePutE7(uint8_t*& p, double degrees);
@@ -6,6 +6,7 @@
 #include <Wire.h>
 #include <Adafruit_Sensor.h>
 #include <Adafruit_HMC5883_U.h>
+#include "Preferences.h"
 
 Adafruit_HMC5883_Unified mag = Adafruit_HMC5883_Unified(0);
 
@@ -16,11 +17,51 @@ double MagXMin = 0;
 double MagYMax = 0;
 double MagYMin = 0;
 
+// hard/soft-iron fit from magcal.py (intent 13), replaces the min/max centre when active
+bool MagFitActive = false;
+float MagOffsetX = 0;
+float MagOffsetY = 0;
+float MagSoftIron[4] = {1, 0, 0, 1}; // row major 2x2
+
+void setMagFit(bool active, float offsetX, float offsetY, const float matrix[4], bool saveToPreferences){
+    MagFitActive = active;
+    MagOffsetX = offsetX;
+    MagOffsetY = offsetY;
+    for(int i = 0; i < 4; i++){
+        MagSoftIron[i] = matrix[i];
+    }
+    if (saveToPreferences) {
+        Preferences preferences;
+        preferences.begin("botConfig", false);
+        preferences.putBool("magFit", MagFitActive);
+        preferences.putFloat("magOffX", MagOffsetX);
+        preferences.putFloat("magOffY", MagOffsetY);
+        preferences.putFloat("magW0", MagSoftIron[0]);
+        preferences.putFloat("magW1", MagSoftIron[1]);
+        preferences.putFloat("magW2", MagSoftIron[2]);
+        preferences.putFloat("magW3", MagSoftIron[3]);
+        preferences.end();
+    }
+}
+
+void clearMagFit(bool saveToPreferences){
+    const float identity[4] = {1, 0, 0, 1};
+    setMagFit(false, 0, 0, identity, saveToPreferences);
+}
+
 float getHeading(){
 sensors_event_t event; 
     mag.getEvent(&event);
     
-    float heading = atan2(-(event.magnetic.x - (MagXMin + ((MagXMax - MagXMin)/2))),-(event.magnetic.y - (MagYMin + ((MagYMax - MagYMin)/2))));
+    float dx = event.magnetic.x - (MagXMin + ((MagXMax - MagXMin)/2));
+    float dy = event.magnetic.y - (MagYMin + ((MagYMax - MagYMin)/2));
+    if(MagFitActive){
+        float x = event.magnetic.x - MagOffsetX;
+        float y = event.magnetic.y - MagOffsetY;
+        dx = MagSoftIron[0] * x + MagSoftIron[1] * y;
+        dy = MagSoftIron[2] * x + MagSoftIron[3] * y;
+    }
+    float heading = atan2(-dx, -dy);
     
     if(heading < 0)
         heading += 2*PI;
@@ -51,6 +92,7 @@ void initCompass(){
 
 void calibrateMag(void * pvParameters){
     motorHandled = true;
+    clearMagFit(); // a new min/max calibration supersedes a stored fit
     sensors_event_t event; 
     mag.getEvent(&event);
     MagXMax = event.magnetic.x + 0.1;
@@ -18,6 +18,11 @@ void setup(){
   MagXMax = preferences.getDouble("magXMax", 0.0);
   MagYMin = preferences.getDouble("magYMin", 0.0);
   MagYMax = preferences.getDouble("magYMax", 0.0);
+  const float magSoftIron[4] = {
+    preferences.getFloat("magW0", 1.0), preferences.getFloat("magW1", 0.0),
+    preferences.getFloat("magW2", 0.0), preferences.getFloat("magW3", 1.0)};
+  setMagFit(preferences.getBool("magFit", false), preferences.getFloat("magOffX", 0.0),
+            preferences.getFloat("magOffY", 0.0), magSoftIron, false);
   preferences.end();
   vTaskDelay(10000); // time for the jtag probe to connect
   initCompass();
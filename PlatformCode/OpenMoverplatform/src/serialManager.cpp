@@ -9,6 +9,7 @@
 #include "TinyGPSPlus.h"
 #include "goTo.h"
 #include "compass.h"
+#include "wireCodec.h"
 
 #ifdef __ESP32D0WDQ6__
     #include "BluetoothSerial.h"
@@ -27,128 +28,282 @@ extern double MagXMin;
 extern double MagXMax;
 extern double MagYMax;
 extern double MagYMin;
+extern bool MagFitActive;
+extern float MagOffsetX;
+extern float MagOffsetY;
+extern float MagSoftIron[4];
+
+// intent 6 reply on the USB serial port, also used for the pushed stream (id 0)
+static void sendStatus(bool binaryWire, bool directMotorControlSerial, uint32_t id){
+    if(binaryWire){
+        uint8_t payload[WIRE_STATUS_SIZE];
+        uint8_t* p = payload;
+        wirePutF32(p, batteryVoltage());
+        wirePutU8(p, min(gps.satellites.value(), (uint32_t)255));
+        wirePutU8(p, gps.location.isValid() | directMotorControlSerial << 1 | motorHandled << 2);
+        wirePutU32(p, gps.location.age());
+        wirePutE7(p, gps.location.lat());
+        wirePutE7(p, gps.location.lng());
+        wirePutF32(p, getHeading());
+        wirePutF32(p, MagXMin);
+        wirePutF32(p, MagXMax);
+        wirePutF32(p, MagYMin);
+        wirePutF32(p, MagYMax);
+        wirePutI16(p, getMotorL());
+        wirePutI16(p, getMotorR());
+        wireWriteFrame(Serial, WIRE_TYPE_STATUS, id & 0xFF, payload, WIRE_STATUS_SIZE);
+    }
+    else{
+        JsonDocument doc;
+        doc["batteryVoltage"] = batteryVoltage();
+        doc["numSats"] = gps.satellites.value();
+        doc["fix"] = gps.location.isValid();
+        doc["locationAge"] = gps.location.age();
+        doc["lat"] = gps.location.lat();
+        doc["lon"] = gps.location.lng();
+        doc["heading"] = getHeading();
+        doc["serialControl"] = directMotorControlSerial;
+        doc["motorHandled"] = motorHandled;
+        doc["magXMin"] = MagXMin;
+        doc["magXMax"] = MagXMax;
+        doc["magYMin"] = MagYMin;
+        doc["magYMax"] = MagYMax;
+        doc["setPointL"] = getMotorL();
+        doc["setPointR"] = getMotorR();
+        doc["protocol"] = PROTOCOL_VERSION;
+        if(id){
+            doc["id"] = id;
+        }
+        serializeJson(doc, Serial);
+    }
+}
+
+// intent 9 reply on the USB serial port, also used for the pushed stream (id 0)
+static void sendMag(bool binaryWire, uint32_t id){
+    if(binaryWire){
+        uint8_t payload[WIRE_MAG_SIZE];
+        uint8_t* p = payload;
+        wirePutF32(p, MagXMin);
+        wirePutF32(p, MagXMax);
+        wirePutF32(p, MagYMin);
+        wirePutF32(p, MagYMax);
+        wirePutF32(p, getMagX());
+        wirePutF32(p, getMagY());
+        wireWriteFrame(Serial, WIRE_TYPE_MAG, id & 0xFF, payload, WIRE_MAG_SIZE);
+    }
+    else{
+        JsonDocument doc;
+        doc["magXMin"] = MagXMin;
+        doc["magXMax"] = MagXMax;
+        doc["magYMin"] = MagYMin;
+        doc["magYMax"] = MagYMax;
+        doc["magX"] = getMagX();
+        doc["magY"] = getMagY();
+        if(id){
+            doc["id"] = id;
+        }
+        serializeJson(doc, Serial);
+    }
+}
 
 void serialManager(void * pvParameters){
     Serial.begin(115200);
     Serial2.begin(GPSBaud, SERIAL_8N1, 16, 15);
 
     bool directMotorControlSerial = false;
+    bool binaryWire = false; // replies to intents 1, 6 and 9 as binary frames, set by intent 11
+    unsigned long statusPeriod = 0; // ms between pushed intent 6 replies, 0 = off, set by intent 12
+    unsigned long magPeriod = 0;    // same for intent 9
+    unsigned long lastStatusPush = 0;
+    unsigned long lastMagPush = 0;
     unsigned long lastGPS = millis();
     SerialBT.begin("OpenMoverPlatformBTSerial");
-    double coordinateTable[100];
+    double coordinateTable[100] = {0};
     while (true){
-        if(Serial.available()){
-            JsonDocument doc;
-            DeserializationError error = deserializeJson(doc, Serial);
-            if(error){
-                Serial.print("deserializeJson() failed: ");
-                Serial.println(error.f_str());
-                emergencyStop();
+        // handle every queued command (up to MaxSerialCommands), so pipelined
+        // requests are not paced by the loop delay
+        for(int handled = 0; handled < MaxSerialCommands && Serial.available(); handled++){
+            if(Serial.peek() == WIRE_MAGIC0){
+                uint8_t type;
+                uint8_t seq;
+                uint16_t len;
+                uint8_t payload[WIRE_MAX_PAYLOAD];
+                bool valid = wireReadFrame(Serial, type, seq, payload, len);
+                if(valid && type == WIRE_TYPE_COORDINATES){
+                    valid = wireDecodeRoute(payload, len, coordinateTable, 100);
+                }
+                if(!valid){
+                    Serial.println("wireReadFrame() failed");
+                    emergencyStop();
+                }
             }
 
-            int messageIntention = doc["intent"];
+            else{
+                JsonDocument doc;
+                DeserializationError error = deserializeJson(doc, Serial);
+                if(error){
+                    Serial.print("deserializeJson() failed: ");
+                    Serial.println(error.f_str());
+                    emergencyStop();
+                }
 
-            if(messageIntention == 5){ 
-                copyArray(doc["coordinates"], coordinateTable);
-            }
+                int messageIntention = doc["intent"];
+                // optional request id, echoed in the reply (binary frames: low byte in seq)
+                uint32_t requestId = doc["id"].as<uint32_t>();
 
-            else if(messageIntention == 1){
-                JsonDocument doc;
-                copyArray(coordinateTable, doc["coordinates"]);
-                serializeJson(doc, Serial);
-            }
+                if(messageIntention == 5){ 
+                    copyArray(doc["coordinates"], coordinateTable);
+                }
 
-            else if(messageIntention == 2){
-                if(!motorHandled){
-                    motorHandled = true;
-                    motorControlHandle = NULL;
-                    if(!xTaskCreatePinnedToCore(wpManagerExec, "wpManagerExec", 10000,(void *) coordinateTable, 1, &motorControlHandle, 1)){
-                        motorHandled = false;
+                else if(messageIntention == 1){
+                    if(binaryWire){
+                        uint8_t payload[WIRE_MAX_PAYLOAD];
+                        uint16_t len = wireEncodeTable(coordinateTable, 100, payload);
+                        wireWriteFrame(Serial, WIRE_TYPE_TABLE, requestId & 0xFF, payload, len);
+                    }
+                    else{
+                        JsonDocument doc;
+                        copyArray(coordinateTable, doc["coordinates"]);
+                        if(requestId){
+                            doc["id"] = requestId;
+                        }
+                        serializeJson(doc, Serial);
                     }
                 }
-            }
 
-            else if(messageIntention == 3){
-                if(motorControlHandle != NULL){
-                    vTaskDelete(motorControlHandle);
-                    motorControlHandle = NULL;
+                else if(messageIntention == 2){
+                    if(!motorHandled){
+                        // the task gets its own copy: commands handled before it runs may change the table
+                        double* table = new double[100];
+                        memcpy(table, coordinateTable, sizeof(coordinateTable));
+                        motorHandled = true;
+                        motorControlHandle = NULL;
+                        if(!xTaskCreatePinnedToCore(wpManagerExec, "wpManagerExec", 10000,(void *) table, 1, &motorControlHandle, 1)){
+                            motorHandled = false;
+                            delete[] table; // Free memory if task creation fails
+                        }
+                    }
                 }
-                motorHandled = doc["setStatus"].as<bool>();
-                directMotorControlSerial = doc["setStatus"].as<bool>();
-                setMotorL(0);
-                setMotorR(0);
-            }
 
-            else if(messageIntention == 4){
-                if(motorHandled && directMotorControlSerial){
-                    setMotorL(doc["leftPWM"].as<int>());
-                    setMotorR(doc["rightPWM"].as<int>());
+                else if(messageIntention == 3){
+                    if(motorControlHandle != NULL){
+                        vTaskDelete(motorControlHandle);
+                        motorControlHandle = NULL;
+                    }
+                    motorHandled = doc["setStatus"].as<bool>();
+                    directMotorControlSerial = doc["setStatus"].as<bool>();
+                    setMotorL(0);
+                    setMotorR(0);
                 }
-            }
 
-            else if(messageIntention == 6){
-                JsonDocument doc;
-                doc["batteryVoltage"] = batteryVoltage();
-                doc["numSats"] = gps.satellites.value();
-                doc["fix"] = gps.location.isValid();
-                doc["locationAge"] = gps.location.age();
-                doc["lat"] = gps.location.lat();
-                doc["lon"] = gps.location.lng();
-                doc["heading"] = getHeading();
-                doc["serialControl"] = directMotorControlSerial;
-                doc["motorHandled"] = motorHandled;
-                doc["magXMin"] = MagXMin;
-                doc["magXMax"] = MagXMax;
-                doc["magYMin"] = MagYMin;
-                doc["magYMax"] = MagYMax;
-                doc["setPointL"] = getMotorL();
-                doc["setPointR"] = getMotorR();
-                serializeJson(doc, Serial);
-            }
+                else if(messageIntention == 4){
+                    if(motorHandled && directMotorControlSerial){
+                        setMotorL(doc["leftPWM"].as<int>());
+                        setMotorR(doc["rightPWM"].as<int>());
+                    }
+                }
 
-            else if(messageIntention == 7){
-                double* params = new double[4]; // Dynamically allocate memory for params
-                params[0] = doc["lat"].as<double>();
-                params[1] = doc["lon"].as<double>();
-                params[2] = doc["speed"].as<double>();
-                params[3] = doc["range"].as<double>();
-                if (!motorHandled){
-                    motorHandled = true;
-                    motorControlHandle = NULL;
-                    if(!xTaskCreatePinnedToCore(executePlainGoTo, "executePlainGoTo", 10000, (void *) params, 1, &motorControlHandle, 1)){
-                        motorHandled = false;
-                        delete[] params; // Free memory if task creation fails
+                else if(messageIntention == 6){
+                    sendStatus(binaryWire, directMotorControlSerial, requestId);
+                }
+
+                else if(messageIntention == 7){
+                    double* params = new double[4]; // Dynamically allocate memory for params
+                    params[0] = doc["lat"].as<double>();
+                    params[1] = doc["lon"].as<double>();
+                    params[2] = doc["speed"].as<double>();
+                    params[3] = doc["range"].as<double>();
+                    if (!motorHandled){
+                        motorHandled = true;
+                        motorControlHandle = NULL;
+                        if(!xTaskCreatePinnedToCore(executePlainGoTo, "executePlainGoTo", 10000, (void *) params, 1, &motorControlHandle, 1)){
+                            motorHandled = false;
+                            delete[] params; // Free memory if task creation fails
+                        }
                     }
                 }
-            }
 
-            else if (messageIntention == 8) {
-                if (!motorHandled){
-                    motorHandled = true;
-                    motorControlHandle = NULL;
-                    if(!xTaskCreatePinnedToCore(calibrateMag, "calibrateCompass", 10000, NULL, 1, &motorControlHandle, 1)){
-                        motorHandled = false;
+                else if (messageIntention == 8) {
+                    if (!motorHandled){
+                        motorHandled = true;
+                        motorControlHandle = NULL;
+                        if(!xTaskCreatePinnedToCore(calibrateMag, "calibrateCompass", 10000, NULL, 1, &motorControlHandle, 1)){
+                            motorHandled = false;
+                        }
                     }
                 }
-            }
 
-            else if (messageIntention == 9) {
-                JsonDocument doc;
-                doc["magXMin"] = MagXMin;
-                doc["magXMax"] = MagXMax;
-                doc["magYMin"] = MagYMin;
-                doc["magYMax"] = MagYMax;
-                doc["magX"] = getMagX();
-                doc["magY"] = getMagY();
-                serializeJson(doc, Serial);
-            }
+                else if (messageIntention == 9) {
+                    sendMag(binaryWire, requestId);
+                }
 
-            else if (messageIntention == 10) {
-                setMotorBias(doc["biasL"].as<float>(), doc["biasR"].as<float>());
-            }
+                else if (messageIntention == 10) {
+                    setMotorBias(doc["biasL"].as<float>(), doc["biasR"].as<float>());
+                }
 
-            else{
-                emergencyStop();
+                else if (messageIntention == 11) {
+                    binaryWire = doc["wire"].as<int>() == WIRE_VERSION;
+                    JsonDocument doc;
+                    doc["wire"] = binaryWire ? WIRE_VERSION : 0;
+                    if(requestId){
+                        doc["id"] = requestId;
+                    }
+                    serializeJson(doc, Serial);
+                }
+
+                else if (messageIntention == 12) {
+                    float rate = constrain(doc["rate"].as<float>(), 0.0f, (float)MaxStreamRate);
+                    unsigned long period = rate > 0 ? (unsigned long)(1000.0f / rate) : 0;
+                    if(doc["stream"].as<int>() == 6){
+                        statusPeriod = period;
+                    }
+                    else if(doc["stream"].as<int>() == 9){
+                        magPeriod = period;
+                    }
+                }
+
+                else if (messageIntention == 13) {
+                    if(doc["reset"].as<bool>()){
+                        clearMagFit();
+                    }
+                    else if(doc["matrix"].is<JsonArrayConst>() && doc["matrix"].size() == 4){
+                        float matrix[4];
+                        copyArray(doc["matrix"], matrix);
+                        setMagFit(true, doc["offsetX"].as<float>(), doc["offsetY"].as<float>(), matrix);
+                    }
+                    JsonDocument doc;
+                    doc["magFit"] = MagFitActive;
+                    doc["offsetX"] = MagOffsetX;
+                    doc["offsetY"] = MagOffsetY;
+                    copyArray(MagSoftIron, doc["matrix"].to<JsonArray>());
+                    if(requestId){
+                        doc["id"] = requestId;
+                    }
+                    serializeJson(doc, Serial);
+                }
+
+                else if (messageIntention == 14) {
+                    // fingerprint of the stored route; speed / range, if given, replace its header
+                    if(doc["speed"].is<double>()){
+                        coordinateTable[1] = doc["speed"].as<double>();
+                    }
+                    if(doc["range"].is<double>()){
+                        coordinateTable[2] = doc["range"].as<double>();
+                    }
+                    JsonDocument doc;
+                    doc["routeHash"] = wireRouteHash(coordinateTable, 100);
+                    doc["count"] = (int)coordinateTable[0];
+                    doc["speed"] = coordinateTable[1];
+                    doc["range"] = coordinateTable[2];
+                    if(requestId){
+                        doc["id"] = requestId;
+                    }
+                    serializeJson(doc, Serial);
+                }
+
+                else{
+                    emergencyStop();
+                }
             }
         }
         
@@ -191,10 +346,14 @@ void serialManager(void * pvParameters){
 
             else if(messageIntention == 2){
                 if(!motorHandled){
+                    // the task gets its own copy: commands handled before it runs may change the table
+                    double* table = new double[100];
+                    memcpy(table, coordinateTable, sizeof(coordinateTable));
                     motorHandled = true;
                     motorControlHandle = NULL;
-                    if(!xTaskCreatePinnedToCore(wpManagerExec, "wpManagerExec", 10000,(void *) coordinateTable, 1, &motorControlHandle, 1)){
+                    if(!xTaskCreatePinnedToCore(wpManagerExec, "wpManagerExec", 10000,(void *) table, 1, &motorControlHandle, 1)){
                         motorHandled = false;
+                        delete[] table; // Free memory if task creation fails
                     }
                 }
             }
@@ -293,6 +452,22 @@ void serialManager(void * pvParameters){
                 gps.encode(Serial2.read());
             }
         }
-        vTaskDelay(50/portTICK_PERIOD_MS);
+        // pushed streams (intent 12); sleep less than 50 ms when one is due sooner
+        unsigned long loopDelay = 50;
+        if(statusPeriod){
+            if(millis() - lastStatusPush >= statusPeriod){
+                lastStatusPush = millis();
+                sendStatus(binaryWire, directMotorControlSerial, 0);
+            }
+            loopDelay = min(loopDelay, statusPeriod - (millis() - lastStatusPush));
+        }
+        if(magPeriod){
+            if(millis() - lastMagPush >= magPeriod){
+                lastMagPush = millis();
+                sendMag(binaryWire, 0);
+            }
+            loopDelay = min(loopDelay, magPeriod - (millis() - lastMagPush));
+        }
+        vTaskDelay(max(loopDelay, 1UL)/portTICK_PERIOD_MS);
     }
 }
\ No newline at end of file
@@ -0,0 +1,143 @@
+#include <Arduino.h>
+#include "wireCodec.h"
+
+// the ESP32 is little endian like the wire format, so values are copied as is
+
+uint16_t wireCrc16(const uint8_t* data, size_t len, uint16_t crc){
+    for(size_t i = 0; i < len; i++){
+        crc ^= (uint16_t)data[i] << 8;
+        for(int bit = 0; bit < 8; bit++){
+            crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+        }
+    }
+    return crc;
+}
+
+bool wireReadFrame(Stream& stream, uint8_t& type, uint8_t& seq, uint8_t* payload, uint16_t& len){
+    uint8_t header[WIRE_HEADER_SIZE];
+    uint8_t crc[2];
+    if(stream.readBytes(header, WIRE_HEADER_SIZE) != WIRE_HEADER_SIZE){
+        return false;
+    }
+    if(header[0] != WIRE_MAGIC0 || header[1] != WIRE_MAGIC1){
+        return false;
+    }
+    type = header[2];
+    seq = header[3];
+    len = header[4] | (header[5] << 8);
+    if(len > WIRE_MAX_PAYLOAD){
+        return false;
+    }
+    if(stream.readBytes(payload, len) != len || stream.readBytes(crc, 2) != 2){
+        return false;
+    }
+    uint16_t expected = wireCrc16(payload, len, wireCrc16(header + 2, WIRE_HEADER_SIZE - 2));
+    return expected == (crc[0] | (crc[1] << 8));
+}
+
+void wireWriteFrame(Stream& stream, uint8_t type, uint8_t seq, const uint8_t* payload, uint16_t len){
+    uint8_t header[WIRE_HEADER_SIZE] = {WIRE_MAGIC0, WIRE_MAGIC1, type, seq, (uint8_t)(len & 0xFF), (uint8_t)(len >> 8)};
+    uint16_t crc = wireCrc16(payload, len, wireCrc16(header + 2, WIRE_HEADER_SIZE - 2));
+    uint8_t crcBytes[2] = {(uint8_t)(crc & 0xFF), (uint8_t)(crc >> 8)};
+    stream.write(header, WIRE_HEADER_SIZE);
+    stream.write(payload, len);
+    stream.write(crcBytes, 2);
+}
+
+static int32_t getI32(const uint8_t*& p){
+    int32_t value;
+    memcpy(&value, p, 4);
+    p += 4;
+    return value;
+}
+
+static float getF32(const uint8_t*& p){
+    float value;
+    memcpy(&value, p, 4);
+    p += 4;
+    return value;
+}
+
+bool wireDecodeRoute(const uint8_t* payload, uint16_t len, double* table, int tableSize){
+    if(len < WIRE_ROUTE_HEADER_SIZE){
+        return false;
+    }
+    const uint8_t* p = payload;
+    int count = *p++;
+    if(len != WIRE_ROUTE_HEADER_SIZE + 8 * count || 3 + 2 * count > tableSize){
+        return false;
+    }
+    table[0] = count;
+    table[1] = getF32(p);
+    table[2] = getF32(p);
+    for(int i = 0; i < 2 * count; i++){
+        table[3 + i] = getI32(p) / 1e7;
+    }
+    return true;
+}
+
+static uint32_t fnv1a(uint32_t hash, int32_t value){
+    for(int i = 0; i < 4; i++){
+        hash ^= (uint8_t)(value >> (8 * i));
+        hash *= 16777619UL;
+    }
+    return hash;
+}
+
+// FNV-1a over the little-endian int32 count and E7 pairs of the stored route;
+// speed and range are left out so they can be changed without a new upload
+uint32_t wireRouteHash(const double* table, int tableSize){
+    int count = (int)table[0];
+    int pairs = (count >= 0 && 3 + 2 * count <= tableSize) ? count : 0;
+    uint32_t hash = fnv1a(2166136261UL, count);
+    for(int i = 0; i < 2 * pairs; i++){
+        hash = fnv1a(hash, (int32_t)lround(table[3 + i] * 1e7));
+    }
+    return hash;
+}
+
+uint16_t wireEncodeTable(const double* table, int tableSize, uint8_t* out){
+    uint8_t* p = out;
+    int count = (int)table[0];
+    int pairs = (count >= 0 && 3 + 2 * count <= tableSize) ? count : 0;
+    wirePutU8(p, constrain(count, 0, 255));
+    wirePutF32(p, table[1]);
+    wirePutF32(p, table[2]);
+    for(int i = 0; i < 2 * pairs; i++){
+        wirePutE7(p, table[3 + i]);
+    }
+    return p - out;
+}
+
+void wirePutU8(uint8_t*& p, uint8_t value){
+    *p++ = value;
+}
+
+void wirePutU16(uint8_t*& p, uint16_t value){
+    memcpy(p, &value, 2);
+    p += 2;
+}
+
+void wirePutU32(uint8_t*& p, uint32_t value){
+    memcpy(p, &value, 4);
+    p += 4;
+}
+
+void wirePutI16(uint8_t*& p, int16_t value){
+    memcpy(p, &value, 2);
+    p += 2;
+}
+
+void wirePutI32(uint8_t*& p, int32_t value){
+    memcpy(p, &value, 4);
+    p += 4;
+}
+
+void wirePutF32(uint8_t*& p, float value){
+    memcpy(p, &value, 4);
+    p += 4;
+}
+
+void wirePutE7(uint8_t*& p, double degrees){
+    wirePutI32(p, (int32_t)lround(degrees * 1e7));
+}
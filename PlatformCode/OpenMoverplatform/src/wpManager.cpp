@@ -12,15 +12,8 @@ extern TinyGPSPlus gps;
 void wpManagerExec(void * pvParameters){
     motorHandled = true;
 
-    // Assuming pvParameters is a pointer to an array of doubles and the size is known
-    const int coordinateCount = 100; // Replace with the actual size of the array
-    double* inputCoordinates = (double*)pvParameters;
-    double* coordinateTable = new double[coordinateCount];
-
-    // Copy data from pvParameters to coordinateTable
-    for (int i = 0; i < coordinateCount; i++) {
-        coordinateTable[i] = inputCoordinates[i];
-    }
+    // pvParameters is a copy of the 100-entry coordinate table made for this task, freed here
+    double* coordinateTable = (double*)pvParameters;
 
     //coordinate table will look like this: [coordinateAmount, speed, range, lon1, lat1, lon2, lat2, ...] this code will go through the array and got to them one by one
     // The first three elements are coordinateAmount, speed, and range
@@ -37,6 +30,6 @@ void wpManagerExec(void * pvParameters){
             goTo(lat, lon, speed, range);
         }
     }
-    // Perform operations with coordinateTable here
+    delete[] coordinateTable;
     endMotorTask(); // Call the function to end the motor task
 }
\ No newline at end of file
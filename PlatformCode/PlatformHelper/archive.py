@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""Columnar telemetry archive with a sparse time index.
+
+An archive is a directory with one sub-directory per reply kind (`status`
+for intent 6, `mag` for intent 9). Each kind holds segments; a segment is
+a directory of `.npy` files, one fixed-dtype column per field plus the
+receive time `t` (seconds since the epoch), sorted by `t`. Next to `t.npy`
+every segment keeps `t.idx.npy`, every `INDEX_STRIDE`-th timestamp, and
+`manifest.json` records each segment's row count and time range.
+
+A time-range query skips segments outside the range, binary-searches the
+small sparse index, and only then memory-maps the columns and slices the
+matching rows, so it reads just the pages holding those rows.
+
+    python archive.py convert week.archive logs/*.json logs/*.jsonl
+    python archive.py info week.archive
+    python archive.py query week.archive mag --start 2024-12-01T10:00 --end 2024-12-01T11:00
+
+`convert` reads the old `json.dump` logs (a JSON array per file) as well as
+`recorder` JSON Lines files, one process per file.
+"""
+import datetime
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from transport import classify_reply
+
+INDEX_STRIDE = 1024
+SEGMENT_ROWS = 1 << 18
+
+_MAG_COLUMNS = [
+    ("magXMin", "f4"), ("magXMax", "f4"), ("magYMin", "f4"), ("magYMax", "f4"),
+]
+SCHEMAS = {
+    "status": [
+        ("t", "f8"), ("batteryVoltage", "f4"), ("numSats", "u1"), ("fix", "?"),
+        ("locationAge", "u4"), ("lat", "f8"), ("lon", "f8"), ("heading", "f4"),
+        ("serialControl", "?"), ("motorHandled", "?"),
+    ] + _MAG_COLUMNS + [("setPointL", "i2"), ("setPointR", "i2")],
+    "mag": [("t", "f8")] + _MAG_COLUMNS + [("magX", "f4"), ("magY", "f4")],
+}
+KINDS = {6: "status", 9: "mag"}
+
+
+def parse_time(value):
+    """Seconds since the epoch from a number or an ISO 8601 string (UTC if naive)."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    stamp = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=datetime.timezone.utc)
+    return stamp.timestamp()
+
+
+def _record_time(record, default):
+    if "_t" in record:
+        return float(record["_t"])
+    if "_ts" in record:
+        try:
+            return parse_time(record["_ts"])
+        except ValueError:
+            pass
+    return default
+
+
+def _fill(dtype):
+    return np.nan if np.dtype(dtype).kind == "f" else 0
+
+
+def _columns(kind, records):
+    """Fixed-dtype columns for a list of records, sorted by time."""
+    columns = {}
+    for name, dtype in SCHEMAS[kind]:
+        fill = _fill(dtype)
+        values = [r.get(name) for r in records]
+        columns[name] = np.array([v if isinstance(v, (int, float)) else fill for v in values], dtype=dtype)
+    order = np.argsort(columns["t"], kind="stable")
+    return {name: column[order] for name, column in columns.items()}
+
+
+def load_records(path):
+    """Records of a JSON array log or a JSON Lines recording."""
+    with open(path, encoding="utf-8") as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head == "[":
+            records = json.load(f)
+        else:
+            records = []
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return [r for r in records if isinstance(r, dict)]
+
+
+def write_segment(directory, columns):
+    """Write one segment of sorted columns; returns its manifest entry."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, column in columns.items():
+        np.save(directory / f"{name}.npy", column)
+    t = columns["t"]
+    np.save(directory / "t.idx.npy", t[::INDEX_STRIDE])
+    return {"name": directory.name, "rows": int(len(t)),
+            "t_min": float(t[0]) if len(t) else None, "t_max": float(t[-1]) if len(t) else None}
+
+
+def _convert_file(archive, number, path):
+    """Worker: convert one log file into segments. Returns (kind, entry) pairs."""
+    records = load_records(path)
+    default_time = os.path.getmtime(path)
+    by_kind = {kind: [] for kind in SCHEMAS}
+    for record in records:
+        kind = KINDS.get(classify_reply(record))
+        if kind is not None:
+            record["t"] = _record_time(record, default_time)
+            by_kind[kind].append(record)
+
+    entries = []
+    for kind, rows in by_kind.items():
+        for part, start in enumerate(range(0, len(rows), SEGMENT_ROWS)):
+            columns = _columns(kind, rows[start:start + SEGMENT_ROWS])
+            name = f"{number:06d}-{part:03d}-{Path(path).stem}"
+            entries.append((kind, write_segment(Path(archive) / kind / name, columns)))
+    return entries
+
+
+def convert(paths, archive, workers=None):
+    """Add JSON / JSON Lines log files to `archive` using a process pool.
+
+    Returns the number of rows added per kind.
+    """
+    archive = Path(archive)
+    paths = [str(p) for p in paths]
+    manifests = {kind: _read_manifest(archive, kind) for kind in SCHEMAS}
+    first = max([int(s["name"].split("-")[0]) + 1 for m in manifests.values() for s in m["segments"]],
+                default=0)
+    added = {kind: 0 for kind in SCHEMAS}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_convert_file, str(archive), first + i, p) for i, p in enumerate(paths)]
+        for future in futures:
+            for kind, entry in future.result():
+                manifests[kind]["segments"].append(entry)
+                added[kind] += entry["rows"]
+    for kind, manifest in manifests.items():
+        if manifest["segments"]:
+            _write_manifest(archive, kind, manifest)
+    return added
+
+
+def _read_manifest(archive, kind):
+    try:
+        return json.loads((Path(archive) / kind / "manifest.json").read_text(encoding="utf-8"))
+    except OSError:
+        return {"fields": dict(SCHEMAS[kind]), "segments": []}
+
+
+def _write_manifest(archive, kind, manifest):
+    path = Path(archive) / kind / "manifest.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+    tmp.replace(path)
+
+
+class Archive:
+    """Read access to an archive directory."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.manifests = {kind: _read_manifest(self.path, kind) for kind in SCHEMAS}
+
+    @property
+    def kinds(self):
+        return [kind for kind, m in self.manifests.items() if m["segments"]]
+
+    def rows(self, kind):
+        return sum(s["rows"] for s in self.manifests[kind]["segments"])
+
+    def time_range(self, kind):
+        segments = [s for s in self.manifests[kind]["segments"] if s["rows"]]
+        if not segments:
+            return None
+        return min(s["t_min"] for s in segments), max(s["t_max"] for s in segments)
+
+    def iter_segments(self, kind, start=None, end=None, fields=None):
+        """Yield dicts of memory-mapped column slices for rows with start <= t < end."""
+        fields = list(fields) if fields else [name for name, _ in SCHEMAS[kind]]
+        lo_t = -np.inf if start is None else start
+        hi_t = np.inf if end is None else end
+        for segment in self.manifests[kind]["segments"]:
+            if not segment["rows"] or segment["t_max"] < lo_t or segment["t_min"] >= hi_t:
+                continue
+            directory = self.path / kind / segment["name"]
+            rows = slice(0, segment["rows"])
+            if start is not None or end is not None:
+                rows = self._rows(directory, segment["rows"], lo_t, hi_t)
+                if rows.start >= rows.stop:
+                    continue
+            yield {name: np.load(directory / f"{name}.npy", mmap_mode="r")[rows] for name in fields}
+
+    def query(self, kind, start=None, end=None, fields=None):
+        """Columns (NumPy arrays) of all rows with start <= t < end."""
+        fields = list(fields) if fields else [name for name, _ in SCHEMAS[kind]]
+        parts = list(self.iter_segments(kind, start, end, fields))
+        dtypes = dict(SCHEMAS[kind])
+        return {name: np.concatenate([p[name] for p in parts]) if parts
+                else np.empty(0, dtype=dtypes[name]) for name in fields}
+
+    @staticmethod
+    def _rows(directory, count, lo_t, hi_t):
+        index = np.load(directory / "t.idx.npy")
+        first = max(int(np.searchsorted(index, lo_t, side="left")) - 1, 0) * INDEX_STRIDE
+        last = min(int(np.searchsorted(index, hi_t, side="left")) * INDEX_STRIDE, count)
+        t = np.load(directory / "t.npy", mmap_mode="r")[first:last]
+        return slice(first + int(np.searchsorted(t, lo_t, side="left")),
+                     first + int(np.searchsorted(t, hi_t, side="left")))
+
+
+def _format_time(t):
+    return datetime.datetime.fromtimestamp(t, datetime.timezone.utc).isoformat()
+
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Columnar telemetry archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("convert", help="add JSON / JSON Lines logs to an archive")
+    p.add_argument("archive")
+    p.add_argument("logs", nargs="+")
+    p.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    p = sub.add_parser("info", help="show kinds, row counts and time ranges")
+    p.add_argument("archive")
+    p = sub.add_parser("query", help="print a time range as CSV")
+    p.add_argument("archive")
+    p.add_argument("kind", choices=sorted(SCHEMAS))
+    p.add_argument("--start", help="epoch seconds or ISO 8601 (UTC if no offset)")
+    p.add_argument("--end")
+    p.add_argument("--fields", help="comma separated column names (default: all)")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        added = convert(args.logs, args.archive, args.workers)
+        print(", ".join(f"{rows} {kind} rows" for kind, rows in added.items()) + f" added to {args.archive}")
+    elif args.command == "info":
+        archive = Archive(args.archive)
+        for kind in archive.kinds:
+            t0, t1 = archive.time_range(kind)
+            print(f"{kind}: {archive.rows(kind)} rows in {len(archive.manifests[kind]['segments'])} segments, "
+                  f"{_format_time(t0)} to {_format_time(t1)}")
+    else:
+        archive = Archive(args.archive)
+        fields = args.fields.split(",") if args.fields else None
+        start = parse_time(args.start) if args.start else None
+        end = parse_time(args.end) if args.end else None
+        columns = archive.query(args.kind, start, end, fields)
+        names = list(columns)
+        print(",".join(names))
+        for row in zip(*(columns[n].tolist() for n in names)):
+            sys.stdout.write(",".join(map(str, row)) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""Micro-benchmarks for the host-side hot paths of the helper tools.
+
+Run from the PlatformHelper directory:
+
+    python -m benchmarks              # quick cases, compared to the baseline
+    python -m benchmarks --full       # include the large (1M vertex) inputs
+    python -m benchmarks --save       # store the results as the new baseline
+    python -m benchmarks -k kml       # only cases whose name contains "kml"
+
+Each case reports calls/s, items/s, the peak traced memory of one call
+and the number of memory blocks it leaves allocated. Baselines are kept in
+`.benchmarks/baseline.json` and synthetic inputs in `.benchmarks/data/`.
+"""
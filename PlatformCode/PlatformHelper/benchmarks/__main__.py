@@ -0,0 +1,46 @@
+"""Command line entry point: `python -m benchmarks`."""
+import argparse
+import importlib
+
+from benchmarks import harness
+
+MODULES = [
+    "bench_kml",
+    "bench_route",
+    "bench_routecache",
+    "bench_geodesy",
+    "bench_gotosim",
+    "bench_serial",
+    "bench_wire",
+    "bench_recorder",
+    "bench_archive",
+    "bench_magcal",
+    "bench_fleet",
+    "bench_pipeline",
+    "bench_intent5",
+    "bench_gui",
+    "bench_mapview",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Helper tool micro-benchmarks")
+    parser.add_argument("-k", dest="pattern", help="only run cases whose name contains PATTERN")
+    parser.add_argument("--full", action="store_true", help="include the slow, large-input cases")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--baseline", default=str(harness.BASELINE_FILE), help="baseline file")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to spend timing each case")
+    args = parser.parse_args()
+
+    for name in MODULES:
+        importlib.import_module(f"benchmarks.{name}")
+
+    selected = harness.cases(full=args.full, pattern=args.pattern)
+    results = harness.run(selected, min_time=args.min_time, baseline=harness.load_baseline(args.baseline))
+    if args.save:
+        harness.save_baseline(results, args.baseline)
+        print(f"\nSaved {len(results)} result(s) to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Time-range queries on the columnar archive against loading JSON logs."""
+import json
+import shutil
+
+import archive
+
+from benchmarks import synthetic
+from benchmarks.harness import BENCH_DIR, case
+
+ROWS = 200000
+T0 = 1.7e9
+PERIOD = 0.05           # 20 Hz
+WINDOW = 60.0
+
+
+def _records():
+    records = synthetic.telemetry_session(ROWS)
+    for i, record in enumerate(records):
+        record["_t"] = T0 + i * PERIOD
+    return records
+
+
+def _archive():
+    path = BENCH_DIR / "data" / f"status_{ROWS}.archive"
+    if not (path / "status" / "manifest.json").exists():
+        shutil.rmtree(path, ignore_errors=True)
+        records = _records()
+        for record in records:
+            record["t"] = record["_t"]
+        entry = archive.write_segment(path / "status" / "000000-000-synthetic",
+                                      archive._columns("status", records))
+        archive._write_manifest(path, "status", {"fields": dict(archive.SCHEMAS["status"]),
+                                                 "segments": [entry]})
+    return path
+
+
+def _legacy_log():
+    path = BENCH_DIR / "data" / f"status_{ROWS}.json"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(_records(), f, indent=2)
+    return path
+
+
+_START = T0 + ROWS * PERIOD / 2
+
+
+@case(f"archive.query[{WINDOW:g} s of {ROWS} rows]", items=int(WINDOW / PERIOD))
+def _query():
+    store = archive.Archive(_archive())
+    return lambda: store.query("status", _START, _START + WINDOW, ["t", "lat", "lon", "heading"])
+
+
+@case(f"archive.json_load[{WINDOW:g} s of {ROWS} rows]", items=int(WINDOW / PERIOD), quick=False)
+def _legacy():
+    path = _legacy_log()
+
+    def run():
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f)
+        return [r for r in records if _START <= r["_t"] < _START + WINDOW]
+    return run
@@ -0,0 +1,35 @@
+"""Status of many platforms: sequential requests against one event loop.
+
+Each platform is a simulator behind a `SimulatedSerial` delaying writes by
+their 115200 baud wire time, as in `bench_wire`.
+"""
+import asyncio
+
+from fleet import AsyncPlatform, Fleet
+from simulator import DeviceSimulator, SimulatedSerial
+from transport import Transport
+
+from benchmarks.harness import case
+
+PLATFORMS = 30
+BAUDRATE = 115200
+
+
+def _links():
+    # reader threads live as long as the benchmark process
+    return [Transport(SimulatedSerial(DeviceSimulator(seed=i), timeout=1, baudrate=BAUDRATE))
+            for i in range(PLATFORMS)]
+
+
+@case(f"fleet.sequential_status[{PLATFORMS} platforms]", items=PLATFORMS)
+def _sequential():
+    links = _links()
+    request = {"intent": 6}
+    return lambda: [link.request(request) for link in links]
+
+
+@case(f"fleet.status[{PLATFORMS} platforms]", items=PLATFORMS)
+def _fleet():
+    fleet = Fleet(AsyncPlatform(link, f"sim{i}") for i, link in enumerate(_links()))
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(fleet.status())
@@ -0,0 +1,38 @@
+"""Vectorised geodesy (`geodesy`) against the per-point TinyGPSPlus model."""
+import numpy as np
+
+import geodesy
+import simulator
+
+from benchmarks import synthetic
+from benchmarks.harness import case
+
+
+def _track(n):
+    points = np.array(synthetic.route(n))
+    return points[:, 0].copy(), points[:, 1].copy()
+
+
+def _loop(n):
+    lon, lat = (a.tolist() for a in _track(n))
+
+    def run():
+        return [simulator.distance_between(lat[i], lon[i], lat[i + 1], lon[i + 1]) for i in range(n - 1)]
+    return run
+
+
+def _analyze(n):
+    lon, lat = _track(n)
+    return lambda: geodesy.analyze(lon, lat, 100)
+
+
+def _forward(n):
+    lon, lat = _track(n)
+    frame = geodesy.local_frame(float(lat[0]), float(lon[0]))
+    return lambda: frame.forward(lon, lat)
+
+
+case("distance_between loop[10000]", items=10000)(lambda: _loop(10000))
+for _n, _quick in ((10000, True), (1000000, False)):
+    case(f"geodesy.analyze[{_n}]", items=_n, quick=_quick)(lambda n=_n: _analyze(n))
+    case(f"geodesy.EnuFrame.forward[{_n}]", items=_n, quick=_quick)(lambda n=_n: _forward(n))
@@ -0,0 +1,46 @@
+"""Batched goTo model (`gotosim`) against the device simulator."""
+import json
+
+import numpy as np
+
+import geodesy
+import gotosim
+import route
+import simulator
+
+from benchmarks import synthetic
+from benchmarks.harness import case
+
+
+def _route():
+    lon, lat = np.array(synthetic.route(240)).T
+    simplified = route.simplify(lon, lat, max_points=20)
+    return simplified.lon, simplified.lat
+
+
+def _device():
+    lon, lat = _route()
+    frame = json.dumps({"intent": 5, "coordinates": route.build_coordinates(lon, lat, 100, 2.0)}).encode()
+
+    def run():
+        sim = simulator.DeviceSimulator(lat=float(lat[0]), lon=float(lon[0]), clock=None,
+                                        heading=float(geodesy.course_to(lat[0], lon[0], lat[1], lon[1])))
+        sim.handle(frame)
+        sim.handle(b'{"intent":2}')
+        for _ in range(3000):
+            if not sim.motor_handled:
+                break
+            sim.advance(0.1)
+        return sim
+    return run
+
+
+def _batch(n):
+    lon, lat = _route()
+    speed = np.linspace(40, 100, n)
+    return lambda: gotosim.simulate(lon, lat, speed, 2.0, gps_noise=1.0, heading_noise=2.0, seed=0)
+
+
+case("DeviceSimulator drive[1 robot]", items=1)(_device)
+for _n, _quick in ((100, True), (2000, False)):
+    case(f"gotosim.simulate[{_n} robots]", items=_n, quick=_quick)(lambda n=_n: _batch(n))
@@ -0,0 +1,64 @@
+"""Status display updates (`PlatformGUI.update_status_display`, `post`) and the magnetometer plot."""
+from benchmarks import synthetic
+from benchmarks.harness import case
+
+SAMPLES = 1000
+
+
+@case(f"gui.update_status_display[{SAMPLES}]", items=SAMPLES)
+def update_status_display():
+    # needs a display; the harness reports the case as skipped otherwise
+    import tkinter as tk
+    import helper_gui
+
+    root = tk.Tk()
+    root.withdraw()
+    gui = helper_gui.PlatformGUI(root)
+    session = synthetic.telemetry_session(SAMPLES)
+
+    def run():
+        for status in session:
+            gui.update_status_display(status)
+        root.update_idletasks()
+    return run
+
+
+@case(f"gui.post+drain[{SAMPLES} statuses]", items=SAMPLES)
+def post_and_drain():
+    # a burst of pushed statuses between two drains: only the newest is drawn
+    import tkinter as tk
+    import helper_gui
+
+    root = tk.Tk()
+    root.withdraw()
+    gui = helper_gui.PlatformGUI(root)
+    session = synthetic.telemetry_session(SAMPLES)
+
+    def run():
+        for status in session:
+            gui.post(gui.update_status_display, status, key="status")
+        gui.drain_ui_queue()
+        root.update_idletasks()
+    return run
+
+
+@case("magplot.add[10 samples into 20000]", items=10)
+def magplot_frame():
+    # one 20 Hz frame of a 200 Hz stream once the ring buffer is full
+    import random
+    import tkinter as tk
+    import magplot
+
+    root = tk.Tk()
+    root.withdraw()
+    plot = magplot.MagPlot(root)
+    rng = random.Random(0)
+    history = [synthetic.mag_reply(rng) for _ in range(plot.capacity)]
+    plot.add([m["magX"] for m in history], [m["magY"] for m in history])
+    frame = history[:10]
+    mag_x, mag_y = [m["magX"] for m in frame], [m["magY"] for m in frame]
+
+    def run():
+        plot.add(mag_x, mag_y)
+        root.update_idletasks()
+    return run
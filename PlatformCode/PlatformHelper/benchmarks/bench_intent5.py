@@ -0,0 +1,33 @@
+"""Intent 5 payload building (`intent5.process`)."""
+import contextlib
+import io
+import json
+
+import intent5
+
+from benchmarks import synthetic
+from benchmarks.harness import case
+
+
+class _NullLink:
+    """Accepts `send()` like a Transport and discards the bytes."""
+
+    def protocol(self, timeout=2.0):
+        return 0  # no intent 14: every upload sends the full route
+
+    def send(self, obj):
+        return json.dumps(obj).encode("utf-8")
+
+
+def _upload(n):
+    path = synthetic.kml_file(n)
+    link = _NullLink()
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            intent5.process(link, str(path), speed=50.0, range_m=2.0)
+    return run
+
+
+for _n in (10, 48, 1000):
+    case(f"intent5.process[{_n}]", items=_n)(lambda n=_n: _upload(n))
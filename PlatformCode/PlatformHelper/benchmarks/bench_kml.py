@@ -0,0 +1,22 @@
+"""KML parsing (`parsekml.parse` and `parsekml.iter_geometries`)."""
+import parsekml
+
+from benchmarks import synthetic
+from benchmarks.harness import case
+
+SIZES = ((10, True), (1000, True), (100000, True), (1000000, False))
+
+
+def _parse(n):
+    path = synthetic.kml_file(n)
+    return lambda: parsekml.parse(path)
+
+
+def _iter_geometries(n):
+    path = synthetic.kml_file(n)
+    return lambda: list(parsekml.iter_geometries(path))
+
+
+for _n, _quick in SIZES:
+    case(f"kml.parse[{_n}]", items=_n, quick=_quick)(lambda n=_n: _parse(n))
+    case(f"kml.iter_geometries[{_n}]", items=_n, quick=_quick)(lambda n=_n: _iter_geometries(n))
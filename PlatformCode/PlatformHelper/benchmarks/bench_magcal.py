@@ -0,0 +1,30 @@
+"""Batch hard/soft-iron fit over a logged intent 9 session."""
+import random
+
+import numpy as np
+
+import magcal
+from simulator import DeviceSimulator
+
+from benchmarks.harness import case
+
+SAMPLES = 100000
+
+
+def _samples():
+    sim = DeviceSimulator(clock=None, mag_soft_iron=(1.2, 0.15, 0.15, 0.8), mag_noise=1.0, seed=0)
+    rng = random.Random(0)
+    xs, ys = [], []
+    for _ in range(SAMPLES):
+        sim.heading = rng.uniform(0.0, 360.0)
+        x, y = sim.read_mag()
+        xs.append(x)
+        ys.append(y)
+    # as `magcal.load_samples` returns them
+    return np.array(xs), np.array(ys)
+
+
+@case(f"magcal.fit[{SAMPLES} samples]", items=SAMPLES)
+def _fit():
+    xs, ys = _samples()
+    return lambda: magcal.fit(xs, ys)
@@ -0,0 +1,42 @@
+"""Map level of detail (`mapview.decimate`, `MapView.redraw`)."""
+import numpy as np
+
+from benchmarks import synthetic
+from benchmarks.harness import case
+
+VERTICES = 100000
+
+
+def _route(n):
+    import mapview
+
+    points = np.array(synthetic.route(n))
+    frame = mapview.LocalFrame(points[0, 0], points[0, 1])
+    return frame.project(points[:, 0], points[:, 1])
+
+
+@case(f"mapview.decimate[{VERTICES} vertices, 12 levels]", items=VERTICES)
+def decimate():
+    # building every level once, as zooming from the whole route to 1 cm cells does
+    import mapview
+
+    x, y = _route(VERTICES)
+    return lambda: [mapview.decimate(x, y, 2.0 ** -level) for level in range(-4, mapview.MAX_LEVEL)]
+
+
+@case(f"mapview.redraw[{VERTICES} vertices]", items=VERTICES)
+def redraw():
+    # needs a display; the harness reports the case as skipped otherwise
+    import tkinter as tk
+    import mapview
+
+    root = tk.Tk()
+    root.withdraw()
+    view = mapview.MapView(root)
+    points = np.array(synthetic.route(VERTICES))
+    view.set_route(points[:, 0], points[:, 1])
+
+    def run():
+        view.redraw()
+        root.update_idletasks()
+    return run
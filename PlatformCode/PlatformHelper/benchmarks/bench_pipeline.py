@@ -0,0 +1,33 @@
+"""Mixed status/magnetometer/coordinate requests: stop-and-wait against `Pipeline`.
+
+The simulator sits behind a `SimulatedSerial` that delays writes by their
+115200 baud wire time and replies by a 20 ms round trip (USB polling and
+the firmware loop), so stop-and-wait pays the round trip per request while
+the pipeline pays it about once per window.
+"""
+from simulator import DeviceSimulator, SimulatedSerial
+from transport import Pipeline, Transport
+
+from benchmarks.harness import case
+
+BAUDRATE = 115200
+LATENCY = 0.02
+WORKLOAD = [{"intent": 6}, {"intent": 9}, {"intent": 1}] * 10
+
+
+def _link():
+    # the reader thread lives as long as the benchmark process
+    return Transport(SimulatedSerial(DeviceSimulator(seed=0), timeout=1, baudrate=BAUDRATE, latency=LATENCY))
+
+
+@case(f"transport.stop_and_wait[{len(WORKLOAD)} mixed requests]", items=len(WORKLOAD))
+def _stop_and_wait():
+    link = _link()
+    return lambda: [link.request(obj) for obj in WORKLOAD]
+
+
+for _window in (4, 8):
+    @case(f"pipeline.run[{len(WORKLOAD)} mixed requests, window {_window}]", items=len(WORKLOAD))
+    def _pipelined(window=_window):
+        pipeline = Pipeline(_link(), window)
+        return lambda: pipeline.run(WORKLOAD)
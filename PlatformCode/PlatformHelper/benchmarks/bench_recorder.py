@@ -0,0 +1,43 @@
+"""Telemetry logging: streamed JSON Lines against collect-then-dump."""
+import json
+import random
+
+from recorder import Recorder
+
+from benchmarks import synthetic
+from benchmarks.harness import BENCH_DIR, case
+
+SAMPLES = 10000
+
+
+def _samples():
+    rng = random.Random(0)
+    return [synthetic.mag_reply(rng) for _ in range(SAMPLES)]
+
+
+@case(f"recorder.record[{SAMPLES} samples]", items=SAMPLES)
+def _record():
+    samples = _samples()
+    path = BENCH_DIR / "tmp" / "recorder.jsonl"
+
+    def run():
+        with Recorder(path) as rec:
+            for sample in samples:
+                rec.record(sample)
+    return run
+
+
+@case(f"recorder.legacy_dump[{SAMPLES} samples]", items=SAMPLES)
+def _legacy_dump():
+    # what the logging loops did before: keep everything, dump at the end
+    samples = _samples()
+    path = BENCH_DIR / "tmp" / "legacy.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    def run():
+        collected = []
+        for sample in samples:
+            collected.append(dict(sample))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(collected, f, indent=2)
+    return run
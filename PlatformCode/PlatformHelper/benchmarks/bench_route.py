@@ -0,0 +1,17 @@
+"""Route simplification (`route.simplify`)."""
+import numpy as np
+
+import route
+
+from benchmarks import synthetic
+from benchmarks.harness import case
+
+
+def _simplify(n, tolerance=None):
+    points = np.array(synthetic.route(n))
+    lon, lat = points[:, 0].copy(), points[:, 1].copy()
+    return lambda: route.simplify(lon, lat, route.MAX_WAYPOINTS, tolerance)
+
+
+for _n, _quick in ((1000, True), (100000, True), (1000000, False)):
+    case(f"route.simplify[{_n}]", items=_n, quick=_quick)(lambda n=_n: _simplify(n))
@@ -0,0 +1,37 @@
+"""Prepared route cache (`routecache`) against parsing every time (`route.prepare`)."""
+import atexit
+import shutil
+import tempfile
+
+import route
+import routecache
+
+from benchmarks import synthetic
+from benchmarks.harness import case
+
+_DIR = tempfile.mkdtemp(prefix="routecache-bench-")
+atexit.register(shutil.rmtree, _DIR, True)
+
+
+def _uncached(n):
+    path = synthetic.kml_file(n)
+    return lambda: route.prepare(path)
+
+
+def _hit(n, rehash=False):
+    path = synthetic.kml_file(n)
+    cache = routecache.RouteCache(_DIR)
+    cache.prepare(path)
+
+    def run():
+        if rehash:
+            # as in a new process: the file is hashed again
+            routecache._digests.clear()
+        return cache.prepare(path)
+    return run
+
+
+for _n, _quick in ((1000, True), (100000, True)):
+    case(f"route.prepare[{_n}]", items=_n, quick=_quick)(lambda n=_n: _uncached(n))
+    case(f"routecache.prepare[{_n}, hit]", items=_n, quick=_quick)(lambda n=_n: _hit(n))
+    case(f"routecache.prepare[{_n}, hit, rehash]", items=_n, quick=_quick)(lambda n=_n: _hit(n, True))
@@ -0,0 +1,38 @@
+"""Framing of the device byte stream and request round trips."""
+from jsonframer import JsonFramer
+from simulator import DeviceSimulator, SimulatedSerial
+from transport import Transport
+
+from benchmarks import synthetic
+from benchmarks.harness import case
+
+MESSAGES = 1000
+
+
+def _framer(read_size):
+    data = synthetic.noisy_stream(MESSAGES)
+    reads = synthetic.chunks(data, read_size)
+
+    def run():
+        framer = JsonFramer()
+        out = []
+        for chunk in reads:
+            out += framer.feed(chunk)
+        return out
+    return run, len(data)
+
+
+for _size in (1, 64, 4096):
+    _run, _bytes = _framer(_size)
+    case(f"framer.feed[{_size}B reads]", items=_bytes)(lambda run=_run: run)
+
+
+def _round_trip(intent):
+    # the transport's reader thread lives as long as the benchmark process
+    link = Transport(SimulatedSerial(DeviceSimulator(), timeout=1))
+    request = {"intent": intent}
+    return lambda: link.request(request)
+
+
+for _intent in (1, 6, 9):
+    case(f"transport.request[intent {_intent}]")(lambda intent=_intent: _round_trip(intent))
@@ -0,0 +1,75 @@
+"""JSON against the binary wire encoding: bytes and round-trip time.
+
+Round trips run against the simulator behind a `SimulatedSerial` that
+delays every write by its 115200 baud wire time, so the timings are what
+a USB serial link would see minus the firmware's loop latency. Case names
+carry the bytes one exchange puts on the wire (request plus reply).
+"""
+import json
+
+import route
+import wirecodec
+from simulator import DeviceSimulator, SimulatedSerial
+from transport import Transport
+
+from benchmarks import synthetic
+from benchmarks.harness import case
+
+BAUDRATE = 115200
+
+
+def _coordinates():
+    points = synthetic.route(route.MAX_WAYPOINTS * 50)[::50]
+    lon, lat = zip(*points)
+    return route.build_coordinates(lon, lat, 50.0, 2.0)
+
+
+def _exchange_bytes(obj, binary):
+    """Bytes of request plus reply for `obj` in the given encoding."""
+    sim = DeviceSimulator(clock=None, seed=0)
+    sim.handle(json.dumps({"intent": 5, "coordinates": _coordinates()}).encode())
+    if binary:
+        sim.handle(b'{"intent": 11, "wire": 1}')
+    request = (wirecodec.encode_request(obj) if binary else None) or json.dumps(obj).encode()
+    return len(request) + len(sim.handle(request))
+
+
+def _link(binary):
+    link = Transport(SimulatedSerial(DeviceSimulator(), timeout=1, baudrate=BAUDRATE))
+    link.send({"intent": 5, "coordinates": _coordinates()})
+    if binary and not link.negotiate():
+        raise RuntimeError("simulator refused the binary encoding")
+    return link
+
+
+def _request(intent, binary):
+    link = _link(binary)
+    request = {"intent": intent}
+    return lambda: link.request(request)
+
+
+def _upload(binary):
+    link = _link(binary)
+    payload = {"intent": 5, "coordinates": _coordinates()}
+    return lambda: link.send(payload)
+
+
+for _binary, _label in ((False, "json"), (True, "binary")):
+    for _intent in (1, 6, 9):
+        _bytes = _exchange_bytes({"intent": _intent}, _binary)
+        case(f"wire.request[intent {_intent} {_label}, {_bytes} B]")(
+            lambda intent=_intent, binary=_binary: _request(intent, binary))
+    _bytes = _exchange_bytes({"intent": 5, "coordinates": _coordinates()}, _binary)
+    case(f"wire.upload[{route.MAX_WAYPOINTS} wp {_label}, {_bytes} B]")(
+        lambda binary=_binary: _upload(binary))
+
+
+def _decode(binary):
+    status = DeviceSimulator(clock=None, seed=0).status()
+    data = wirecodec.encode_reply(6, status) if binary else json.dumps(status).encode()
+    framer = wirecodec.WireFramer()
+    return lambda: framer.feed(data)
+
+
+case("wire.decode[status json]")(lambda: _decode(False))
+case("wire.decode[status binary]")(lambda: _decode(True))
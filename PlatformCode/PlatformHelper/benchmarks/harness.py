@@ -0,0 +1,135 @@
+"""Benchmark registry, timing and baseline handling."""
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BENCH_DIR = Path(".benchmarks")
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+
+# a case slower than the baseline by more than this fraction is flagged
+REGRESSION_THRESHOLD = 0.20
+
+_cases = []
+
+
+class Case:
+    """A named benchmark. `setup()` returns the callable that is timed."""
+
+    def __init__(self, name, setup, items=1, quick=True):
+        self.name = name
+        self.setup = setup
+        self.items = items
+        self.quick = quick
+
+
+def case(name, items=1, quick=True):
+    """Register the decorated setup function as a benchmark case.
+
+    `items` is the number of elements (vertices, bytes, samples) one call
+    processes; `quick=False` keeps the case out of the default run.
+    """
+    def decorator(setup):
+        _cases.append(Case(name, setup, items, quick))
+        return setup
+    return decorator
+
+
+def cases(full=False, pattern=None):
+    return [c for c in _cases
+            if (full or c.quick) and (pattern is None or pattern in c.name)]
+
+
+def measure(func, min_time=0.5, max_calls=10000):
+    """Time repeated calls of `func`; returns a dict of statistics."""
+    func()  # warm-up
+    times = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        while len(times) < max_calls and time.perf_counter() - start < min_time:
+            t0 = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - t0)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    times.sort()
+    median = times[len(times) // 2]
+
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    gc.collect()
+    blocks = sys.getallocatedblocks() - blocks_before
+
+    return {
+        "calls": len(times),
+        "median_s": median,
+        "best_s": times[0],
+        "ops_per_s": 1.0 / median if median > 0 else float("inf"),
+        "peak_kib": peak / 1024,
+        "blocks": blocks,
+    }
+
+
+def load_baseline(path=BASELINE_FILE):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    baseline = load_baseline(path)
+    baseline.update(results)
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def format_rate(value):
+    for unit, scale in (("G", 1e9), ("M", 1e6), ("k", 1e3)):
+        if value >= scale:
+            return f"{value / scale:.2f}{unit}"
+    return f"{value:.1f}"
+
+
+def run(selected, min_time=0.5, baseline=None):
+    """Run the selected cases, print a table and return the results."""
+    baseline = baseline or {}
+    results = {}
+    print(f"{'case':<40} {'calls/s':>9} {'items/s':>9} {'median':>10} {'peak KiB':>10} {'blocks':>8}  vs baseline")
+    regressions = []
+    for c in selected:
+        try:
+            func = c.setup()
+        except Exception as e:
+            print(f"{c.name:<40} skipped: {e}")
+            continue
+        stats = measure(func, min_time=min_time)
+        stats["items_per_s"] = stats["ops_per_s"] * c.items
+        results[c.name] = stats
+
+        delta = ""
+        base = baseline.get(c.name)
+        if base:
+            change = stats["ops_per_s"] / base["ops_per_s"] - 1.0
+            delta = f"{change:+.1%}"
+            if change < -REGRESSION_THRESHOLD:
+                delta += "  REGRESSION"
+                regressions.append(c.name)
+        print(f"{c.name:<40} {format_rate(stats['ops_per_s']):>9} {format_rate(stats['items_per_s']):>9} "
+              f"{stats['median_s'] * 1e3:>8.3f}ms {stats['peak_kib']:>10.1f} {stats['blocks']:>8}  {delta}")
+    if regressions:
+        print(f"\n{len(regressions)} case(s) more than {REGRESSION_THRESHOLD:.0%} slower than the baseline")
+    return results
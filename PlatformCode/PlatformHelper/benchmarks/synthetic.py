@@ -0,0 +1,117 @@
+"""Synthetic inputs: KML routes, noisy serial streams and telemetry sessions."""
+import json
+import math
+import random
+
+from benchmarks.harness import BENCH_DIR
+
+DATA_DIR = BENCH_DIR / "data"
+
+_KML_HEAD = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2">
+<Document>
+	<name>Synthetic route</name>
+	<Placemark>
+		<name>Route {n}</name>
+		<LineString>
+			<coordinates>
+				"""
+_KML_TAIL = """
+			</coordinates>
+		</LineString>
+	</Placemark>
+</Document>
+</kml>
+"""
+
+
+def route(n, lat=47.42, lon=12.855, seed=0):
+    """A wandering route of `n` (lon, lat) vertices about 0.5 m apart."""
+    rng = random.Random(seed)
+    heading = 0.0
+    points = []
+    for _ in range(n):
+        points.append((lon, lat))
+        heading += rng.gauss(0, 0.2)
+        lat += 0.5 * math.cos(heading) / 111320.0
+        lon += 0.5 * math.sin(heading) / (111320.0 * math.cos(math.radians(lat)))
+    return points
+
+
+def kml_file(n, seed=0):
+    """Path of a cached KML file with one LineString of `n` vertices."""
+    path = DATA_DIR / f"route_{n}_{seed}.kml"
+    if not path.exists():
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(_KML_HEAD.format(n=n))
+            chunk = []
+            for lon, lat in route(n, seed=seed):
+                chunk.append(f"{lon:.14f},{lat:.14f},0")
+                if len(chunk) == 10000:
+                    f.write(" ".join(chunk) + " ")
+                    chunk = []
+            f.write(" ".join(chunk))
+            f.write(_KML_TAIL)
+        tmp.replace(path)
+    return path
+
+
+def status_reply(rng, t=0.0):
+    """An intent 6 reply as the firmware would send it."""
+    return {
+        "batteryVoltage": 12.6 - t * 1e-5,
+        "numSats": rng.randint(5, 12),
+        "fix": True,
+        "locationAge": rng.randint(0, 920),
+        "lat": 47.42 + rng.random() * 1e-3,
+        "lon": 12.855 + rng.random() * 1e-3,
+        "heading": rng.random() * 360,
+        "serialControl": False,
+        "motorHandled": rng.random() < 0.5,
+        "magXMin": -215.3,
+        "magXMax": 285.1,
+        "magYMin": -270.4,
+        "magYMax": 230.8,
+        "setPointL": rng.randint(0, 100),
+        "setPointR": rng.randint(0, 100),
+    }
+
+
+def mag_reply(rng):
+    """An intent 9 reply."""
+    return {
+        "magXMin": -215.3, "magXMax": 285.1, "magYMin": -270.4, "magYMax": 230.8,
+        "magX": rng.uniform(-215, 285), "magY": rng.uniform(-270, 230),
+    }
+
+
+def noisy_stream(messages, noise=0.05, seed=0):
+    """Bytes of `messages` compact JSON replies (status, mag, table) with
+    `deserializeJson() failed:` lines interleaved at rate `noise`."""
+    rng = random.Random(seed)
+    parts = []
+    for i in range(messages):
+        if rng.random() < noise:
+            parts.append(b"deserializeJson() failed: InvalidInput\r\n")
+        kind = i % 10
+        if kind == 9:
+            obj = {"coordinates": [rng.random() for _ in range(100)]}
+        elif kind % 2:
+            obj = mag_reply(rng)
+        else:
+            obj = status_reply(rng, i)
+        parts.append(json.dumps(obj, separators=(",", ":")).encode())
+    return b"".join(parts)
+
+
+def telemetry_session(samples, seed=0):
+    """A list of `samples` intent 6 replies, as collected by auto-refresh."""
+    rng = random.Random(seed)
+    return [status_reply(rng, i) for i in range(samples)]
+
+
+def chunks(data, size):
+    """Split `data` into reads of `size` bytes, like a serial port delivers."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""Keep the device port open and share it between several tools.
+
+Opening the USB serial port resets the ESP32 on many boards, and only one
+program can hold the port. The broker opens it once and serves the device
+protocol on a local TCP and/or Unix socket, so the GUI, a logger and
+ad-hoc scripts can connect and disconnect freely without resetting the
+robot:
+
+    python broker.py COM3                        # socket://localhost:9100
+    python broker.py /dev/ttyUSB0 --unix /tmp/mover.sock
+    python helper_cli.py socket://localhost:9100
+    python fleet.py status unix:///tmp/mover.sock
+
+Each client speaks the ordinary protocol. Replies go only to the client
+that asked (requests are queued on the broker's `Transport` and answered
+by request id), pushed streams (intent 12) are subscribed per client
+and shared on the device at the highest requested rate, and the wire
+encoding (intent 11) is chosen per client. A client's own request `id`
+is echoed in its reply, whatever the device firmware supports; requests
+left unanswered for `REQUEST_TIMEOUT`, or by a client that disconnects,
+are given up. The broker itself talks to the
+device in the binary encoding when the firmware supports it. Commands
+without a reply are forwarded as they arrive; text the device prints
+(e.g. `deserializeJson() failed:`) goes to every client.
+"""
+import json
+import os
+import select
+import socket
+import socketserver
+import threading
+import time
+
+import wirecodec
+from transport import REPLY_INTENTS, STREAM_INTENTS, Transport, open_port
+
+DEFAULT_PORT = 9100
+REQUEST_TIMEOUT = 5.0       # s before a client's unanswered request is given up
+
+
+class _Client:
+    """One connected tool: its socket, encoding and subscriptions."""
+
+    def __init__(self, sock, name):
+        self.sock = sock
+        self.name = name
+        self.binary = False
+        self.subscriptions = {}
+        self.requests = {}      # Future -> (intent, deadline), guarded by the broker's lock
+        self.closed = False
+        self._write_lock = threading.Lock()
+
+    def write(self, data):
+        with self._write_lock:
+            if self.closed:
+                return
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                self.closed = True
+
+    def reply(self, intent, msg, request_id=0):
+        """Send `msg` as the reply to `intent` carrying the client's `request_id` (0: none)."""
+        if self.binary and intent in (wirecodec.TYPE_TABLE, wirecodec.TYPE_STATUS, wirecodec.TYPE_MAG):
+            value = msg["coordinates"] if intent == wirecodec.TYPE_TABLE else msg
+            self.write(wirecodec.encode_reply(intent, value, request_id & 0xFF))
+        else:
+            msg = {k: v for k, v in msg.items() if k != "id"}
+            if request_id:
+                msg["id"] = request_id
+            self.write(json.dumps(msg, separators=(",", ":")).encode("utf-8"))
+
+
+class Broker:
+    """Serve one device `Transport` to many socket clients."""
+
+    def __init__(self, link, binary=True, request_timeout=REQUEST_TIMEOUT):
+        self.link = link
+        self.request_timeout = request_timeout
+        # asked before switching to binary, whose status carries no version
+        self.protocol = link.protocol()
+        if binary:
+            link.negotiate()
+        self.clients = set()
+        self._lock = threading.Lock()
+        self._servers = []
+        self._stopped = threading.Event()
+        link.add_listener(self._device_text)
+        threading.Thread(target=self._expire_requests, daemon=True).start()
+
+    def serve(self, host="localhost", port=DEFAULT_PORT, unix=None):
+        """Listen on TCP `host:port` (None to skip) and/or Unix socket `unix`.
+
+        Blocks until `shutdown()` is called from another thread or a
+        KeyboardInterrupt.
+        """
+        if port is None and unix is None:
+            raise ValueError("nothing to listen on")
+        broker = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                broker.handle_client(self.request, self.client_address)
+
+        if port is not None:
+            server = socketserver.ThreadingTCPServer((host, port), Handler, bind_and_activate=False)
+            server.allow_reuse_address = True
+            server.daemon_threads = True
+            server.server_bind()
+            server.server_activate()
+            self._servers.append(server)
+            print(f"Broker for {self.link.name} listening on socket://{host}:{port}")
+        if unix is not None:
+            if os.path.exists(unix):
+                os.unlink(unix)
+            server = socketserver.ThreadingUnixStreamServer(unix, Handler)
+            server.daemon_threads = True
+            self._servers.append(server)
+            print(f"Broker for {self.link.name} listening on unix://{unix}")
+        for server in self._servers[1:]:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._servers[0].serve_forever()
+
+    def shutdown(self):
+        """Stop serving, drop all clients and close the device port."""
+        self._stopped.set()
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+            if server.address_family == getattr(socket, "AF_UNIX", None):
+                try:
+                    os.unlink(server.server_address)
+                except OSError:
+                    pass
+        with self._lock:
+            clients = list(self.clients)
+        for client in clients:
+            self._drop(client)
+        self.link.close()
+
+    def handle_client(self, sock, address):
+        """Serve one client connection until it closes."""
+        if sock.family != getattr(socket, "AF_UNIX", None):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        name = f"{address[0]}:{address[1]}" if isinstance(address, tuple) else "unix client"
+        client = _Client(sock, name)
+        with self._lock:
+            self.clients.add(client)
+        print(f"Client connected: {name}")
+        framer = wirecodec.WireFramer()
+        try:
+            while not client.closed:
+                data = sock.recv(4096)
+                if not data:
+                    break
+                for msg in framer.feed(data):
+                    if isinstance(msg, dict):
+                        self.command(client, msg)
+        except OSError:
+            pass
+        finally:
+            self._drop(client)
+            print(f"Client disconnected: {name}")
+
+    def command(self, client, msg):
+        """Carry out one command from `client`."""
+        intent = msg.get("intent")
+        request_id = msg.get("id")
+        if not isinstance(request_id, int) or isinstance(request_id, bool) or not 0 <= request_id <= 0xFFFFFFFF:
+            request_id = 0
+        if intent == 11:
+            client.binary = msg.get("wire") == wirecodec.WIRE_VERSION
+            client.reply(intent, {"wire": wirecodec.WIRE_VERSION if client.binary else 0}, request_id)
+        elif intent == 12:
+            self._subscribe(client, msg.get("stream"), msg.get("rate"))
+        elif intent in REPLY_INTENTS:
+            # the link replaces the id with its own; the client's goes back in the reply
+            try:
+                future = self.link.request_async(msg)
+            except RuntimeError as e:
+                client.write(f"broker: {e}\r\n".encode("utf-8"))
+                return
+            with self._lock:
+                client.requests[future] = (intent, time.monotonic() + self.request_timeout)
+            future.add_done_callback(lambda f: self._answer(client, intent, f, request_id))
+        else:
+            self.link.send(msg)
+
+    def _answer(self, client, intent, future, request_id):
+        with self._lock:
+            client.requests.pop(future, None)
+        if future.cancelled() or future.exception() is not None or client.closed:
+            return
+        reply = future.result()
+        if intent == 6 and not client.binary and "protocol" not in reply:
+            reply = dict(reply, protocol=self.protocol)
+        client.reply(intent, reply, request_id)
+
+    def _subscribe(self, client, stream, rate):
+        if stream not in STREAM_INTENTS or not isinstance(rate, (int, float)):
+            return
+        old = client.subscriptions.pop(stream, None)
+        if old is not None:
+            old.close()
+        if rate > 0:
+            try:
+                client.subscriptions[stream] = self.link.subscribe(
+                    stream, rate, lambda msg: client.reply(stream, msg))
+            except RuntimeError:
+                pass  # older firmware would stop the robot on intent 12; nothing is pushed
+
+    def _drop(self, client):
+        with self._lock:
+            self.clients.discard(client)
+        for subscription in list(client.subscriptions.values()):
+            subscription.close()
+        client.subscriptions.clear()
+        client.closed = True
+        with self._lock:
+            requests = list(client.requests.items())
+        self._cancel(requests)
+        try:
+            client.sock.close()
+        except OSError:
+            pass
+
+    def _cancel(self, requests):
+        # frees the link's request ids; firmware without ids must not answer them in order
+        for future, (intent, _) in requests:
+            self.link._discard(intent, future)
+            future.cancel()
+
+    def _expire_requests(self):
+        """Give up on requests the device has not answered in `request_timeout`."""
+        while not self._stopped.wait(min(self.request_timeout, 1.0)):
+            now = time.monotonic()
+            with self._lock:
+                overdue = [(future, entry) for client in self.clients
+                           for future, entry in client.requests.items() if entry[1] <= now]
+            self._cancel(overdue)
+
+    def _device_text(self, msg):
+        if isinstance(msg, str):
+            with self._lock:
+                clients = list(self.clients)
+            for client in clients:
+                client.write((msg + "\r\n").encode("utf-8", "replace"))
+
+
+class UnixSocketPort:
+    """pyserial-like port on a Unix socket, for `unix://PATH` in `open_port`."""
+
+    def __init__(self, path, timeout=1):
+        self.port = f"unix://{path}"
+        self.timeout = timeout
+        self.is_open = True
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(path)
+
+    @property
+    def in_waiting(self):
+        try:
+            return len(self._sock.recv(65536, socket.MSG_PEEK | socket.MSG_DONTWAIT))
+        except BlockingIOError:
+            return 0
+
+    def read(self, size=1):
+        ready, _, _ = select.select([self._sock], [], [], self.timeout)
+        if not ready:
+            return b''
+        data = self._sock.recv(size)
+        if not data:
+            self.is_open = False
+            raise OSError("broker closed the connection")
+        return data
+
+    def write(self, data):
+        self._sock.sendall(data)
+        return len(data)
+
+    def close(self):
+        self.is_open = False
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Share one device port between several tools")
+    parser.add_argument("port", help="device name or pyserial URL")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--host", default="localhost", help="TCP address to listen on (default localhost)")
+    parser.add_argument("--tcp", type=int, default=DEFAULT_PORT, metavar="PORT",
+                        help=f"TCP port (default {DEFAULT_PORT}, 0 to disable)")
+    parser.add_argument("--unix", metavar="PATH", help="also listen on this Unix socket")
+    parser.add_argument("--json", action="store_true", help="talk JSON to the device even if it supports binary")
+    args = parser.parse_args()
+
+    link = Transport(open_port(args.port, args.baudrate, timeout=1))
+    broker = Broker(link, binary=not args.json)
+    print(f"Device protocol {broker.protocol}, {'binary' if link.binary else 'JSON'} encoding")
+    try:
+        broker.serve(args.host, args.tcp or None, args.unix)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Control several platforms at once from one asyncio event loop.
+
+`AsyncPlatform` wraps a `Transport` with coroutines: `send()` and
+`request()` return immediately to the event loop while the port does its
+work, so requests to many devices overlap. Each platform keeps its own
+writer thread (writes to one device stay in order, a slow port does not
+hold up the others) next to the transport's reader thread; replies are
+handed to the loop through the transport's futures.
+
+`Fleet` addresses a set of platforms by name: `broadcast()` sends a command
+to all of them, `request_all()` / `status()` gather replies concurrently
+with a per-device timeout, so checking 30 robots takes one round trip
+instead of 30.
+
+    async def main():
+        fleet = await Fleet.connect(["COM3", "socket://mover2:9000", "rfc2217://mover3:4000"])
+        try:
+            for name, status in (await fleet.status(timeout=1.0)).items():
+                print(name, status and status["batteryVoltage"])
+            await fleet.stop()
+        finally:
+            await fleet.close()
+
+    python fleet.py status COM3 socket://mover2:9000 @movers.txt
+    python fleet.py stop @movers.txt
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from transport import Transport, open_port
+
+STOP = {"intent": 3, "setStatus": False}
+START = {"intent": 2}
+STATUS = {"intent": 6}
+
+
+class AsyncPlatform:
+    """Coroutine interface to one device; see `Fleet.connect` to open many."""
+
+    def __init__(self, link, name=None):
+        self.link = link
+        self.name = name or link.name
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"fleet-{self.name}")
+
+    @classmethod
+    async def open(cls, url, baudrate=115200, name=None):
+        """Open `url` (device name or pyserial URL) without blocking the loop."""
+        loop = asyncio.get_running_loop()
+        port = await loop.run_in_executor(None, lambda: open_port(url, baudrate, timeout=1))
+        return cls(Transport(port), name or url)
+
+    async def send(self, obj):
+        """Send `obj`; returns the bytes written."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self.link.send, obj)
+
+    async def request(self, obj, timeout=2.0):
+        """Send `obj` and return its reply, or None if none arrived within `timeout`."""
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(self._writer, self.link.request_async, obj)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def status(self, timeout=2.0):
+        return await self.request(STATUS, timeout)
+
+    async def subscribe(self, stream, rate, callback):
+        """`Transport.subscribe`, with `callback(msg)` run on the event loop."""
+        loop = asyncio.get_running_loop()
+        deliver = lambda msg: loop.call_soon_threadsafe(callback, msg)
+        return await loop.run_in_executor(self._writer, self.link.subscribe, stream, rate, deliver)
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._writer, self.link.close)
+        self._writer.shutdown(wait=False)
+
+
+class Fleet:
+    """A named set of `AsyncPlatform`s driven concurrently.
+
+    Results are dicts keyed by platform name. A device that fails or does
+    not answer in time maps to None (or False for `broadcast`) and the
+    reason is kept in `errors`.
+    """
+
+    def __init__(self, platforms=()):
+        self.platforms = {p.name: p for p in platforms}
+        self.errors = {}
+
+    @classmethod
+    async def connect(cls, urls, baudrate=115200):
+        """Open all `urls` concurrently; ports that fail to open are listed in `errors`."""
+        urls = list(urls)
+        opened = await asyncio.gather(*(AsyncPlatform.open(url, baudrate) for url in urls),
+                                      return_exceptions=True)
+        fleet = cls(p for p in opened if isinstance(p, AsyncPlatform))
+        for url, result in zip(urls, opened):
+            if isinstance(result, Exception):
+                fleet.errors[url] = result
+        return fleet
+
+    def __len__(self):
+        return len(self.platforms)
+
+    async def broadcast(self, obj):
+        """Send `obj` to every platform; returns {name: True if written}."""
+        return await self._gather(lambda p: p.send(obj), lambda result: True, False)
+
+    async def request_all(self, obj, timeout=2.0):
+        """Send `obj` to every platform and gather the replies ({name: reply or None})."""
+        return await self._gather(lambda p: p.request(obj, timeout), lambda reply: reply, None)
+
+    async def status(self, timeout=2.0):
+        """Intent 6 status of every platform."""
+        return await self.request_all(STATUS, timeout)
+
+    async def stop(self):
+        """Stop all motors (intent 3 with `setStatus` false)."""
+        return await self.broadcast(STOP)
+
+    async def start(self):
+        """Start the stored waypoint routes (intent 2)."""
+        return await self.broadcast(START)
+
+    async def close(self):
+        await asyncio.gather(*(p.close() for p in self.platforms.values()), return_exceptions=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _gather(self, call, convert, failed):
+        names = list(self.platforms)
+        results = await asyncio.gather(*(call(self.platforms[n]) for n in names), return_exceptions=True)
+        out = {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                self.errors[name] = result
+                out[name] = failed
+            else:
+                self.errors.pop(name, None)
+                out[name] = convert(result)
+        return out
+
+
+def _status_line(name, status):
+    if status is None:
+        return f"{name}: no reply"
+    fix = "fix" if status["fix"] else "no fix"
+    mode = "busy" if status["motorHandled"] else "idle"
+    return (f"{name}: {status['batteryVoltage']:.2f} V, {status['numSats']} sats ({fix}), "
+            f"heading {status['heading']:.1f}, {mode}")
+
+
+async def _run(args):
+    fleet = await Fleet.connect(args.ports, args.baudrate)
+    for url, error in fleet.errors.items():
+        print(f"{url}: cannot open: {error}")
+    async with fleet:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        if args.command == "status":
+            results = await fleet.status(args.timeout)
+            for name, status in results.items():
+                print(_status_line(name, status))
+        else:
+            results = await (fleet.stop() if args.command == "stop" else fleet.start())
+            for name, sent in results.items():
+                print(f"{name}: {'sent' if sent else 'failed: ' + str(fleet.errors.get(name))}")
+        print(f"{len(fleet)} platforms in {(loop.time() - started) * 1000:.0f} ms")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Send commands to several platforms at once",
+                                     fromfile_prefix_chars="@")
+    parser.add_argument("command", choices=["status", "stop", "start"])
+    parser.add_argument("ports", nargs="+", help="device names or pyserial URLs (@file reads one per line)")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--timeout", type=float, default=2.0, help="seconds to wait for each status reply")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Batched kinematic model of `goTo` / `wpManagerExec` for parameter sweeps.
+
+`simulate()` drives many virtual robots along one route in lock-step,
+each with its own `speed`, `range` and motor bias (intent 10), running the
+firmware's control law on NumPy arrays:
+
+- every `GOTO_PERIOD` the distance and course to the current waypoint
+  from the last GPS fix (the TinyGPSPlus formulas, see `geodesy`); within
+  `range` the waypoint is reached and the next one is steered to in the
+  same pass, as `wpManagerExec` calls `goTo` again at once;
+- the course error against the compass heading, normalised to
+  [-180, 180] and split into tank-steering setpoints, with `speed`
+  truncated to an int and the setpoints constrained to 0-100;
+- GPS fixes every `GPS_INTERVAL`, each robot at its own phase;
+- the drive model of `simulator`: setpoint x bias x motor gain x
+  `WHEEL_SPEED_PER_UNIT` per track, `TRACK_WIDTH` apart.
+
+Robots move in the route's local east/north frame (`geodesy.local_frame`);
+fixes are converted to latitude / longitude for the control law,
+optionally with GPS and compass noise. The step is 0.02 s, so control
+periods and fixes fall on steps. A single noise-free robot finishes
+within a control period or two of `simulator.DeviceSimulator` (which
+integrates on a sphere): the int truncation of the setpoints amplifies
+millimetre differences in position. Lost fixes (`gps.location.age() > 2000`) are
+not modelled.
+
+`sweep()` runs every combination of parameter values on one or more
+routes in a process pool and reports, per route and parameter set, how
+many runs finished, their completion time and how far the robots strayed
+from the route:
+
+    python gotosim.py route.kml --speed 40 70 100 --range 1 2 3
+    python gotosim.py a.kml b.kml --bias-r 0.95 1.0 1.05 --gain 1.0 0.97 --gps-noise 1.5 --repeats 20 --csv sweep.csv
+"""
+import itertools
+import math
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import geodesy
+import route
+from simulator import GOTO_PERIOD, GPS_INTERVAL, TRACK_WIDTH, WHEEL_SPEED_PER_UNIT
+
+STEP = 0.02                                 # s; GOTO_PERIOD and GPS_INTERVAL are multiples
+CONTROL_STEPS = round(GOTO_PERIOD / STEP)
+GPS_STEPS = round(GPS_INTERVAL / STEP)
+DEVIATION_STEPS = 5                         # sample the deviation every 0.1 s
+MAX_BATCH = 4096                            # robots per process pool task
+MIN_BATCH = 64
+
+Results = namedtuple("Results", "finished time_s max_deviation_m rms_deviation_m travelled_m")
+SweepRow = namedtuple("SweepRow", "route speed range bias_l bias_r runs finished time_s time_p90_s "
+                                  "max_deviation_m rms_deviation_m")
+
+
+def simulate(lon, lat, speed, range_m, bias_l=1.0, bias_r=1.0, motor_gain=(1.0, 1.0),
+             gps_noise=0.0, heading_noise=0.0, gps_phase=None, heading=None, max_time=None, seed=None):
+    """Drive robots along the route (`lon`, `lat`); returns `Results` of arrays.
+
+    `speed`, `range_m`, `bias_l` and `bias_r` are scalars or arrays with
+    one entry per robot. `motor_gain` is the (left, right) drive strength
+    of the robot itself, which the bias is meant to correct.
+    `gps_noise` (m) and `heading_noise` (degrees) are standard deviations
+    per fix and per compass reading. `gps_phase` is the time to the first
+    fix (default: random per robot). Robots start on the first waypoint,
+    facing `heading` (default: towards the second). A robot that has not
+    finished after `max_time` (default: four times the drive time plus a
+    minute) has `finished` False and `time_s` NaN.
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    count = len(lon)
+    if not route.MIN_WAYPOINTS <= count <= route.MAX_WAYPOINTS:
+        raise ValueError(f"route has {count} waypoints, the device accepts "
+                         f"{route.MIN_WAYPOINTS}-{route.MAX_WAYPOINTS}")
+    speed, range_m, bias_l, bias_r = (np.ravel(a).astype(np.float64) for a in np.broadcast_arrays(
+        speed, range_m, bias_l, bias_r))
+    n = len(speed)
+    rng = np.random.default_rng(seed)
+
+    frame = geodesy.local_frame(float(lat[0]), float(lon[0]))
+    wp_e, wp_n, _ = frame.forward(lon, lat)
+    # goTo(lat, lon, int speed, range)
+    setpoint = np.trunc(speed)
+    gain_l = bias_l * motor_gain[0] * WHEEL_SPEED_PER_UNIT
+    gain_r = bias_r * motor_gain[1] * WHEEL_SPEED_PER_UNIT
+    if max_time is None:
+        mps = np.clip(setpoint, 0, geodesy.MAX_SETPOINT) * np.minimum(gain_l, gain_r)
+        moving = mps[mps > 0]
+        slowest = moving.min() if len(moving) else 1.0
+        max_time = 60.0 + 4.0 * geodesy.analyze(lon, lat).distance_m / slowest
+
+    east = np.zeros(n)
+    north = np.zeros(n)
+    if heading is None:
+        heading = geodesy.course_to(lat[0], lon[0], lat[1], lon[1])
+    # heading as a unit vector (east, north); between control periods the
+    # setpoints are fixed, so every step turns it by the same rotation
+    h = math.radians(float(heading))
+    hdg_e = np.full(n, math.sin(h))
+    hdg_n = np.full(n, math.cos(h))
+    rot_c = np.ones(n)
+    rot_s = np.zeros(n)
+    step_m = np.zeros(n)
+    # last fix, in the local frame; converted to lat / lon when the control law reads it
+    fix_e = np.zeros(n)
+    fix_n = np.zeros(n)
+    if gps_phase is None:
+        first_fix = rng.integers(1, GPS_STEPS + 1, n)
+    else:
+        first_fix = np.full(n, max(1, round(gps_phase / STEP)))
+    # robots due a fix at step k: fix_groups[k % GPS_STEPS] (at k = 0 they are all at the origin)
+    fix_groups = [np.flatnonzero(first_fix % GPS_STEPS == r) for r in range(GPS_STEPS)]
+    target = np.zeros(n, dtype=np.intp)
+    done = np.zeros(n, dtype=bool)
+    time_s = np.full(n, np.nan)
+    set_l = np.zeros(n)
+    set_r = np.zeros(n)
+    max_dev = np.zeros(n)
+    sum_sq = np.zeros(n)
+    samples = np.zeros(n)
+    travelled = np.zeros(n)
+
+    def control(t):
+        check = np.flatnonzero(~done)
+        gps_lon = np.empty(n)
+        gps_lat = np.empty(n)
+        gps_lon[check], gps_lat[check], _ = frame.inverse(fix_e[check], fix_n[check])
+        while len(check):
+            distance = geodesy.distance_between(gps_lat[check], gps_lon[check],
+                                                lat[target[check]], lon[target[check]])
+            check = check[distance <= range_m[check]]
+            target[check] += 1
+            finished = check[target[check] >= count]
+            done[finished] = True
+            time_s[finished] = t
+            set_l[finished] = 0
+            set_r[finished] = 0
+            check = check[target[check] < count]
+        a = np.flatnonzero(~done)
+        if not len(a):
+            return
+        course = geodesy.course_to(gps_lat[a], gps_lon[a], lat[target[a]], lon[target[a]])
+        measured = np.degrees(np.arctan2(hdg_e[a], hdg_n[a])) % 360.0
+        if heading_noise:
+            measured = (measured + rng.normal(0.0, heading_noise, len(a))) % 360.0
+        error = geodesy.normalize_angle(course - measured)
+        sp = setpoint[a]
+        cut = np.trunc(np.abs(error) / 180.0 * sp)
+        set_l[a] = np.clip(np.where(error < 0, sp - cut, sp), 0, geodesy.MAX_SETPOINT)
+        set_r[a] = np.clip(np.where(error > 0, sp - cut, sp), 0, geodesy.MAX_SETPOINT)
+
+    for k in range(int(math.ceil(max_time / STEP)) + 1):
+        fixes = fix_groups[k % GPS_STEPS]
+        if len(fixes):
+            fix_e[fixes] = east[fixes]
+            fix_n[fixes] = north[fixes]
+            if gps_noise:
+                fix_e[fixes] += rng.normal(0.0, gps_noise, len(fixes))
+                fix_n[fixes] += rng.normal(0.0, gps_noise, len(fixes))
+        if k % CONTROL_STEPS == 0:
+            control(k * STEP)
+            if done.all():
+                break
+            vl = set_l * gain_l
+            vr = set_r * gain_r
+            step_m = (vl + vr) * (0.5 * STEP)
+            turn = (vl - vr) / TRACK_WIDTH * STEP
+            np.cos(turn, out=rot_c)
+            np.sin(turn, out=rot_s)
+            norm = np.hypot(hdg_e, hdg_n)
+            hdg_e /= norm
+            hdg_n /= norm
+        if k % DEVIATION_STEPS == 0:
+            # distance to the leg being driven (previous waypoint to target)
+            active = ~done
+            b = np.minimum(target, count - 1)
+            p = np.maximum(b - 1, 0)
+            dx = wp_e[b] - wp_e[p]
+            dy = wp_n[b] - wp_n[p]
+            length2 = dx * dx + dy * dy
+            px = east - wp_e[p]
+            py = north - wp_n[p]
+            u = np.clip((px * dx + py * dy) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+            deviation = np.where(active, np.hypot(px - u * dx, py - u * dy), 0.0)
+            np.maximum(max_dev, deviation, out=max_dev)
+            sum_sq += deviation * deviation
+            samples += active
+        hdg_e, hdg_n = hdg_e * rot_c + hdg_n * rot_s, hdg_n * rot_c - hdg_e * rot_s
+        east += step_m * hdg_e
+        north += step_m * hdg_n
+        travelled += np.abs(step_m)
+
+    rms = np.sqrt(sum_sq / np.maximum(samples, 1))
+    return Results(done, time_s, max_dev, rms, travelled)
+
+
+def _run_batch(lon, lat, params, model, seed):
+    """Worker: simulate one batch; `params` rows are (speed, range, bias_l, bias_r)."""
+    speed, range_m, bias_l, bias_r = params.T
+    return simulate(lon, lat, speed, range_m, bias_l, bias_r, seed=seed, **model)
+
+
+def sweep(routes, speeds=(60,), ranges=(2.0,), biases_l=(1.0,), biases_r=(1.0,), repeats=1,
+          workers=None, seed=0, **model):
+    """Simulate every parameter combination on every route; returns `SweepRow`s.
+
+    `routes` maps a name to (lon, lat) waypoints. Each combination runs
+    `repeats` times (differing in GPS phase and noise); `model` is passed
+    on to `simulate()`. Batches run in a pool of `workers` processes
+    (one: in this process).
+    """
+    grid = list(itertools.product(speeds, ranges, biases_l, biases_r))
+    params = np.repeat(np.array(grid, dtype=np.float64).reshape(-1, 4), repeats, axis=0)
+    workers = workers or os.cpu_count() or 1
+    batch = min(MAX_BATCH, max(MIN_BATCH, -(-len(params) // workers)))
+    tasks = []
+    for name, (lon, lat) in routes.items():
+        for start in range(0, len(params), batch):
+            tasks.append((name, start, (lon, lat, params[start:start + batch], model, seed + len(tasks))))
+
+    columns = {name: [np.empty(len(params)) for _ in range(4)] for name in routes}
+    if workers == 1:
+        outcomes = [_run_batch(*args) for _, _, args in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_batch, *args) for _, _, args in tasks]
+            outcomes = [future.result() for future in futures]
+    for (name, start, _), result in zip(tasks, outcomes):
+        for column, values in zip(columns[name], (result.finished, result.time_s,
+                                                  result.max_deviation_m, result.rms_deviation_m)):
+            column[start:start + len(values)] = values
+
+    rows = []
+    for name, (finished, time_s, max_dev, rms) in columns.items():
+        for i, (speed, range_m, bias_l, bias_r) in enumerate(grid):
+            runs = slice(i * repeats, (i + 1) * repeats)
+            times = time_s[runs][finished[runs] > 0]
+            rows.append(SweepRow(
+                name, speed, range_m, bias_l, bias_r, repeats, int(finished[runs].sum()),
+                float(np.median(times)) if len(times) else math.nan,
+                float(np.percentile(times, 90)) if len(times) else math.nan,
+                float(max_dev[runs].max()), float(rms[runs].mean())))
+    return rows
+
+
+def main():
+    import argparse
+    import csv
+    import time
+    from pathlib import Path
+
+    import routecache
+
+    parser = argparse.ArgumentParser(description="Sweep goTo parameters on a model of the robot")
+    parser.add_argument("routes", nargs="+", help="KML files")
+    parser.add_argument("--speed", type=float, nargs="+", default=[60.0], help="speed setpoints")
+    parser.add_argument("--range", type=float, nargs="+", default=[2.0], help="waypoint ranges in m")
+    parser.add_argument("--bias-l", type=float, nargs="+", default=[1.0], help="left motor bias factors")
+    parser.add_argument("--bias-r", type=float, nargs="+", default=[1.0], help="right motor bias factors")
+    parser.add_argument("--gain", type=float, nargs=2, default=[1.0, 1.0], metavar=("LEFT", "RIGHT"),
+                        help="drive strength of the robot's left and right motors")
+    parser.add_argument("--gps-noise", type=float, default=0.0, help="GPS error (standard deviation, m)")
+    parser.add_argument("--heading-noise", type=float, default=0.0,
+                        help="compass error (standard deviation, degrees)")
+    parser.add_argument("--repeats", type=int, default=1, help="runs per parameter set")
+    parser.add_argument("--max-points", type=int, default=route.MAX_WAYPOINTS,
+                        help="waypoint limit of the uploaded route (default: the device maximum)")
+    parser.add_argument("--max-time", type=float, help="seconds before a run counts as unfinished")
+    parser.add_argument("--workers", type=int, help="processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", help="also write the results to this CSV file")
+    args = parser.parse_args()
+
+    routes = {}
+    for path in args.routes:
+        prepared = routecache.prepare(path, args.max_points)
+        routes[Path(path).name] = (prepared.lon, prepared.lat)
+
+    started = time.perf_counter()
+    rows = sweep(routes, args.speed, args.range, args.bias_l, args.bias_r, repeats=args.repeats,
+                 workers=args.workers, seed=args.seed, motor_gain=tuple(args.gain),
+                 gps_noise=args.gps_noise, heading_noise=args.heading_noise, max_time=args.max_time)
+    elapsed = time.perf_counter() - started
+
+    print(f"{'route':<20} {'speed':>6} {'range':>6} {'biasL':>6} {'biasR':>6} {'done':>9} "
+          f"{'time s':>8} {'p90 s':>8} {'max dev':>8} {'rms dev':>8}")
+    for r in rows:
+        print(f"{r.route[:20]:<20} {r.speed:>6g} {r.range:>6g} {r.bias_l:>6g} {r.bias_r:>6g} "
+              f"{f'{r.finished}/{r.runs}':>9} {r.time_s:>8.1f} {r.time_p90_s:>8.1f} "
+              f"{r.max_deviation_m:>8.2f} {r.rms_deviation_m:>8.2f}")
+    runs = len(rows) * args.repeats
+    print(f"{runs} runs in {elapsed:.1f} s")
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(SweepRow._fields)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
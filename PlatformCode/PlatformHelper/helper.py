@@ -1,10 +1,6 @@
-import serial
 import json
-import time
 import os
-import intent5
-import intent6
-import intent9
+from transport import Transport, open_port
 
 
 def clear():
@@ -14,14 +10,7 @@ def clear():
 def open_serial():
     port = input("Bot Serial Port (e.g. COM3): ")
     try:
-        ser = serial.Serial(
-            port=port,
-            baudrate=115200,
-            parity=serial.PARITY_NONE,
-            stopbits=serial.STOPBITS_ONE,
-            bytesize=serial.EIGHTBITS,
-            timeout=1,
-        )
+        ser = open_port(port, baudrate=115200, timeout=1)
         print(f"Opened serial port {port} at 115200")
         return ser
     except Exception as e:
@@ -29,44 +18,8 @@ def open_serial():
         return None
 
 
-def send_json(ser, obj):
-    data = json.dumps(obj).encode('utf-8')
-    ser.write(data)
-
-
-def read_json_response(ser, timeout=2.0):
-    start = time.time()
-    collected = []
-    while time.time() - start < timeout:
-        line = ser.readline()
-        if not line:
-            time.sleep(0.02)
-            continue
-        try:
-            text = line.decode('utf-8', errors='replace').strip()
-        except Exception:
-            continue
-        if not text:
-            continue
-        collected.append(text)
-        # try full-line JSON
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            # try extract {...}
-            s = text.find('{')
-            e = text.rfind('}')
-            if s != -1 and e != -1 and e > s:
-                try:
-                    return json.loads(text[s:e+1])
-                except json.JSONDecodeError:
-                    pass
-    # timed out
-    if collected:
-        print("Received (incomplete) lines:")
-        for l in collected:
-            print("  ", l)
-    return None
+def send_json(link, obj):
+    link.send(obj)
 
 
 def pretty_print(obj):
@@ -76,11 +29,11 @@ def pretty_print(obj):
         print(obj)
 
 
-def menu(ser):
+def menu(link):
     while True:
         clear()
         print("=== OpenMoverPlatform Helper ===")
-        print("Serial:", ser.port)
+        print("Serial:", link.name)
         print()
         print(" 1) Request stored coordinates from device (intent 1)")
         print(" 2) Start waypoint navigation (intent 2)")
@@ -103,8 +56,7 @@ def menu(ser):
             break
 
         if choice == 1:
-            send_json(ser, {"intent": 1})
-            resp = read_json_response(ser, timeout=2.0)
+            resp = link.request({"intent": 1}, timeout=2.0)
             if resp is None:
                 print("No response received.")
             else:
@@ -119,14 +71,14 @@ def menu(ser):
             input("Press Enter to continue...")
 
         elif choice == 2:
-            send_json(ser, {"intent": 2})
+            send_json(link, {"intent": 2})
             print("Start command sent.")
             input("Press Enter to continue...")
 
         elif choice == 3:
             val = input("Set direct serial motor control? (y/N): ").strip().lower()
             status = True if val == 'y' else False
-            send_json(ser, {"intent": 3, "setStatus": status})
+            send_json(link, {"intent": 3, "setStatus": status})
             print("Command sent.")
             input("Press Enter to continue...")
 
@@ -138,18 +90,20 @@ def menu(ser):
                 print("Invalid value(s).")
                 input("Press Enter to continue...")
                 continue
-            send_json(ser, {"intent": 4, "leftPWM": left, "rightPWM": right})
+            send_json(link, {"intent": 4, "leftPWM": left, "rightPWM": right})
             print("PWM set sent.")
             input("Press Enter to continue...")
 
         elif choice == 5:
             print("Upload coordinates from KML file")
-            intent5.process(ser)
+            import intent5
+            intent5.process(link)
             input("Upload finished. Press Enter to continue...")
 
         elif choice == 6:
             print("Requesting system information (intent 6) — will display and allow repeated requests.")
-            intent6.process(ser)
+            import intent6
+            intent6.process(link)
             input("Returned to menu. Press Enter to continue...")
 
         elif choice == 7:
@@ -162,18 +116,19 @@ def menu(ser):
                 print("Invalid numeric input.")
                 input("Press Enter to continue...")
                 continue
-            send_json(ser, {"intent": 7, "lat": lat, "lon": lon, "speed": speed, "range": rng})
+            send_json(link, {"intent": 7, "lat": lat, "lon": lon, "speed": speed, "range": rng})
             print("GoTo command sent.")
             input("Press Enter to continue...")
 
         elif choice == 8:
-            send_json(ser, {"intent": 8})
+            send_json(link, {"intent": 8})
             print("Calibration requested (intent 8).")
             input("Press Enter to continue...")
 
         elif choice == 9:
             print("Start magnetometer logging — this will repeatedly request data and write to a file.")
-            intent9.process(ser)
+            import intent9
+            intent9.process(link)
             input("Logging ended. Press Enter to continue...")
 
         elif choice == 10:
@@ -184,7 +139,7 @@ def menu(ser):
                 print("Invalid input.")
                 input("Press Enter to continue...")
                 continue
-            send_json(ser, {"intent": 10, "biasL": biasL, "biasR": biasR})
+            send_json(link, {"intent": 10, "biasL": biasL, "biasR": biasR})
             print("Bias command sent.")
             input("Press Enter to continue...")
 
@@ -204,13 +159,11 @@ def main():
             if again == 'n':
                 print("Exiting.")
                 return
+    link = Transport(ser)
     try:
-        menu(ser)
+        menu(link)
     finally:
-        try:
-            ser.close()
-        except Exception:
-            pass
+        link.close()
 
 
 if __name__ == '__main__':
@@ -2,63 +2,59 @@
 """
 Enhanced CLI Platform Helper Tool for OpenMoverPlatform
 Supports all serial communication intents (1-10)
+
+Without a command it shows an interactive menu. With one it runs that
+command, prints the result as JSON on stdout and exits, for scripts and
+cron jobs (exit status 1 when the device did not answer):
+
+    python helper_cli.py status COM3
+    python helper_cli.py upload COM3 route.kml --speed 1.5 --range 2
+    python helper_cli.py goto COM3 47.42 12.85 --speed 1 --range 2
+    python helper_cli.py stop COM3
+    python helper_cli.py log-mag COM3 --duration 60 --output mag.jsonl
+
+Modules are imported only by the commands that use them (NumPy only for
+`upload`), so a `status` call starts in a few tens of milliseconds.
 """
 
-import serial
 import json
-import time
 import sys
-import os
-from pathlib import Path
 
-# Import existing modules
-import parsekml
+ONE_SHOT_READ_TIMEOUT = 0.1     # port read timeout; bounds how long closing takes
 
 
 class PlatformCLI:
-    def __init__(self, port_name, baudrate=115200):
+    def __init__(self, port_name, baudrate=115200, binary=False):
         """Initialize serial connection to the platform"""
+        from transport import Transport, open_port
+
         try:
-            self.ser = serial.Serial(
-                port=port_name,
-                baudrate=baudrate,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                bytesize=serial.EIGHTBITS,
-                timeout=2
-            )
+            self.ser = open_port(port_name, baudrate=baudrate, timeout=2)
+            self.link = Transport(self.ser)
             print(f"Connected to {port_name} at {baudrate} baud")
         except Exception as e:
             print(f"Error connecting to port: {e}")
             sys.exit(1)
+        if binary:
+            if self.link.negotiate():
+                print("Using binary wire encoding")
+            else:
+                print("Device does not support binary wire encoding, using JSON")
 
     def send_json(self, data):
         """Send JSON data to the platform"""
-        json_str = json.dumps(data)
-        self.ser.write(json_str.encode('utf-8'))
-        print(f"Sent: {json_str}")
-
-    def read_json(self, timeout=2):
-        """Read JSON response from the platform"""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if self.ser.in_waiting > 0:
-                try:
-                    line = self.ser.readline().decode('utf-8').strip()
-                    if line:
-                        return json.loads(line)
-                except json.JSONDecodeError as e:
-                    print(f"JSON decode error: {e}")
-                except Exception as e:
-                    print(f"Error reading: {e}")
-            time.sleep(0.1)
-        return None
+        sent = self.link.send(data)
+        print(f"Sent: {json.dumps(data)} ({len(sent)} bytes)")
+
+    def request(self, data, timeout=2):
+        """Send a request (intent 1, 6 or 9) and wait for its JSON reply"""
+        print(f"Sent: {json.dumps(data)}")
+        return self.link.request(data, timeout=timeout)
 
     def intent_1_get_coordinates(self):
         """Intent 1: Get stored coordinates from platform"""
         print("\n=== Get Stored Coordinates ===")
-        self.send_json({"intent": 1})
-        response = self.read_json()
+        response = self.request({"intent": 1})
         if response:
             print(f"Response: {json.dumps(response, indent=2)}")
         else:
@@ -101,6 +97,12 @@ class PlatformCLI:
 
     def intent_5_upload_coordinates(self):
         """Intent 5: Upload coordinates from KML file"""
+        from pathlib import Path
+
+        import geodesy
+        import route
+        import routecache
+
         print("\n=== Upload Coordinates ===")
         kml_path = input("KML file path: ")
         
@@ -109,23 +111,30 @@ class PlatformCLI:
             return
         
         try:
-            kml_array = parsekml.parse(kml_path)
-            kml_array.insert(0, len(kml_array) // 2)
+            max_points = input(f"Max waypoints [{route.MAX_WAYPOINTS}]: ").strip()
+            max_points = int(max_points) if max_points else route.MAX_WAYPOINTS
+            tolerance = input("Max deviation in m (blank for none): ").strip()
+            tolerance = float(tolerance) if tolerance else None
+            prepared = routecache.prepare(kml_path, max_points, tolerance)
+            print(f"Route: {prepared.source_vertices} vertices -> {len(prepared.lon)} waypoints, "
+                  f"max deviation {prepared.error_m:.2f} m")
+            if tolerance is not None and prepared.error_m > tolerance:
+                print("Tolerance cannot be met within the waypoint limit")
+                return
             speed = float(input("Speed: "))
             range_val = float(input("Range: "))
-            kml_array.insert(1, speed)
-            kml_array.insert(2, range_val)
+            print(geodesy.summary(geodesy.analyze(prepared.lon, prepared.lat, speed), speed))
+            coordinates = route.build_coordinates(prepared.lon, prepared.lat, speed, range_val)
             
-            self.send_json({"intent": 5, "coordinates": kml_array})
-            print("Coordinates uploaded successfully")
+            from intent5 import describe_upload
+            print(describe_upload(route.upload(self.link, coordinates)))
         except Exception as e:
             print(f"Error: {e}")
 
     def intent_6_get_status(self):
         """Intent 6: Get platform status"""
         print("\n=== Platform Status ===")
-        self.send_json({"intent": 6})
-        response = self.read_json()
+        response = self.request({"intent": 6})
         
         if response:
             print("\nStatus Information:")
@@ -178,28 +187,29 @@ class PlatformCLI:
 
     def intent_9_log_mag_data(self):
         """Intent 9: Log magnetometer data"""
+        from recorder import Recorder
+
         print("\n=== Log Magnetometer Data ===")
-        file_name = input("Output file name: ")
+        file_name = input("Output file name [mag_data.jsonl]: ").strip() or "mag_data.jsonl"
+        try:
+            rate = float(input("Sample rate in Hz [10]: ").strip() or 10)
+        except ValueError:
+            rate = 10.0
         print("Logging magnetometer data... Press Ctrl+C to stop")
         
-        data_received = []
+        log = Recorder(file_name)
         try:
-            while True:
-                self.send_json({"intent": 9})
-                response = self.read_json(timeout=1)
-                
+            for response in self.link.stream(9, rate):
                 if response:
-                    data_received.append(response)
+                    log.record(response)
                     print(f"Mag: X={response.get('magX', 'N/A')}, Y={response.get('magY', 'N/A')}, "
                           f"Min/Max: X[{response.get('magXMin', 'N/A')}, {response.get('magXMax', 'N/A')}], "
                           f"Y[{response.get('magYMin', 'N/A')}, {response.get('magYMax', 'N/A')}]")
-                
-                time.sleep(1)
         except KeyboardInterrupt:
             print("\nStopping data logging...")
-            with open(file_name, 'w') as f:
-                json.dump(data_received, f, indent=2)
-            print(f"Data saved to {file_name}")
+        finally:
+            log.close()
+        print(f"Saved {log.count} samples to {', '.join(str(p) for p in log.paths)}")
 
     def intent_10_set_motor_bias(self):
         """Intent 10: Set motor bias correction"""
@@ -253,7 +263,7 @@ class PlatformCLI:
 
                 if choice == '0':
                     print("Exiting...")
-                    self.ser.close()
+                    self.close()
                     break
 
                 if choice in menu_actions:
@@ -263,31 +273,191 @@ class PlatformCLI:
 
             except KeyboardInterrupt:
                 print("\n\nExiting...")
-                self.ser.close()
+                self.close()
                 break
             except Exception as e:
                 print(f"Error: {e}")
 
     def close(self):
         """Close serial connection"""
-        if self.ser and self.ser.is_open:
-            self.ser.close()
+        self.link.close()
+
+
+def print_json(obj):
+    sys.stdout.write(json.dumps(obj, separators=(",", ":")) + "\n")
+    sys.stdout.flush()
+
+
+def connect(args):
+    """Transport for a one-shot command, or None after reporting the error"""
+    from transport import Transport, open_port
+
+    try:
+        link = Transport(open_port(args.port, args.baudrate, timeout=ONE_SHOT_READ_TIMEOUT))
+    except Exception as e:
+        print(f"Error connecting to port: {e}", file=sys.stderr)
+        return None
+    if args.binary:
+        link.negotiate()
+    return link
+
+
+def command_status(link, args):
+    response = link.request({"intent": 6}, timeout=args.timeout)
+    if response is None:
+        print("No response received", file=sys.stderr)
+        return 1
+    response.pop("id", None)
+    print_json(response)
+    return 0
+
+
+def command_upload(link, args):
+    import geodesy
+    import route
+    import routecache
+
+    max_points = route.MAX_WAYPOINTS if args.max_points is None else args.max_points
+    prepared = routecache.prepare(args.route, max_points, args.tolerance)
+    if args.tolerance is not None and prepared.error_m > args.tolerance:
+        print(f"Tolerance cannot be met within {max_points} waypoints "
+              f"(max deviation {prepared.error_m:.2f} m)", file=sys.stderr)
+        return 1
+    coordinates = route.build_coordinates(prepared.lon, prepared.lat, args.speed, args.range)
+    stats = geodesy.analyze(prepared.lon, prepared.lat, args.speed)
+    result = route.upload(link, coordinates, force=args.force, timeout=args.timeout)
+    drive_time = None if stats.duration_s == float("inf") else round(stats.duration_s, 1)
+    print_json({"waypoints": len(prepared.lon), "sourceVertices": prepared.source_vertices,
+                "maxDeviation": round(prepared.error_m, 3), "distance": round(stats.distance_m, 1),
+                "driveTime": drive_time, "upload": result.action, "bytes": result.sent})
+    return 0
+
+
+def command_goto(link, args):
+    command = {"intent": 7, "lat": args.lat, "lon": args.lon, "speed": args.speed, "range": args.range}
+    link.send(command)
+    print_json(command)
+    return 0
+
+
+def command_stop(link, args):
+    command = {"intent": 3, "setStatus": False}
+    link.send(command)
+    print_json(command)
+    return 0
+
+
+def command_log_mag(link, args):
+    """Print each sample as a JSON line, or record them to --output and print a summary"""
+    import time
+
+    log = None
+    if args.output:
+        from recorder import Recorder
+        log = Recorder(args.output)
+    end = None if args.duration is None else time.monotonic() + args.duration
+    count = 0
+    samples = link.stream(9, args.rate, timeout=min(args.timeout, args.duration or args.timeout))
+    try:
+        for response in samples:
+            if end is not None and time.monotonic() >= end:
+                break
+            if response is None:
+                continue
+            count += 1
+            if log is not None:
+                log.record(response)
+            else:
+                print_json(response)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        samples.close()
+        if log is not None:
+            log.close()
+    if log is not None:
+        print_json({"samples": log.count, "files": [str(p) for p in log.paths]})
+    return 0 if count else 1
+
+
+COMMANDS = {
+    "status": command_status,
+    "upload": command_upload,
+    "goto": command_goto,
+    "stop": command_stop,
+    "log-mag": command_log_mag,
+}
 
 
 def main():
     """Main entry point"""
-    print("OpenMoverPlatform - Enhanced CLI Helper")
-    print("-" * 50)
-    
-    # Get serial port
-    if len(sys.argv) > 1:
-        port = sys.argv[1]
-    else:
-        port = input("Serial port (e.g., COM3, /dev/ttyUSB0): ")
-    
-    # Create and run CLI
-    cli = PlatformCLI(port)
-    cli.run()
+    import argparse
+
+    argv = sys.argv[1:]
+    # options shared by all commands, accepted before or after the command
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument("--baudrate", type=int, default=115200)
+    options.add_argument("--binary", action="store_true", help="negotiate the binary wire encoding")
+    options.add_argument("--timeout", type=float, default=2.0, help="seconds to wait for a reply")
+    settings, rest = options.parse_known_args(argv)
+    command = next((a for a in rest if not a.startswith("-")), None)
+    # `helper_cli.py -h` describes the commands; a port or nothing starts the menu
+    wants_help = bool({"-h", "--help"} & set(rest))
+    one_shot = command in COMMANDS or (command is None and wants_help)
+    if not one_shot:
+        parser = argparse.ArgumentParser(description="OpenMoverPlatform interactive helper")
+        parser.add_argument("port", nargs="?", help="device name or pyserial URL (asked for if omitted)")
+        parser.add_argument("--baudrate", type=int, default=115200)
+        parser.add_argument("--binary", action="store_true", help="negotiate the binary wire encoding")
+        args = parser.parse_args(argv)
+        print("OpenMoverPlatform - Enhanced CLI Helper")
+        print("-" * 50)
+        port = args.port or input("Serial port (e.g., COM3, /dev/ttyUSB0): ")
+        cli = PlatformCLI(port, args.baudrate, binary=args.binary)
+        cli.run()
+        return
+
+    parser = argparse.ArgumentParser(
+        description="Run one command and print the result as JSON; "
+                    "without a command (helper_cli.py [PORT]) an interactive menu starts",
+        parents=[options])
+    port = argparse.ArgumentParser(add_help=False)
+    port.add_argument("port", help="device name or pyserial URL")
+    sub = parser.add_subparsers(dest="command", metavar="command", required=True)
+    sub.add_parser("status", parents=[port], help="print the platform status (intent 6)")
+    p = sub.add_parser("upload", parents=[port], help="upload a KML route as waypoints (intent 5)")
+    p.add_argument("route", help="KML file")
+    p.add_argument("--speed", type=float, default=1.0)
+    p.add_argument("--range", type=float, default=2.0, help="waypoint acceptance range in m")
+    p.add_argument("--max-points", type=int, help="waypoint limit (default: the device maximum)")
+    p.add_argument("--tolerance", type=float, help="fail if the route deviates more than this many m")
+    p.add_argument("--force", action="store_true", help="send the route even if the device already holds it")
+    p = sub.add_parser("goto", parents=[port], help="drive to one coordinate (intent 7)")
+    p.add_argument("lat", type=float)
+    p.add_argument("lon", type=float)
+    p.add_argument("--speed", type=float, default=1.0)
+    p.add_argument("--range", type=float, default=2.0, help="acceptance range in m")
+    sub.add_parser("stop", parents=[port], help="stop the motors and any navigation (intent 3)")
+    p = sub.add_parser("log-mag", parents=[port], help="log magnetometer samples (intent 9) as JSON lines")
+    p.add_argument("--duration", type=float, help="seconds to log (default: until Ctrl+C)")
+    p.add_argument("--rate", type=float, default=10.0, help="samples per second")
+    p.add_argument("--output", help="record to this JSON Lines file instead of stdout")
+    # the shared options are already in `settings`; the subcommand parses the rest
+    args = parser.parse_args(rest, namespace=settings)
+
+    link = connect(args)
+    if link is None:
+        sys.exit(1)
+    try:
+        status = COMMANDS[args.command](link, args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        status = 1
+    finally:
+        # let the last command leave the UART before the port closes
+        getattr(link.port, "flush", lambda: None)()
+        link.close()
+    sys.exit(status)
 
 
 if __name__ == "__main__":
@@ -2,6 +2,12 @@
 """
 Modern GUI Platform Helper Tool for OpenMoverPlatform
 Features: Real-time status monitoring, motor control, waypoint management, compass calibration
+
+Only the Tk thread touches widgets. Port I/O runs on worker threads:
+commands are written in order by one I/O thread that never waits for a
+reply, replies arrive through `Transport` futures, and background loops
+post their results to a queue that `drain_ui_queue` empties every
+`UI_INTERVAL_MS`, keeping only the newest status per drain.
 """
 
 import tkinter as tk
@@ -9,11 +15,22 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import serial
 import serial.tools.list_ports
 import json
+import queue
 import time
 import threading
-import socket
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import parsekml
+import geodesy
+import magcal
+import route
+import routecache
+from intent5 import describe_upload
+from magplot import MagPlot
+from mapview import MapView
+from recorder import Recorder
+from scheduler import MOTION_INTENTS, Scheduler
+from transport import Transport, open_port
 
 try:
     from serial.rfc2217 import Serial as RFC2217Serial
@@ -21,6 +38,9 @@ try:
 except ImportError:
     RFC2217_AVAILABLE = False
 
+UI_INTERVAL_MS = 50     # queue drain period (20 Hz)
+MAX_LOG_LINES = 2000
+
 
 class PlatformGUI:
     def __init__(self, root):
@@ -29,12 +49,19 @@ class PlatformGUI:
         self.root.geometry("1000x700")
         
         self.ser = None
+        self.link = None
         self.connected = False
-        self.auto_status_running = False
-        self.status_thread = None
+        self.status_scheduler = None
         self.connection_type = "serial"  # "serial" or "network"
         
+        self.ui_queue = queue.Queue()
+        self.log_lines = deque()
+        self.mag_samples = deque()
+        self.status_texts_shown = {}
+        self.io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gui-io")
+        
         self.setup_ui()
+        self.root.after(UI_INTERVAL_MS, self.drain_ui_queue)
         
     def setup_ui(self):
         """Setup the main UI"""
@@ -145,12 +172,18 @@ class PlatformGUI:
         control_frame.pack(fill='x', pady=5)
         
         self.auto_status_var = tk.BooleanVar(value=False)
-        ttk.Checkbutton(control_frame, text="Auto-refresh (1s interval)", 
+        ttk.Checkbutton(control_frame, text="Auto-refresh", 
                        variable=self.auto_status_var, 
                        command=self.toggle_auto_status).pack(side='left', padx=5)
+        ttk.Label(control_frame, text="Rate (Hz):").pack(side='left')
+        self.auto_status_rate_var = tk.StringVar(value="1")
+        ttk.Spinbox(control_frame, from_=0.2, to=20, increment=1, width=5,
+                    textvariable=self.auto_status_rate_var).pack(side='left', padx=5)
         
         ttk.Button(control_frame, text="Refresh Now", 
                   command=self.get_status_once).pack(side='left', padx=5)
+        self.status_rate_label = ttk.Label(control_frame, text="", foreground="gray")
+        self.status_rate_label.pack(side='left', padx=10)
         
         # Status display in grid
         status_frame = ttk.LabelFrame(frame, text="Platform Status", padding=10)
@@ -240,7 +273,17 @@ class PlatformGUI:
     def setup_waypoint_tab(self):
         """Setup waypoint management tab"""
         frame = ttk.Frame(self.waypoint_tab, padding=10)
-        frame.pack(fill='both', expand=True)
+        frame.pack(side='left', fill='y')
+        
+        # Map of the route, waypoints and GPS track
+        map_frame = ttk.LabelFrame(self.waypoint_tab, text="Map (drag to pan, wheel to zoom)", padding=5)
+        map_frame.pack(side='left', fill='both', expand=True, padx=(0, 10), pady=10)
+        self.map_view = MapView(map_frame, width=420, height=400)
+        self.map_view.canvas.pack(fill='both', expand=True)
+        map_btns = ttk.Frame(map_frame)
+        map_btns.pack(fill='x', pady=(5, 0))
+        ttk.Button(map_btns, text="Fit", command=self.map_view.fit).pack(side='left', padx=5)
+        ttk.Button(map_btns, text="Clear Track", command=self.map_view.clear_track).pack(side='left', padx=5)
         
         # Upload from KML
         kml_frame = ttk.LabelFrame(frame, text="Upload Coordinates from KML", padding=10)
@@ -259,7 +302,15 @@ class PlatformGUI:
         self.kml_range_var = tk.DoubleVar(value=2.0)
         ttk.Entry(kml_frame, textvariable=self.kml_range_var, width=10).grid(row=2, column=1, sticky='w', padx=5)
         
-        ttk.Button(kml_frame, text="Upload Coordinates", command=self.upload_kml).grid(row=3, column=0, columnspan=3, pady=10)
+        ttk.Label(kml_frame, text="Max Waypoints:").grid(row=3, column=0, sticky='w', pady=5)
+        self.kml_max_points_var = tk.IntVar(value=route.MAX_WAYPOINTS)
+        ttk.Entry(kml_frame, textvariable=self.kml_max_points_var, width=10).grid(row=3, column=1, sticky='w', padx=5)
+        
+        ttk.Label(kml_frame, text="Max Deviation (m):").grid(row=4, column=0, sticky='w', pady=5)
+        self.kml_tolerance_var = tk.StringVar(value="")
+        ttk.Entry(kml_frame, textvariable=self.kml_tolerance_var, width=10).grid(row=4, column=1, sticky='w', padx=5)
+        
+        ttk.Button(kml_frame, text="Upload Coordinates", command=self.upload_kml).grid(row=5, column=0, columnspan=3, pady=10)
         
         # Single coordinate
         single_frame = ttk.LabelFrame(frame, text="Go To Single Coordinate", padding=10)
@@ -295,7 +346,21 @@ class PlatformGUI:
     def setup_compass_tab(self):
         """Setup compass calibration tab"""
         frame = ttk.Frame(self.compass_tab, padding=10)
-        frame.pack(fill='both', expand=True)
+        frame.pack(side='left', fill='y')
+        
+        # Live magnetometer scatter with the calibration box
+        plot_frame = ttk.LabelFrame(self.compass_tab, text="Magnetometer (X/Y)", padding=5)
+        plot_frame.pack(side='left', fill='both', expand=True, padx=(0, 10), pady=10)
+        self.mag_plot = MagPlot(plot_frame)
+        self.mag_plot.canvas.pack(fill='both', expand=True)
+        plot_btns = ttk.Frame(plot_frame)
+        plot_btns.pack(fill='x', pady=(5, 0))
+        self.mag_plot_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(plot_btns, text="Live Plot", variable=self.mag_plot_var,
+                        command=self.toggle_mag_plot).pack(side='left', padx=5)
+        ttk.Button(plot_btns, text="Clear Plot", command=self.mag_plot.clear).pack(side='left', padx=5)
+        self.mag_plot_running = False
+        self.mag_plot_subscription = None
         
         # Calibration
         calib_frame = ttk.LabelFrame(frame, text="Compass Calibration", padding=10)
@@ -310,7 +375,7 @@ class PlatformGUI:
 
 The platform will automatically update calibration parameters."""
         
-        ttk.Label(calib_frame, text=info_text, justify='left', wraplength=600).pack(pady=10)
+        ttk.Label(calib_frame, text=info_text, justify='left', wraplength=400).pack(pady=10)
         ttk.Button(calib_frame, text="Start Calibration", command=self.start_calibration).pack(pady=10)
         
         # Magnetometer data logging
@@ -318,17 +383,24 @@ The platform will automatically update calibration parameters."""
         log_frame.pack(fill='x', pady=5)
         
         ttk.Label(log_frame, text="Log File:").grid(row=0, column=0, sticky='w', pady=5)
-        self.mag_log_var = tk.StringVar(value="mag_data.json")
+        self.mag_log_var = tk.StringVar(value="mag_data.jsonl")
         ttk.Entry(log_frame, textvariable=self.mag_log_var, width=30).grid(row=0, column=1, padx=5)
         
+        ttk.Label(log_frame, text="Rate (Hz):").grid(row=1, column=0, sticky='w', pady=5)
+        self.mag_rate_var = tk.StringVar(value="10")
+        ttk.Spinbox(log_frame, from_=0.2, to=20, increment=1, width=5,
+                    textvariable=self.mag_rate_var).grid(row=1, column=1, sticky='w', padx=5)
+        
         btn_frame = ttk.Frame(log_frame)
-        btn_frame.grid(row=1, column=0, columnspan=2, pady=10)
+        btn_frame.grid(row=2, column=0, columnspan=2, pady=10)
         self.mag_log_btn = ttk.Button(btn_frame, text="Start Logging", command=self.toggle_mag_logging)
         self.mag_log_btn.pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="Fit From Log...", command=self.fit_mag_log).pack(side='left', padx=5)
         
         self.mag_logging = False
         self.mag_log_thread = None
-        self.mag_data = []
+        self.mag_subscription = None
+        self.mag_recorder = None
         
     def setup_log_tab(self):
         """Setup console log tab"""
@@ -343,14 +415,69 @@ The platform will automatically update calibration parameters."""
         ttk.Button(frame, text="Clear Log", command=self.clear_log).pack(pady=5)
         
     def log_message(self, message):
-        """Add message to log"""
+        """Add message to log (from any thread; written on the next drain)"""
+        self.log_lines.append(f"{time.strftime('%H:%M:%S')} - {message}\n")
+        
+    def post(self, func, *args, key=None):
+        """Run func(*args) on the Tk thread; callable from any thread.
+        
+        Of several calls posted with the same key before the next drain,
+        only the newest runs.
+        """
+        self.ui_queue.put((key, func, args))
+        
+    def drain_ui_queue(self):
+        """Apply queued updates and log lines, then reschedule"""
+        items = []
+        while True:
+            try:
+                items.append(self.ui_queue.get_nowait())
+            except queue.Empty:
+                break
+        newest = {key: i for i, (key, _, _) in enumerate(items) if key is not None}
+        for i, (key, func, args) in enumerate(items):
+            if key is not None and newest[key] != i:
+                continue
+            try:
+                func(*args)
+            except Exception as e:
+                self.log_message(f"UI update failed: {e}")
+        self.flush_log()
+        self.flush_mag_plot()
+        self.root.after(UI_INTERVAL_MS, self.drain_ui_queue)
+        
+    def flush_log(self):
+        """Write pending log lines in one insert and trim old ones"""
+        lines = []
+        while self.log_lines:
+            lines.append(self.log_lines.popleft())
+        if not lines:
+            return
         self.log_text.config(state='normal')
-        self.log_text.insert('end', f"{time.strftime('%H:%M:%S')} - {message}\n")
+        self.log_text.insert('end', "".join(lines))
+        excess = int(self.log_text.index('end-1c').split('.')[0]) - MAX_LOG_LINES
+        if excess > 0:
+            self.log_text.delete('1.0', f"{excess + 1}.0")
         self.log_text.see('end')
         self.log_text.config(state='disabled')
         
+    def run_in_background(self, func, *args, on_done=None, on_error=None):
+        """Run func(*args) on a worker thread; on_done(result) / on_error(e) run on the Tk thread"""
+        def work():
+            try:
+                result = func(*args)
+            except Exception as e:
+                self.log_message(f"Error: {e}")
+                if on_error is not None:
+                    self.post(on_error, e)
+                return
+            if on_done is not None:
+                self.post(on_done, result)
+        threading.Thread(target=work, daemon=True).start()
+        
     def clear_log(self):
         """Clear the log"""
+        self.log_lines.clear()
         self.log_text.config(state='normal')
         self.log_text.delete('1.0', 'end')
         self.log_text.config(state='disabled')
@@ -396,176 +523,267 @@ The platform will automatically update calibration parameters."""
         """Connect or disconnect from serial port or network"""
         if not self.connected:
             try:
-                conn_type = self.conn_type_var.get()
                 baudrate = int(self.baudrate_var.get())
+            except ValueError:
+                messagebox.showerror("Invalid Baudrate", "Baudrate must be a number")
+                return
+            conn_type = self.conn_type_var.get()
+            
+            if conn_type == "serial":
+                # Standard serial port connection
+                port = self.port_var.get()
+                if not port:
+                    messagebox.showwarning("No Port", "Please select a serial port")
+                    return
+                opener = lambda: serial.Serial(port, baudrate, timeout=2)
+                connection_type = "serial"
+                conn_info = f"{port} at {baudrate} baud"
+            else:
+                # Network connection
+                host = self.host_var.get()
+                net_port = self.net_port_var.get()
+                protocol = self.protocol_var.get()
                 
-                if conn_type == "serial":
-                    # Standard serial port connection
-                    port = self.port_var.get()
-                    if not port:
-                        messagebox.showwarning("No Port", "Please select a serial port")
-                        return
-                    self.ser = serial.Serial(port, baudrate, timeout=2)
-                    self.connection_type = "serial"
-                    conn_info = f"{port} at {baudrate} baud"
-                    self.log_message(f"Connected to {conn_info}")
-                else:
-                    # Network connection
-                    host = self.host_var.get()
-                    net_port = self.net_port_var.get()
-                    protocol = self.protocol_var.get()
-                    
-                    if not host or not net_port:
-                        messagebox.showwarning("Invalid Input", "Please enter host and port")
-                        return
-                    
-                    try:
-                        net_port_int = int(net_port)
-                    except ValueError:
-                        messagebox.showerror("Invalid Port", "Port must be a number")
-                        return
-                    
-                    if protocol == "rfc2217" and RFC2217_AVAILABLE:
-                        # RFC2217 protocol (telnet-based serial)
-                        url = f"rfc2217://{host}:{net_port_int}"
-                        self.ser = RFC2217Serial(url, baudrate=baudrate, timeout=2)
-                        self.connection_type = "network_rfc2217"
-                        conn_info = f"{host}:{net_port_int} (RFC2217)"
-                    else:
-                        # Raw socket connection (Wokwi style)
-                        self.ser = SocketSerial(host, net_port_int, timeout=2)
-                        self.connection_type = "network_socket"
-                        conn_info = f"{host}:{net_port_int} (Socket)"
-                    
-                    self.log_message(f"Connected to {conn_info}")
+                if not host or not net_port:
+                    messagebox.showwarning("Invalid Input", "Please enter host and port")
+                    return
                 
-                self.connected = True
-                self.connect_btn.config(text="Disconnect")
-                self.conn_status_label.config(text=f"Connected to {conn_info}", foreground="green")
+                try:
+                    net_port_int = int(net_port)
+                except ValueError:
+                    messagebox.showerror("Invalid Port", "Port must be a number")
+                    return
                 
-            except Exception as e:
-                messagebox.showerror("Connection Error", f"Failed to connect: {e}")
-                self.log_message(f"Connection failed: {e}")
+                if protocol == "rfc2217" and RFC2217_AVAILABLE:
+                    # RFC2217 protocol (telnet-based serial)
+                    url = f"rfc2217://{host}:{net_port_int}"
+                    opener = lambda: RFC2217Serial(url, baudrate=baudrate, timeout=2)
+                    connection_type = "network_rfc2217"
+                    conn_info = f"{host}:{net_port_int} (RFC2217)"
+                else:
+                    # Raw socket connection (Wokwi style)
+                    url = f"socket://{host}:{net_port_int}"
+                    opener = lambda: open_port(url, baudrate, timeout=2)
+                    connection_type = "network_socket"
+                    conn_info = f"{host}:{net_port_int} (Socket)"
+            
+            # opening can take seconds (RFC2217 negotiation, unreachable hosts)
+            self.connect_btn.config(state='disabled')
+            self.conn_status_label.config(text=f"Connecting to {conn_info}...", foreground="orange")
+            self.run_in_background(opener,
+                                   on_done=lambda ser: self.on_connected(ser, connection_type, conn_info),
+                                   on_error=self.on_connect_failed)
         else:
-            if self.ser:
-                try:
-                    self.ser.close()
-                except:
-                    pass
+            link = self.link
+            self.link = None
             self.ser = None
             self.connected = False
             self.auto_status_var.set(False)
             self.toggle_auto_status()
+            self.mag_plot_var.set(False)
+            self.toggle_mag_plot()
+            if self.mag_logging:
+                self.toggle_mag_logging()
+            if link:
+                self.run_in_background(link.close)
             self.connect_btn.config(text="Connect")
             self.conn_status_label.config(text="Disconnected", foreground="red")
             self.log_message("Disconnected")
             
-    def send_json(self, data):
-        """Send JSON data to platform"""
-        if not self.connected or not self.ser:
+    def on_connected(self, ser, connection_type, conn_info):
+        """Finish connecting on the Tk thread"""
+        self.ser = ser
+        self.connection_type = connection_type
+        self.link = Transport(self.ser)
+        self.connected = True
+        self.connect_btn.config(text="Disconnect", state='normal')
+        self.conn_status_label.config(text=f"Connected to {conn_info}", foreground="green")
+        self.log_message(f"Connected to {conn_info}")
+        
+    def on_connect_failed(self, error):
+        self.connect_btn.config(state='normal')
+        self.conn_status_label.config(text="Disconnected", foreground="red")
+        messagebox.showerror("Connection Error", f"Failed to connect: {error}")
+        self.log_message(f"Connection failed: {error}")
+            
+    def check_connected(self):
+        """Warn and return False when there is no connection"""
+        if not self.connected or not self.link:
             messagebox.showwarning("Not Connected", "Please connect to the platform first")
             return False
+        return True
         
-        try:
-            json_str = json.dumps(data)
-            self.ser.write(json_str.encode('utf-8'))
+    def send_json(self, data, on_sent=None):
+        """Queue JSON data for the platform; on_sent() runs once it is written"""
+        if not self.check_connected():
+            return False
+        
+        if data.get("intent") in MOTION_INTENTS and self.status_scheduler:
+            self.status_scheduler.mark_active()
+        
+        def done(future):
+            try:
+                json_str = future.result().decode('utf-8')
+            except Exception as e:
+                self.log_message(f"Send error: {e}")
+                self.post(messagebox.showerror, "Send Error", f"Failed to send data: {e}")
+                return
             self.log_message(f"Sent: {json_str}")
-            return True
+            if on_sent is not None:
+                self.post(on_sent)
+        self.io.submit(self.link.send, data).add_done_callback(done)
+        return True
+            
+    def request_async(self, data, on_reply, timeout=2):
+        """Send a request without waiting; on_reply(reply or None) runs on the Tk thread"""
+        if not self.check_connected():
+            return
+        link = self.link
+        self.log_message(f"Sent: {json.dumps(data)}")
+        
+        def replied(future):
+            reply = None if future.cancelled() or future.exception() else future.result()
+            self.log_message(f"Received: {json.dumps(reply)}" if reply is not None else "No response")
+            self.post(on_reply, reply)
+        
+        def sent(future):
+            try:
+                pending = future.result()
+            except Exception as e:
+                self.log_message(f"Send error: {e}")
+                self.post(on_reply, None)
+                return
+            timer = threading.Timer(timeout, pending.cancel)
+            timer.daemon = True
+            timer.start()
+            pending.add_done_callback(lambda f: (timer.cancel(), replied(f)))
+        self.io.submit(link.request_async, data).add_done_callback(sent)
+        
+    def request(self, data, timeout=2):
+        """Send a request and wait for its reply; for worker threads only"""
+        link = self.link
+        if not self.connected or not link:
+            return None
+        
+        self.log_message(f"Sent: {json.dumps(data)}")
+        try:
+            response = link.request(data, timeout=timeout)
         except Exception as e:
             self.log_message(f"Send error: {e}")
-            messagebox.showerror("Send Error", f"Failed to send data: {e}")
-            return False
-            
-    def read_json(self, timeout=2):
-        """Read JSON response from platform"""
-        if not self.connected or not self.ser:
+            return None
+        if response is not None:
+            self.log_message(f"Received: {json.dumps(response)}")
+        return response
+        
+    def subscribe(self, stream, rate, callback):
+        """Have the platform push intent 6 or 9 replies; None if it cannot (worker threads only)"""
+        link = self.link
+        if not self.connected or not link:
+            return None
+        try:
+            return link.subscribe(stream, rate, callback)
+        except RuntimeError:
             return None
         
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if self.ser.in_waiting > 0:
-                try:
-                    line = self.ser.readline().decode('utf-8').strip()
-                    if line:
-                        data = json.loads(line)
-                        self.log_message(f"Received: {line}")
-                        return data
-                except json.JSONDecodeError as e:
-                    self.log_message(f"JSON decode error: {e}")
-                except Exception as e:
-                    self.log_message(f"Read error: {e}")
-            time.sleep(0.1)
-        return None
+    @staticmethod
+    def parse_rate(var, default):
+        """Rate in Hz from an entry, limited to 0.2-20"""
+        try:
+            return min(max(float(var.get()), 0.2), 20.0)
+        except ValueError:
+            return default
         
     def toggle_auto_status(self):
         """Toggle automatic status updates"""
         if self.auto_status_var.get():
-            self.auto_status_running = True
-            self.status_thread = threading.Thread(target=self.auto_status_loop, daemon=True)
-            self.status_thread.start()
-            self.log_message("Auto-status updates enabled")
-        else:
-            self.auto_status_running = False
+            if not self.connected:
+                self.auto_status_var.set(False)
+                return
+            rate = self.parse_rate(self.auto_status_rate_var, 1.0)
+            scheduler = Scheduler(self.link)
+            scheduler.add(6, lambda msg: self.post(self.update_status_display, msg, key="status"), fast=rate)
+            self.status_scheduler = scheduler
+            # start() asks the firmware whether it can push
+            self.run_in_background(scheduler.start, on_done=self.auto_status_started,
+                                   on_error=lambda e: self.log_message(f"Auto-status failed: {e}"))
+        elif self.status_scheduler:
+            scheduler = self.status_scheduler
+            self.status_scheduler = None
+            self.run_in_background(scheduler.stop)
+            self.status_rate_label.config(text="")
             self.log_message("Auto-status updates disabled")
             
-    def auto_status_loop(self):
-        """Auto-refresh status loop"""
-        while self.auto_status_running and self.connected:
-            self.get_status_once()
-            time.sleep(1)
+    def auto_status_started(self, scheduler):
+        if scheduler is not self.status_scheduler:
+            # switched off while starting
+            self.run_in_background(scheduler.stop)
+            return
+        target = scheduler.rates()[6].target
+        mode = "pushed" if scheduler.pushed else "polled"
+        self.log_message(f"Auto-status updates enabled (up to {target:g} Hz, {mode})")
+        self.auto_status_rate_loop(scheduler)
+        
+    def auto_status_rate_loop(self, scheduler):
+        """Show the scheduled and measured status rate once a second"""
+        if scheduler is not self.status_scheduler:
+            return
+        rate = scheduler.rates()[6]
+        state = "moving" if scheduler.active else "parked"
+        text = f"{state}: {rate.target:.2g} Hz, got {rate.effective:.2g} Hz"
+        if rate.backoff > 1:
+            text += f" (backoff x{rate.backoff})"
+        self.status_rate_label.config(text=text)
+        self.root.after(1000, self.auto_status_rate_loop, scheduler)
             
     def get_status_once(self):
         """Get status from platform once"""
-        if self.send_json({"intent": 6}):
-            response = self.read_json()
+        def show(response):
             if response:
                 self.update_status_display(response)
+        self.request_async({"intent": 6}, show)
                 
-    def update_status_display(self, data):
-        """Update status display with received data"""
-        # Battery voltage
+    @staticmethod
+    def status_texts(data):
+        """Label texts for a status reply"""
+        def number(key, fmt):
+            value = data.get(key)
+            return format(value, fmt) if isinstance(value, (int, float)) else "N/A"
+        
+        def mag_range(low, high):
+            low, high = data.get(low), data.get(high)
+            if isinstance(low, (int, float)) and isinstance(high, (int, float)):
+                return f"[{low:.1f}, {high:.1f}]"
+            return "N/A"
+        
         battery = data.get('batteryVoltage')
-        self.status_labels["batteryVoltage"].config(
-            text=f"{battery} V" if battery != 'N/A' and battery is not None else "N/A")
-        
-        # Simple values
-        self.status_labels["numSats"].config(text=str(data.get('numSats', 'N/A')))
-        self.status_labels["fix"].config(text=str(data.get('fix', 'N/A')))
-        self.status_labels["locationAge"].config(text=str(data.get('locationAge', 'N/A')))
-        
-        # GPS coordinates with formatting
-        lat = data.get('lat')
-        self.status_labels["lat"].config(
-            text=f"{lat:.6f}" if isinstance(lat, (int, float)) else "N/A")
-        lon = data.get('lon')
-        self.status_labels["lon"].config(
-            text=f"{lon:.6f}" if isinstance(lon, (int, float)) else "N/A")
-        
-        # Heading with formatting
-        heading = data.get('heading')
-        self.status_labels["heading"].config(
-            text=f"{heading:.1f}" if isinstance(heading, (int, float)) else "N/A")
-        
-        # Status flags
-        self.status_labels["serialControl"].config(text=str(data.get('serialControl', 'N/A')))
-        self.status_labels["motorHandled"].config(text=str(data.get('motorHandled', 'N/A')))
-        self.status_labels["setPointL"].config(text=str(data.get('setPointL', 'N/A')))
-        self.status_labels["setPointR"].config(text=str(data.get('setPointR', 'N/A')))
-        
-        # Magnetometer ranges with formatting
-        magXMin = data.get('magXMin')
-        magXMax = data.get('magXMax')
-        if isinstance(magXMin, (int, float)) and isinstance(magXMax, (int, float)):
-            self.status_labels["magXRange"].config(text=f"[{magXMin:.1f}, {magXMax:.1f}]")
-        else:
-            self.status_labels["magXRange"].config(text="N/A")
+        return {
+            "batteryVoltage": f"{battery} V" if battery is not None else "N/A",
+            "numSats": str(data.get('numSats', 'N/A')),
+            "fix": str(data.get('fix', 'N/A')),
+            "locationAge": str(data.get('locationAge', 'N/A')),
+            "lat": number('lat', '.6f'),
+            "lon": number('lon', '.6f'),
+            "heading": number('heading', '.1f'),
+            "serialControl": str(data.get('serialControl', 'N/A')),
+            "motorHandled": str(data.get('motorHandled', 'N/A')),
+            "setPointL": str(data.get('setPointL', 'N/A')),
+            "setPointR": str(data.get('setPointR', 'N/A')),
+            "magXRange": mag_range('magXMin', 'magXMax'),
+            "magYRange": mag_range('magYMin', 'magYMax'),
+        }
         
-        magYMin = data.get('magYMin')
-        magYMax = data.get('magYMax')
-        if isinstance(magYMin, (int, float)) and isinstance(magYMax, (int, float)):
-            self.status_labels["magYRange"].config(text=f"[{magYMin:.1f}, {magYMax:.1f}]")
-        else:
-            self.status_labels["magYRange"].config(text="N/A")
+    def update_status_display(self, data):
+        """Update status display with received data, touching only changed labels"""
+        for key, text in self.status_texts(data).items():
+            if self.status_texts_shown.get(key) != text:
+                self.status_labels[key].config(text=text)
+                self.status_texts_shown[key] = text
+        self.show_mag_box(data)
+        lat, lon = data.get('lat'), data.get('lon')
+        if data.get('fix') and isinstance(lat, (int, float)) and isinstance(lon, (int, float)) \
+                and (lat, lon) != (0, 0):
+            self.map_view.add_track_point(lon, lat)
+            self.map_view.set_position(lon, lat, data.get('heading'))
         
     def set_motor_mode(self, enable):
         """Set motor control mode"""
@@ -600,6 +818,30 @@ The platform will automatically update calibration parameters."""
         )
         if filename:
             self.kml_path_var.set(filename)
+            self.run_in_background(self.load_route_view, filename, self.kml_max_points_var.get(),
+                                   on_done=self.show_route)
+            
+    @staticmethod
+    def load_route_view(kml_path, max_points):
+        """Full route, its simplified waypoints and length (runs on a worker thread)"""
+        lon, lat = routecache.load_route(kml_path)
+        prepared = routecache.prepare(kml_path, max_points)
+        return lon, lat, prepared, geodesy.analyze(lon, lat).distance_m
+            
+    def show_route(self, view):
+        """Show a loaded KML route and its simplified waypoints on the map"""
+        lon, lat, prepared, distance_m = view
+        self.map_view.set_route(lon, lat)
+        self.map_view.set_waypoints(prepared.lon, prepared.lat)
+        self.log_message(f"Route: {len(lon)} vertices, {geodesy.format_distance(distance_m)}")
+            
+    @staticmethod
+    def prepare_upload(kml_path, max_points, tolerance, speed, range_val):
+        """Prepared route, coordinates list and summary for an upload (runs on a worker thread)"""
+        prepared = routecache.prepare(kml_path, max_points, tolerance)
+        coordinates = route.build_coordinates(prepared.lon, prepared.lat, speed, range_val)
+        summary = geodesy.summary(geodesy.analyze(prepared.lon, prepared.lat, speed), speed)
+        return prepared, coordinates, summary
             
     def upload_kml(self):
         """Upload coordinates from KML file"""
@@ -609,17 +851,47 @@ The platform will automatically update calibration parameters."""
             return
         
         try:
-            kml_array = parsekml.parse(kml_path)
-            kml_array.insert(0, len(kml_array) // 2)
+            tolerance = self.kml_tolerance_var.get().strip()
+            tolerance = float(tolerance) if tolerance else None
+            max_points = self.kml_max_points_var.get()
             speed = self.kml_speed_var.get()
             range_val = self.kml_range_var.get()
-            kml_array.insert(1, speed)
-            kml_array.insert(2, range_val)
-            
-            self.send_json({"intent": 5, "coordinates": kml_array})
-            messagebox.showinfo("Success", f"Uploaded {(len(kml_array)-3)//2} coordinates")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to upload: {e}")
+            return
+            
+        def send(upload):
+            prepared, coordinates, summary = upload
+            self.log_message(f"Route: {prepared.source_vertices} vertices -> {len(prepared.lon)} waypoints, "
+                             f"max deviation {prepared.error_m:.2f} m")
+            if tolerance is not None and prepared.error_m > tolerance:
+                messagebox.showerror("Error", f"Route needs more than {max_points} waypoints to stay "
+                                              f"within {tolerance} m (best: {prepared.error_m:.2f} m)")
+                return
+            self.map_view.set_waypoints(prepared.lon, prepared.lat)
+            self.log_message(f"Waypoints: {summary}")
+            
+            if not self.check_connected():
+                return
+            
+            def done(future):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.log_message(f"Send error: {e}")
+                    self.post(messagebox.showerror, "Send Error", f"Failed to upload: {e}")
+                    return
+                self.log_message(describe_upload(result))
+                self.post(messagebox.showinfo, "Success",
+                          f"{len(prepared.lon)} coordinates on the device "
+                          f"(max deviation {prepared.error_m:.2f} m, {result.action} upload)\n{summary}")
+            # on the I/O thread, so the upload stays in order with queued commands
+            self.io.submit(route.upload, self.link, coordinates).add_done_callback(done)
+            
+        # parsing and simplifying a large KML file would block the window
+        self.run_in_background(self.prepare_upload, kml_path, max_points, tolerance, speed, range_val,
+                               on_done=send,
+                               on_error=lambda e: messagebox.showerror("Error", f"Failed to upload: {e}"))
             
     def goto_coordinate(self):
         """Navigate to single coordinate"""
@@ -639,10 +911,14 @@ The platform will automatically update calibration parameters."""
         
     def get_coordinates(self):
         """Get stored coordinates from platform"""
-        if self.send_json({"intent": 1}):
-            response = self.read_json()
+        def show(response):
             if response:
+                try:
+                    self.map_view.set_waypoints(*route.parse_coordinates(response["coordinates"]))
+                except (KeyError, TypeError, ValueError):
+                    pass
                 messagebox.showinfo("Coordinates", f"Received:\n{json.dumps(response, indent=2)}")
+        self.request_async({"intent": 1}, show)
                 
     def execute_waypoints(self):
         """Execute waypoint navigation"""
@@ -658,41 +934,148 @@ The platform will automatically update calibration parameters."""
                                      "Rotate the platform in all directions during calibration.")
         if result:
             self.send_json({"intent": 8})
+            if not self.mag_plot_var.get():
+                self.mag_plot_var.set(True)
+                self.toggle_mag_plot()
             messagebox.showinfo("Calibration", "Calibration started. Rotate the platform now.")
             
+    def fit_mag_log(self):
+        """Fit hard/soft-iron calibration to a magnetometer log and offer to push it"""
+        filename = filedialog.askopenfilename(
+            title="Select Magnetometer Log",
+            initialfile=self.mag_log_var.get(),
+            filetypes=[("JSON Lines", "*.jsonl"), ("JSON", "*.json"), ("All Files", "*.*")]
+        )
+        if not filename:
+            return
+        
+        def load_and_fit():
+            mag_x, mag_y = magcal.load_samples(filename)
+            return magcal.fit(mag_x, mag_y)
+        self.run_in_background(
+            load_and_fit,
+            on_done=lambda calibration: self.offer_mag_fit(filename, calibration),
+            on_error=lambda e: messagebox.showerror("Fit Error", f"No calibration from {filename}: {e}"))
+        
+    def offer_mag_fit(self, filename, calibration):
+        """Show a fit and push it to the platform if the user agrees"""
+        summary = magcal.describe(calibration)
+        self.log_message(f"Magnetometer fit from {filename}: {summary}")
+        if calibration.score < 0.5:
+            messagebox.showwarning("Poor Fit", f"{summary}\n\nLog more headings and try again.")
+            return
+        if not messagebox.askyesno("Magnetometer Fit", f"{summary}\n\nSend this calibration to the platform?"):
+            return
+        if not self.check_connected():
+            return
+        
+        def pushed(reply):
+            if reply and reply.get("magFit"):
+                messagebox.showinfo("Magnetometer Fit", "Calibration stored on the platform")
+            else:
+                messagebox.showerror("Magnetometer Fit", "No confirmation from the platform")
+        self.run_in_background(magcal.push, self.link, calibration, on_done=pushed,
+                               on_error=lambda e: messagebox.showerror("Fit Error", str(e)))
+            
     def toggle_mag_logging(self):
         """Toggle magnetometer data logging"""
         if not self.mag_logging:
+            rate = self.parse_rate(self.mag_rate_var, 10.0)
+            try:
+                self.mag_recorder = Recorder(self.mag_log_var.get())
+            except OSError as e:
+                messagebox.showerror("Log Error", f"Failed to open log file: {e}")
+                return
             self.mag_logging = True
-            self.mag_data = []
             self.mag_log_btn.config(text="Stop Logging")
-            self.mag_log_thread = threading.Thread(target=self.mag_logging_loop, daemon=True)
+            self.mag_log_thread = threading.Thread(target=self.mag_logging_loop,
+                                                   args=(rate, self.mag_recorder), daemon=True)
             self.mag_log_thread.start()
-            self.log_message("Magnetometer logging started")
         else:
             self.mag_logging = False
+            if self.mag_subscription:
+                self.mag_subscription.close()
+                self.mag_subscription = None
             self.mag_log_btn.config(text="Start Logging")
-            self.save_mag_data()
+            self.finish_mag_log()
             
-    def mag_logging_loop(self):
-        """Magnetometer logging loop"""
+    def mag_logging_loop(self, rate, recorder):
+        """Subscribe to pushed magnetometer data, or poll on firmware without streams"""
+        subscription = self.subscribe(9, rate, recorder.record)
+        mode = "pushed" if subscription else "polled"
+        self.log_message(f"Magnetometer logging started ({rate:g} Hz, {mode})")
+        if subscription is not None:
+            self.mag_subscription = subscription
+            if not self.mag_logging:
+                # stopped while subscribing
+                subscription.close()
+                self.mag_subscription = None
+            return
         while self.mag_logging and self.connected:
-            if self.send_json({"intent": 9}):
-                response = self.read_json(timeout=1)
-                if response:
-                    self.mag_data.append(response)
-            time.sleep(1)
+            response = self.request({"intent": 9}, timeout=1)
+            if response:
+                try:
+                    recorder.record(response)
+                except ValueError:
+                    break  # logging was stopped and the file closed
+            time.sleep(1.0 / rate)
             
-    def save_mag_data(self):
-        """Save magnetometer data to file"""
-        try:
-            filename = self.mag_log_var.get()
-            with open(filename, 'w') as f:
-                json.dump(self.mag_data, f, indent=2)
-            messagebox.showinfo("Saved", f"Saved {len(self.mag_data)} samples to {filename}")
-            self.log_message(f"Saved {len(self.mag_data)} magnetometer samples to {filename}")
-        except Exception as e:
-            messagebox.showerror("Save Error", f"Failed to save: {e}")
+    def toggle_mag_plot(self):
+        """Toggle the live magnetometer plot"""
+        if self.mag_plot_var.get():
+            if not self.connected:
+                self.mag_plot_var.set(False)
+                return
+            rate = self.parse_rate(self.mag_rate_var, 10.0)
+            self.mag_plot_running = True
+            threading.Thread(target=self.mag_plot_loop, args=(rate,), daemon=True).start()
+        elif self.mag_plot_running:
+            self.mag_plot_running = False
+            if self.mag_plot_subscription:
+                self.mag_plot_subscription.close()
+                self.mag_plot_subscription = None
+                
+    def mag_plot_loop(self, rate):
+        """Feed the plot from pushed magnetometer data, or poll on firmware without streams"""
+        subscription = self.subscribe(9, rate, self.mag_samples.append)
+        if subscription is not None:
+            self.mag_plot_subscription = subscription
+            if not self.mag_plot_running:
+                # switched off while subscribing
+                subscription.close()
+                self.mag_plot_subscription = None
+            return
+        while self.mag_plot_running and self.connected:
+            response = self.request({"intent": 9}, timeout=1)
+            if response:
+                self.mag_samples.append(response)
+            time.sleep(1.0 / rate)
+            
+    def flush_mag_plot(self):
+        """Plot the magnetometer samples received since the last drain"""
+        samples = []
+        while self.mag_samples:
+            samples.append(self.mag_samples.popleft())
+        samples = [m for m in samples if isinstance(m.get("magX"), (int, float))
+                   and isinstance(m.get("magY"), (int, float))]
+        if not samples:
+            return
+        self.mag_plot.add([m["magX"] for m in samples], [m["magY"] for m in samples])
+        self.show_mag_box(samples[-1])
+        
+    def show_mag_box(self, data):
+        """Show the device's min/max calibration box from a status or intent 9 reply"""
+        box = [data.get(k) for k in ("magXMin", "magXMax", "magYMin", "magYMax")]
+        if all(isinstance(v, (int, float)) for v in box):
+            self.mag_plot.set_box(*box)
+            
+    def finish_mag_log(self):
+        """Close the magnetometer log file"""
+        recorder, self.mag_recorder = self.mag_recorder, None
+        recorder.close()
+        files = ", ".join(str(p) for p in recorder.paths)
+        messagebox.showinfo("Saved", f"Saved {recorder.count} samples to {files}")
+        self.log_message(f"Saved {recorder.count} magnetometer samples to {files}")
 
 
 def main():
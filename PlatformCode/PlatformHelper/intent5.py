@@ -1,29 +1,39 @@
 """Upload coordinates parsed from a KML file to the device (intent 5).
 
-This module intentionally keeps a simple `process(port, ...)` signature
+This module intentionally keeps a simple `process(link, ...)` signature
 so it can be used interactively or programmatically by the CLI helper.
+Routes longer than the device table are simplified first (see `route`);
+prepared routes are cached on disk (see `routecache`), and a route the
+device already holds is not sent again.
 """
-import json
-from pathlib import Path
-import parsekml
+import geodesy
+import route
+import routecache
 
 
-def process(port, kml_path: str = None, speed: float = None, range_m: float = None):
-    """Parse a KML and send intent 5 payload to `port`.
+def process(link, kml_path: str = None, speed: float = None, range_m: float = None,
+            max_points: int = route.MAX_WAYPOINTS, tolerance: float = None, force: bool = False):
+    """Parse a KML and send intent 5 payload over `link` (a `Transport`).
 
     If `kml_path`, `speed` or `range_m` are omitted the function will
-    prompt the user interactively.
+    prompt the user interactively. The route is reduced to at most
+    `max_points` waypoints; if `tolerance` (metres) is given and cannot be
+    met within that budget nothing is sent. A route the device already
+    holds is not sent again unless `force` is set (see `route.upload`).
     """
     if kml_path is None:
         kml_path = input("KML file path?: ").strip()
 
-    coords = parsekml.parse(kml_path)
-    if not coords:
-        print("No coordinates parsed from KML.")
+    prepared = routecache.prepare(kml_path, max_points, tolerance)
+    if len(prepared.lon) < route.MIN_WAYPOINTS:
+        print("Not enough coordinates parsed from KML.")
+        return
+    if len(prepared.lon) < prepared.source_vertices:
+        print(f"Simplified {prepared.source_vertices} vertices to {len(prepared.lon)} waypoints "
+              f"(max deviation {prepared.error_m:.2f} m)")
+    if tolerance is not None and prepared.error_m > tolerance:
+        print(f"Route needs more than {max_points} waypoints to stay within {tolerance} m; nothing sent.")
         return
-
-    # number of coordinate pairs (assume coords is a flat list)
-    count = len(coords) // 2
 
     if speed is None:
         while True:
@@ -41,14 +51,20 @@ def process(port, kml_path: str = None, speed: float = None, range_m: float = No
             except Exception:
                 print("Invalid number, try again.")
 
-    payload = {"intent": 5, "coordinates": []}
+    print(f"Route: {geodesy.summary(geodesy.analyze(prepared.lon, prepared.lat, speed), speed)}")
+
     # keep same layout as the device expects: [count, speed, range, ...coords]
-    payload["coordinates"].append(int(count))
-    payload["coordinates"].append(float(speed))
-    payload["coordinates"].append(float(range_m))
-    payload["coordinates"].extend(coords)
-
-    data = json.dumps(payload).encode("utf-8")
-    print(f"Sending {len(data)} bytes to device...")
-    port.write(data)
-    print("Data sent")
\ No newline at end of file
+    coordinates = route.build_coordinates(prepared.lon, prepared.lat, speed, range_m)
+
+    result = route.upload(link, coordinates, force=force)
+    print(describe_upload(result))
+    return result
+
+
+def describe_upload(result):
+    """One line for the outcome of `route.upload`."""
+    if result.action == "unchanged":
+        return "Device already holds this route; nothing sent"
+    if result.action == "header":
+        return f"Device already holds this route; updated speed and range ({result.sent} bytes)"
+    return f"Sent {result.sent} bytes to device"
@@ -1,81 +1,65 @@
-"""Continuously request magnetometer data (intent 9) and log results.
+"""Continuously log magnetometer data (intent 9).
 
-Usage: call `process(port)` interactively. Press Ctrl-C to stop logging;
-the data is written to a JSON file on exit. A timestamped default filename
-is provided if the user doesn't specify one.
+Samples are fetched by a `scheduler.Scheduler`: pushed by the device
+when the firmware supports streams, otherwise requested one at a time,
+at the full rate while the robot moves and slower while it is parked.
+
+Usage: call `process(link)` interactively. Press Ctrl-C to stop logging.
+Samples are streamed to a JSON Lines file as they arrive (see `recorder`).
+A timestamped default filename is provided if the user doesn't specify one.
 """
-import json
-import time
 import datetime
-import os
-
+import queue
 
-def _extract_json_from_text(text: str):
-    s = text.find('{')
-    e = text.rfind('}')
-    if s != -1 and e != -1 and e > s:
-        try:
-            return json.loads(text[s:e+1])
-        except json.JSONDecodeError:
-            return None
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        return None
+from recorder import Recorder
+from scheduler import Scheduler
 
 
-def process(port, filename: str = None, include_timestamp: bool = False, interval: float = 1.0):
+def process(link, filename: str = None, include_timestamp: bool = False, interval: float = 1.0):
     """Start logging magnetometer data until interrupted by the user.
 
     Parameters:
-      - port: serial port object
-      - filename: optional output filename (JSON). If omitted a timestamped
-        filename `maglog_<iso>.json` will be used.
+      - link: `Transport` connected to the device
+      - filename: optional output filename (JSON Lines). If omitted a
+        timestamped filename `maglog_<iso>.jsonl` will be used.
       - include_timestamp: if True, each record will get a `_ts` field.
-      - interval: seconds between requests (default 1.0)
+      - interval: seconds between samples while the robot moves
+        (default 1.0)
     """
     if filename is None or filename.strip() == "":
         now = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
-        filename = f"maglog_{now}.json"
+        filename = f"maglog_{now}.jsonl"
+
+    try:
+        log = Recorder(filename)
+    except OSError as e:
+        print("Error opening log file:", e)
+        return
 
-    data_received = []
+    samples = queue.Queue()
+    scheduler = Scheduler(link)
+    scheduler.add(9, samples.put, fast=1.0 / interval)
     print("Starting magnetometer logging. Press Ctrl-C to stop.")
     try:
+        scheduler.start()
         while True:
-            payload = {"intent": 9}
-            port.write(json.dumps(payload).encode('utf-8'))
-            raw = port.readline()
-            if not raw:
-                time.sleep(interval)
-                continue
             try:
-                text = raw.decode('utf-8', errors='replace').strip()
-            except Exception:
-                time.sleep(interval)
-                continue
-
-            obj = _extract_json_from_text(text)
-            if obj is None:
-                # give a short debug print of the line received
-                print("(non-json line) ", text)
-                time.sleep(interval)
+                obj = samples.get(timeout=max(2 * interval, 2.0))
+            except queue.Empty:
+                print("(no response)", scheduler.describe())
                 continue
 
             if include_timestamp:
                 obj['_ts'] = datetime.datetime.utcnow().isoformat() + 'Z'
 
-            data_received.append(obj)
+            log.record(obj)
             print(obj)
-            time.sleep(interval)
 
     except KeyboardInterrupt:
         print("\nLogging stopped by user.")
-
-    # Persist the collected data
-    try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data_received, f, indent=2)
-        print(f"Wrote {len(data_received)} records to {filename}")
-    except Exception as e:
-        print("Error writing log file:", e)
+    finally:
+        print(scheduler.describe())
+        scheduler.stop()
+        log.close()
+    print(f"Wrote {log.count} records to {', '.join(str(p) for p in log.paths)}")
 
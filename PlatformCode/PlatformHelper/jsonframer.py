@@ -0,0 +1,139 @@
+"""Incremental framer for the device's newline-less JSON stream.
+
+The firmware writes replies with `serializeJson(doc, Serial)` and never
+terminates them with a newline, so line-based reading only returns after
+the serial timeout. `JsonFramer` instead tracks brace depth (ignoring
+braces inside strings and escaped quotes) over a `bytearray` and emits
+each object the moment its closing brace arrives. Every byte is scanned
+once, no matter how the stream is split across `feed()` calls.
+
+Anything outside an object (e.g. `deserializeJson() failed: ...` lines
+printed by the firmware) is returned as text once a full line is
+available, and objects that fail to decode are returned as text as well
+so the stream resynchronises on the next `{`.
+"""
+import json
+import re
+
+# bytes that can change the framer state
+_SPECIAL = re.compile(rb'[{}"\\]')
+_OPEN, _CLOSE, _QUOTE, _BACKSLASH = b'{'[0], b'}'[0], b'"'[0], b'\\'[0]
+
+# an object larger than this is treated as garbage
+MAX_OBJECT = 65536
+
+
+class JsonFramer:
+    """Split a byte stream into JSON objects and non-JSON text lines."""
+
+    def __init__(self, max_object: int = MAX_OBJECT):
+        self.max_object = max_object
+        self._buf = bytearray()
+        self._pos = 0          # next byte to scan
+        self._start = -1       # start of the current object, -1 at depth 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, data) -> list:
+        """Add `data` to the stream and return the completed messages.
+
+        Messages are decoded objects (dict) or str for text outside objects.
+        """
+        buf = self._buf
+        buf += data
+        out = []
+        pos = self._pos
+        consumed = 0
+        size = len(buf)
+
+        while pos < size:
+            if self._depth == 0:
+                start = buf.find(b'{', pos)
+                if start == -1:
+                    # text only: hand out complete lines, keep the rest
+                    end = buf.rfind(b'\n', consumed) + 1
+                    if end == 0 and size - consumed > self.max_object:
+                        end = size
+                    if end:
+                        self._text(buf, consumed, end, out)
+                        consumed = end
+                    pos = size
+                    break
+                self._text(buf, consumed, start, out)
+                consumed = self._start = start
+                self._depth = 1
+                pos = start + 1
+                continue
+
+            if self._escape:
+                self._escape = False
+                pos += 1
+                continue
+
+            m = _SPECIAL.search(buf, pos)
+            if m is None:
+                pos = size
+            else:
+                c = buf[m.start()]
+                pos = m.end()
+                if self._in_string:
+                    if c == _BACKSLASH:
+                        self._escape = True
+                    elif c == _QUOTE:
+                        self._in_string = False
+                elif c == _QUOTE:
+                    self._in_string = True
+                elif c == _OPEN:
+                    self._depth += 1
+                elif c == _CLOSE:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._emit(buf, self._start, pos, out)
+                        consumed = pos
+                        self._start = -1
+                        continue
+
+            if pos - self._start > self.max_object:
+                # never closed: treat it as text and rescan after the brace
+                pos = self._start + 1
+                self._reset_object()
+
+        if consumed:
+            del buf[:consumed]
+            pos -= consumed
+            if self._start >= 0:
+                self._start -= consumed
+        self._pos = pos
+        return out
+
+    @property
+    def idle(self):
+        """True when no object is partially received."""
+        return self._depth == 0
+
+    def reset(self):
+        """Discard buffered bytes and any partially received object."""
+        self._buf.clear()
+        self._pos = 0
+        self._reset_object()
+
+    def _reset_object(self):
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @staticmethod
+    def _text(buf, start, end, out):
+        if end > start:
+            text = buf[start:end].decode('utf-8', errors='replace').strip()
+            if text:
+                out.append(text)
+
+    @staticmethod
+    def _emit(buf, start, end, out):
+        try:
+            out.append(json.loads(buf[start:end]))
+        except ValueError:
+            JsonFramer._text(buf, start, end, out)
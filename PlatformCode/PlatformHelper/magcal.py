@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Hard/soft-iron magnetometer calibration from logged intent 9 samples.
+
+`calibrateMag` on the device spins the robot and keeps the per-axis
+min/max, whose centre `getHeading` subtracts. That removes the hard-iron
+offset only if the spin covers every heading evenly, and ignores soft-iron
+distortion, which turns the circle of readings into a tilted ellipse.
+
+`fit()` instead fits a general ellipse to `magX`/`magY` samples by linear
+least squares (NumPy, milliseconds for 100k samples) and returns
+
+- the hard-iron offset (ellipse centre),
+- a symmetric soft-iron matrix `W` that maps the ellipse onto a circle of
+  the same area, so that `W @ (m - offset)` has constant length,
+- a quality report: relative radius error after correction, heading
+  coverage (the share of 10 degree sectors with samples) and a 0..1 score.
+
+Samples from normal driving work as long as they cover enough headings;
+the score says whether they did. `push()` sends the result to the device
+(intent 13), which uses it in `getHeading` and keeps it across restarts.
+
+    python magcal.py mag.jsonl                  # fit and print
+    python magcal.py mag.jsonl --port COM3      # fit and push
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# a fit is rejected (score 0) at this relative radius error
+MAX_RELATIVE_ERROR = 0.1
+SECTORS = 36
+# samples this many times the median distance from the median point are dropped
+GROSS_OUTLIER = 4.0
+
+Calibration = namedtuple("Calibration", "offset matrix radius relative_error coverage score samples")
+
+
+def _conic(x, y):
+    """Least-squares conic A x^2 + B xy + C y^2 + D x + E y = 1."""
+    design = np.column_stack((x * x, x * y, y * y, x, y))
+    # normal equations: a 5x5 solve instead of an SVD of the n x 5 design
+    try:
+        return np.linalg.solve(design.T @ design, design.sum(axis=0))
+    except np.linalg.LinAlgError:
+        raise ValueError("samples do not describe an ellipse") from None
+
+
+def _ellipse(x, y):
+    """Centre and normalised shape matrix S with (p - c)^T S (p - c) = 1."""
+    # fit in centred, scaled coordinates for a well conditioned system
+    mx, my = x.mean(), y.mean()
+    scale = max(x.std(), y.std())
+    if not scale > 0:
+        raise ValueError("magnetometer samples do not vary")
+    a, b, c, d, e = _conic((x - mx) / scale, (y - my) / scale)
+    shape = np.array([[a, b / 2], [b / 2, c]])
+    try:
+        centre = np.linalg.solve(2 * shape, -np.array([d, e]))
+    except np.linalg.LinAlgError:
+        raise ValueError("samples do not describe an ellipse") from None
+    k = 1.0 + centre @ shape @ centre
+    shape = shape / (k * scale * scale)
+    if not np.all(np.linalg.eigvalsh(shape) > 0):
+        raise ValueError("samples do not describe an ellipse")
+    return np.array([mx, my]) + centre * scale, shape
+
+
+def _soft_iron(shape):
+    """Symmetric matrix mapping the ellipse onto a circle of equal area."""
+    values, vectors = np.linalg.eigh(shape)
+    radius = float(np.prod(values) ** -0.25)        # sqrt(a * b), a, b semi-axes
+    matrix = radius * (vectors * np.sqrt(values)) @ vectors.T
+    return matrix, radius
+
+
+def _quality(x, y, offset, matrix, radius):
+    q = matrix @ np.vstack((x - offset[0], y - offset[1]))
+    r = np.sqrt(q[0] * q[0] + q[1] * q[1])
+    relative_error = float(np.sqrt(np.mean((r - radius) ** 2)) / radius)
+    sectors = ((np.arctan2(q[1], q[0]) + np.pi) * (SECTORS / (2 * np.pi))).astype(int) % SECTORS
+    occupied = np.zeros(SECTORS, dtype=bool)
+    occupied[sectors] = True
+    coverage = np.count_nonzero(occupied) / SECTORS
+    score = coverage * max(0.0, 1.0 - relative_error / MAX_RELATIVE_ERROR)
+    return r, relative_error, coverage, score
+
+
+def fit(mag_x, mag_y, reject=3.0, passes=1):
+    """Fit hard- and soft-iron calibration to raw magnetometer samples.
+
+    Samples far outside the bulk of the data (glitches, a magnet held
+    next to the sensor) are dropped first. After each fit, samples whose
+    corrected radius is more than `reject` robust standard deviations
+    (1.4826 MAD) from the median are dropped and the fit is repeated, up to
+    `passes` times (pass `reject=None` to keep all). Returns a
+    `Calibration`; raises ValueError if the samples do not describe an
+    ellipse.
+    """
+    x = np.asarray(mag_x, dtype=np.float64)
+    y = np.asarray(mag_y, dtype=np.float64)
+    keep = np.isfinite(x) & np.isfinite(y)
+    x, y = x[keep], y[keep]
+    if reject is not None and len(x):
+        dx, dy = x - np.median(x), y - np.median(y)
+        distance = dx * dx + dy * dy            # squared, as is the limit
+        keep = distance <= GROSS_OUTLIER ** 2 * np.median(distance)
+        x, y = x[keep], y[keep]
+    if len(x) < 5:
+        raise ValueError("need at least 5 samples")
+
+    for attempt in range(passes + 1 if reject is not None else 1):
+        offset, shape = _ellipse(x, y)
+        matrix, radius = _soft_iron(shape)
+        r, relative_error, coverage, score = _quality(x, y, offset, matrix, radius)
+        if attempt == passes or reject is None:
+            break
+        deviation = np.abs(r - np.median(r))
+        inliers = deviation <= reject * 1.4826 * np.median(deviation)
+        if not 5 <= np.count_nonzero(inliers) < len(x):
+            break
+        x, y = x[inliers], y[inliers]
+    return Calibration(offset, matrix, radius, relative_error, coverage, score, len(x))
+
+
+def heading(calibration, mag_x, mag_y):
+    """Headings in degrees for raw samples, as `getHeading` computes them."""
+    q = calibration.matrix @ np.vstack((np.asarray(mag_x, dtype=np.float64) - calibration.offset[0],
+                                        np.asarray(mag_y, dtype=np.float64) - calibration.offset[1]))
+    return np.degrees(np.arctan2(-q[0], -q[1])) % 360.0
+
+
+def load_samples(path):
+    """(magX, magY) arrays from a JSON / JSON Lines log or an archive directory."""
+    import os
+    if os.path.isdir(path):
+        from archive import Archive
+        columns = Archive(path).query("mag", fields=["magX", "magY"])
+        return columns["magX"].astype(np.float64), columns["magY"].astype(np.float64)
+    from archive import load_records
+    samples = [(r["magX"], r["magY"]) for r in load_records(path) if "magX" in r and "magY" in r]
+    xy = np.array(samples, dtype=np.float64).reshape(-1, 2)
+    return xy[:, 0], xy[:, 1]
+
+
+def to_intent(calibration):
+    """The intent 13 command that installs `calibration` on the device."""
+    return {
+        "intent": 13,
+        "offsetX": float(calibration.offset[0]),
+        "offsetY": float(calibration.offset[1]),
+        "matrix": [float(v) for v in calibration.matrix.ravel()],
+    }
+
+
+def push(link, calibration, timeout=2.0):
+    """Install `calibration` on the device; returns its reply or None.
+
+    Raises RuntimeError if the firmware predates intent 13.
+    """
+    from transport import PROTOCOL_MAGCAL
+    if link.protocol(timeout) < PROTOCOL_MAGCAL:
+        raise RuntimeError("the firmware does not accept calibrations (intent 13)")
+    return link.request(to_intent(calibration), timeout=timeout)
+
+
+def describe(calibration):
+    m = calibration.matrix
+    return (f"{calibration.samples} samples\n"
+            f"  hard-iron offset: X={calibration.offset[0]:.2f} Y={calibration.offset[1]:.2f}\n"
+            f"  soft-iron matrix: [[{m[0, 0]:.4f}, {m[0, 1]:.4f}], [{m[1, 0]:.4f}, {m[1, 1]:.4f}]]\n"
+            f"  field radius: {calibration.radius:.2f}\n"
+            f"  radius error: {calibration.relative_error * 100:.2f} %\n"
+            f"  heading coverage: {calibration.coverage * 100:.0f} %\n"
+            f"  score: {calibration.score:.2f}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fit hard/soft-iron calibration to intent 9 logs")
+    parser.add_argument("log", help="JSON / JSON Lines log or archive directory")
+    parser.add_argument("--port", help="push the result to the device on this port or URL")
+    parser.add_argument("--min-score", type=float, default=0.5,
+                        help="refuse to push a fit scoring below this (default 0.5)")
+    args = parser.parse_args()
+
+    mag_x, mag_y = load_samples(args.log)
+    try:
+        calibration = fit(mag_x, mag_y)
+    except ValueError as e:
+        print(f"No calibration from {len(mag_x)} samples: {e}. Log more headings and try again.")
+        return
+    print(describe(calibration))
+    if args.port:
+        if calibration.score < args.min_score:
+            print(f"Score below {args.min_score}; not pushed. Log more headings and try again.")
+            return
+        from transport import Transport, open_port
+        link = Transport(open_port(args.port, timeout=1))
+        try:
+            reply = push(link, calibration)
+            print("Device confirmed the calibration" if reply and reply.get("magFit")
+                  else "No confirmation from the device")
+        finally:
+            link.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Live magX/magY scatter for the GUI's compass tab.
+
+`MagPlot` shows the latest `capacity` magnetometer samples as dots on a
+Tk canvas, with the device's current calibration box (`magXMin` ..
+`magYMax`) and its centre, the hard-iron offset `getHeading` subtracts.
+A good calibration spin traces a circle that touches all four sides.
+
+Only new samples are drawn: each one either creates a dot or, once
+`capacity` dots exist, moves the oldest dot (a ring buffer of canvas
+items), so the cost per frame depends on the number of new samples, not
+on the history. The samples are kept in a NumPy ring buffer next to the
+items; when a sample or the box leaves the plotted range, the range
+grows by `HEADROOM` and all dots are repositioned from that buffer, which
+happens only a few times per calibration.
+"""
+import tkinter as tk
+
+import numpy as np
+
+DEFAULT_CAPACITY = 20000
+HEADROOM = 0.25
+DOT = 1.5
+MARGIN = 10
+
+DOT_COLOR = "#1f5fbf"
+BOX_COLOR = "#d9480f"
+
+
+class MagPlot:
+    """Scatter of raw magnetometer samples with the min/max calibration box."""
+
+    def __init__(self, parent, capacity=DEFAULT_CAPACITY, width=320, height=320, **canvas_options):
+        self.canvas = tk.Canvas(parent, width=width, height=height, background="white",
+                                highlightthickness=0, **canvas_options)
+        self.capacity = capacity
+        self.xy = np.empty((capacity, 2))
+        self.items = []
+        self.count = 0                  # samples in the buffer
+        self.head = 0                   # next slot to write
+        self.box = None
+        self.bounds = None              # plotted range (x0, y0, x1, y1)
+        self.size = (width, height)
+        self._box_item = None
+        self._centre_items = ()
+        self.canvas.bind("<Configure>", self._on_configure)
+
+    def add(self, mag_x, mag_y):
+        """Plot new samples (sequences of equal length)."""
+        x = np.asarray(mag_x, dtype=np.float64)
+        y = np.asarray(mag_y, dtype=np.float64)
+        keep = np.isfinite(x) & np.isfinite(y)
+        x, y = x[keep][-self.capacity:], y[keep][-self.capacity:]
+        if not len(x):
+            return
+        if self._outside(x.min(), y.min(), x.max(), y.max()):
+            self._store(x, y)
+            self._rescale()
+            return
+        sx, sy = self._to_screen(x, y)
+        canvas = self.canvas
+        for px, py in zip(sx.tolist(), sy.tolist()):
+            coords = (px - DOT, py - DOT, px + DOT, py + DOT)
+            if len(self.items) < self.capacity:
+                self.items.append(canvas.create_oval(*coords, fill=DOT_COLOR, outline="", tags=("sample",)))
+            else:
+                canvas.coords(self.items[self.head], *coords)
+            self.head = (self.head + 1) % self.capacity
+        self._store(x, y, advance=False)
+
+    def set_box(self, x_min, x_max, y_min, y_max):
+        """Show the calibration box from a status or intent 9 reply."""
+        box = (x_min, x_max, y_min, y_max)
+        if box == self.box:
+            return
+        self.box = box
+        if self._outside(x_min, y_min, x_max, y_max):
+            self._rescale()
+        else:
+            self._draw_box()
+
+    def clear(self):
+        self.canvas.delete("sample")
+        self.items = []
+        self.count = 0
+        self.head = 0
+        self.bounds = None
+        self._draw_box()
+
+    # -- helpers ------------------------------------------------------------
+
+    def _store(self, x, y, advance=True):
+        """Copy samples into the ring buffer; slot i belongs to `self.items[i]`.
+
+        With `advance` the samples go to the slots from `self.head` on and
+        the head moves past them, otherwise they fill the slots just
+        before the head (already advanced while drawing).
+        """
+        n = len(x)
+        start = self.head if advance else (self.head - n) % self.capacity
+        slots = (start + np.arange(n)) % self.capacity
+        self.xy[slots, 0] = x
+        self.xy[slots, 1] = y
+        if advance:
+            self.head = (start + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def _outside(self, x0, y0, x1, y1):
+        if self.bounds is None:
+            return True
+        bx0, by0, bx1, by1 = self.bounds
+        return x0 < bx0 or y0 < by0 or x1 > bx1 or y1 > by1
+
+    def _rescale(self):
+        """Grow the plotted range to everything shown and redraw all dots."""
+        parts = [self.xy[:self.count]]
+        if self.box is not None:
+            x_min, x_max, y_min, y_max = self.box
+            parts.append(np.array([[x_min, y_min], [x_max, y_max]], dtype=np.float64))
+        points = np.concatenate(parts)
+        points = points[np.isfinite(points).all(axis=1)]
+        if not len(points):
+            return
+        lo, hi = points.min(axis=0), points.max(axis=0)
+        centre = (lo + hi) / 2
+        half = max(float((hi - lo).max()) / 2, 1e-6) * (1 + HEADROOM)
+        self.bounds = (centre[0] - half, centre[1] - half, centre[0] + half, centre[1] + half)
+        self._redraw_samples()
+        self._draw_box()
+
+    def _redraw_samples(self):
+        canvas = self.canvas
+        sx, sy = self._to_screen(self.xy[:self.count, 0], self.xy[:self.count, 1])
+        for i, (px, py) in enumerate(zip(sx.tolist(), sy.tolist())):
+            coords = (px - DOT, py - DOT, px + DOT, py + DOT)
+            if i < len(self.items):
+                canvas.coords(self.items[i], *coords)
+            else:
+                self.items.append(canvas.create_oval(*coords, fill=DOT_COLOR, outline="", tags=("sample",)))
+
+    def _draw_box(self):
+        canvas = self.canvas
+        if self.box is None or self.bounds is None:
+            return
+        x_min, x_max, y_min, y_max = self.box
+        (left, right), (bottom, top) = self._to_screen(np.array([x_min, x_max]), np.array([y_min, y_max]))
+        cx, cy = (left + right) / 2, (top + bottom) / 2
+        if self._box_item is None:
+            self._box_item = canvas.create_rectangle(left, top, right, bottom, outline=BOX_COLOR, width=2)
+            self._centre_items = (canvas.create_line(cx - 6, cy, cx + 6, cy, fill=BOX_COLOR),
+                                  canvas.create_line(cx, cy - 6, cx, cy + 6, fill=BOX_COLOR))
+        else:
+            canvas.coords(self._box_item, left, top, right, bottom)
+            canvas.coords(self._centre_items[0], cx - 6, cy, cx + 6, cy)
+            canvas.coords(self._centre_items[1], cx, cy - 6, cx, cy + 6)
+        canvas.tag_raise(self._box_item)
+
+    def _to_screen(self, x, y):
+        """Canvas pixels for data points, same scale on both axes."""
+        x0, y0, x1, y1 = self.bounds
+        width, height = self.size
+        scale = min(width, height) - 2 * MARGIN
+        scale /= (x1 - x0)
+        return (width / 2 + (np.asarray(x) - (x0 + x1) / 2) * scale,
+                height / 2 - (np.asarray(y) - (y0 + y1) / 2) * scale)
+
+    def _on_configure(self, event):
+        if (event.width, event.height) != self.size and event.width > 1 and event.height > 1:
+            self.size = (event.width, event.height)
+            if self.bounds is not None:
+                self._redraw_samples()
+                self._draw_box()
@@ -0,0 +1,371 @@
+"""Tk canvas map of routes and the live GPS track in local metric coordinates.
+
+`MapView` draws
+- the full KML route (any size, thin grey line),
+- the uploaded waypoints (blue line with markers),
+- the track from intent 6 `lat`/`lon` replies, and
+- the robot position and heading.
+
+All geometry is projected once into metres east/north of the first point
+shown and cached as NumPy arrays. Redrawing for a new view does not touch
+the source geometry again:
+
+- Level of detail: the view scale is rounded to a power-of-two zoom level
+  whose cell is one to two pixels wide, and a line keeps only the
+  vertices that enter a new cell (`decimate`). The decimated indices are
+  cached per level, so zooming back and forth costs a lookup. A
+  100k-vertex route draws with at most a few thousand points.
+- Culling: only the runs of vertices near the visible area are drawn.
+- Panning moves the canvas items natively and redraws once the mouse is
+  released; wheel zoom scales the items at once and redraws the level
+  of detail shortly after the wheel stops.
+- The track is drawn incrementally: each new point extends the newest
+  line item (bounded to `TRACK_CHUNK` points) unless it falls in the
+  same cell as the last drawn point.
+
+Drag to pan, use the mouse wheel to zoom and double-click to fit.
+"""
+import math
+import tkinter as tk
+
+import numpy as np
+
+from route import _M_PER_DEG
+
+TRACK_CHUNK = 256
+REDRAW_DELAY_MS = 120
+# cells of the finest level, in metres (2 ** -MAX_LEVEL)
+MAX_LEVEL = 8
+
+ROUTE_STYLE = {"fill": "#9a9a9a", "width": 1}
+WAYPOINT_STYLE = {"fill": "#1f5fbf", "width": 2}
+TRACK_STYLE = {"fill": "#d9480f", "width": 2}
+
+
+class LocalFrame:
+    """Equirectangular projection to metres around a fixed origin."""
+
+    def __init__(self, lon0, lat0):
+        self.lon0 = lon0
+        self.lat0 = lat0
+        self.kx = _M_PER_DEG * math.cos(math.radians(lat0))
+
+    def project(self, lon, lat):
+        """(x east, y north) in metres; accepts scalars or arrays."""
+        return (np.subtract(lon, self.lon0) * self.kx,
+                np.subtract(lat, self.lat0) * _M_PER_DEG)
+
+
+def decimate(x, y, cell):
+    """Indices of the vertices that enter a new `cell`-sized grid cell.
+
+    The first and last vertex are always kept; the kept polyline stays
+    within about one cell of the original.
+    """
+    n = len(x)
+    if n <= 2:
+        return np.arange(n)
+    qx = np.floor(np.asarray(x) / cell)
+    qy = np.floor(np.asarray(y) / cell)
+    keep = np.empty(n, dtype=bool)
+    keep[0] = True
+    keep[1:] = (qx[1:] != qx[:-1]) | (qy[1:] != qy[:-1])
+    keep[-1] = True
+    return np.flatnonzero(keep)
+
+
+def _level(scale):
+    """Zoom level for `scale` pixels per metre: cells of 2**-level metres, 1-2 px."""
+    return min(int(math.floor(math.log2(scale))), MAX_LEVEL)
+
+
+class _Line:
+    """Projected vertices of one polyline with per-level decimation cache."""
+
+    def __init__(self, x, y):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self._lod = {}
+
+    def lod(self, level):
+        indices = self._lod.get(level)
+        if indices is None:
+            indices = self._lod[level] = decimate(self.x, self.y, 2.0 ** -level)
+        return indices
+
+
+class _Track:
+    """Growable projected track (amortised appends)."""
+
+    def __init__(self):
+        self.xy = np.empty((1024, 2))
+        self.n = 0
+
+    def append(self, x, y):
+        if self.n == len(self.xy):
+            self.xy = np.concatenate((self.xy, np.empty_like(self.xy)))
+        self.xy[self.n] = x, y
+        self.n += 1
+
+    def clear(self):
+        self.n = 0
+
+
+class MapView:
+    """Canvas with route, waypoints, live track and robot position."""
+
+    def __init__(self, parent, width=500, height=400, **canvas_options):
+        self.canvas = tk.Canvas(parent, width=width, height=height, background="white",
+                                highlightthickness=0, **canvas_options)
+        self.frame = None
+        self.route = None
+        self.waypoints = None
+        self.track = _Track()
+        self.position = None            # (x, y, heading or None)
+        # view: metres at the canvas centre and pixels per metre
+        self.cx = 0.0
+        self.cy = 0.0
+        self.scale = 1.0
+        self._fitted = False
+        self._redraw_job = None
+        self._drag = None
+        # incremental track state
+        self._track_item = None
+        self._track_coords = []
+        self._track_cell = None
+        self._track_drawn = 0
+
+        c = self.canvas
+        c.bind("<Configure>", lambda e: self.redraw())
+        c.bind("<ButtonPress-1>", self._on_press)
+        c.bind("<B1-Motion>", self._on_drag)
+        c.bind("<ButtonRelease-1>", self._on_release)
+        c.bind("<Double-Button-1>", lambda e: self.fit())
+        c.bind("<MouseWheel>", lambda e: self.zoom(1.25 if e.delta > 0 else 0.8, e.x, e.y))
+        c.bind("<Button-4>", lambda e: self.zoom(1.25, e.x, e.y))
+        c.bind("<Button-5>", lambda e: self.zoom(0.8, e.x, e.y))
+
+    # -- data ---------------------------------------------------------------
+
+    def set_route(self, lon, lat):
+        """Show a full route (e.g. all KML vertices); None or empty clears it."""
+        self.route = self._line(lon, lat)
+        self._refit()
+
+    def set_waypoints(self, lon, lat):
+        """Show the uploaded waypoints; None or empty clears them."""
+        self.waypoints = self._line(lon, lat)
+        self._refit()
+
+    def add_track_point(self, lon, lat):
+        """Append a GPS position to the track and draw just that point."""
+        x, y = self._project(lon, lat)
+        self.track.append(float(x[0]), float(y[0]))
+        if not self._fitted:
+            self._refit()
+            return
+        self._extend_track(self.track.n - 1)
+
+    def set_position(self, lon, lat, heading=None):
+        """Move the robot marker (heading in degrees, clockwise from north)."""
+        x, y = self._project(lon, lat)
+        self.position = (float(x[0]), float(y[0]), heading)
+        self._draw_position()
+
+    def clear_track(self):
+        self.track.clear()
+        self.redraw()
+
+    # -- view ---------------------------------------------------------------
+
+    def fit(self):
+        """Zoom to show all geometry."""
+        xs, ys = [], []
+        for line in (self.route, self.waypoints):
+            if line is not None and len(line.x):
+                xs.append(line.x)
+                ys.append(line.y)
+        if self.track.n:
+            xs.append(self.track.xy[:self.track.n, 0])
+            ys.append(self.track.xy[:self.track.n, 1])
+        if not xs:
+            return
+        x = np.concatenate(xs)
+        y = np.concatenate(ys)
+        width, height = self._size()
+        span_x = max(float(x.max() - x.min()), 1.0)
+        span_y = max(float(y.max() - y.min()), 1.0)
+        self.scale = min(0.9 * width / span_x, 0.9 * height / span_y)
+        self.cx = float(x.max() + x.min()) / 2
+        self.cy = float(y.max() + y.min()) / 2
+        self._fitted = True
+        self.redraw()
+
+    def zoom(self, factor, px=None, py=None):
+        """Zoom by `factor` about canvas pixel (px, py) (default: centre)."""
+        width, height = self._size()
+        px = width / 2 if px is None else px
+        py = height / 2 if py is None else py
+        # keep the point under the cursor fixed
+        mx = self.cx + (px - width / 2) / self.scale
+        my = self.cy - (py - height / 2) / self.scale
+        self.scale *= factor
+        self.cx = mx - (px - width / 2) / self.scale
+        self.cy = my + (py - height / 2) / self.scale
+        self.canvas.scale("map", px, py, factor, factor)
+        self._schedule_redraw()
+
+    def pan(self, dx, dy):
+        """Move the view by (dx, dy) pixels."""
+        self.cx -= dx / self.scale
+        self.cy += dy / self.scale
+        self.canvas.move("map", dx, dy)
+
+    def redraw(self):
+        """Redraw everything at the current view's level of detail."""
+        if self._redraw_job is not None:
+            self.canvas.after_cancel(self._redraw_job)
+            self._redraw_job = None
+        c = self.canvas
+        c.delete("map")
+        level = _level(self.scale)
+        if self.route is not None:
+            self._draw_line(self.route, level, ROUTE_STYLE)
+        if self.waypoints is not None:
+            self._draw_line(self.waypoints, level, WAYPOINT_STYLE)
+            self._draw_markers(self.waypoints)
+        self._track_item = None
+        self._track_coords = []
+        self._track_cell = None
+        self._track_drawn = 0
+        if self.track.n:
+            xy = self.track.xy[:self.track.n]
+            indices = decimate(xy[:, 0], xy[:, 1], 2.0 ** -level)
+            self._draw_runs(xy[indices, 0], xy[indices, 1], TRACK_STYLE)
+            self._track_drawn = self.track.n
+            last = indices[-1]
+            self._track_cell = self._cell(xy[last, 0], xy[last, 1], level)
+            self._track_coords = list(self._to_screen(xy[last:last + 1, 0], xy[last:last + 1, 1]))
+        self._draw_position()
+
+    # -- drawing ------------------------------------------------------------
+
+    def _draw_line(self, line, level, style):
+        indices = line.lod(level)
+        self._draw_runs(line.x[indices], line.y[indices], style)
+
+    def _draw_runs(self, x, y, style):
+        """Draw the parts of a polyline near the visible area."""
+        sx, sy = self._screen_arrays(x, y)
+        width, height = self._size()
+        near = (sx > -width) & (sx < 2 * width) & (sy > -height) & (sy < 2 * height)
+        # keep the neighbours of visible vertices so edge segments stay whole
+        visible = near.copy()
+        visible[1:] |= near[:-1]
+        visible[:-1] |= near[1:]
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], visible.view(np.int8), [0]))))
+        coords = np.column_stack((sx, sy)).ravel()
+        for start, stop in edges.reshape(-1, 2):
+            if stop - start >= 2:
+                self.canvas.create_line(*coords[2 * start:2 * stop].tolist(), tags=("map",), **style)
+
+    def _draw_markers(self, line, radius=3):
+        sx, sy = self._screen_arrays(line.x, line.y)
+        for x, y in zip(sx.tolist(), sy.tolist()):
+            self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius,
+                                    outline=WAYPOINT_STYLE["fill"], tags=("map",))
+
+    def _extend_track(self, index):
+        level = _level(self.scale)
+        x, y = self.track.xy[index]
+        cell = self._cell(x, y, level)
+        if cell == self._track_cell:
+            return
+        self._track_cell = cell
+        self._track_coords.extend(self._to_screen([x], [y]))
+        if len(self._track_coords) >= 4:
+            if self._track_item is None:
+                self._track_item = self.canvas.create_line(*self._track_coords, tags=("map",), **TRACK_STYLE)
+            else:
+                self.canvas.coords(self._track_item, *self._track_coords)
+            if len(self._track_coords) >= 2 * TRACK_CHUNK:
+                # start a new item from the last point so each update stays small
+                self._track_coords = self._track_coords[-2:]
+                self._track_item = None
+        self._track_drawn = index + 1
+        self._draw_position()
+
+    def _draw_position(self):
+        c = self.canvas
+        c.delete("robot")
+        if self.position is None:
+            return
+        x, y, heading = self.position
+        sx, sy = self._to_screen([x], [y])
+        c.create_oval(sx - 5, sy - 5, sx + 5, sy + 5, fill="#2b8a3e", outline="", tags=("map", "robot"))
+        if heading is not None:
+            h = math.radians(heading)
+            c.create_line(sx, sy, sx + 14 * math.sin(h), sy - 14 * math.cos(h), width=2,
+                          arrow=tk.LAST, fill="#2b8a3e", tags=("map", "robot"))
+
+    # -- helpers ------------------------------------------------------------
+
+    def _line(self, lon, lat):
+        if lon is None or not np.size(lon):
+            return None
+        return _Line(*self._project(lon, lat))
+
+    def _project(self, lon, lat):
+        """(x, y) arrays in metres; the first point projected sets the frame."""
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        if self.frame is None:
+            self.frame = LocalFrame(float(lon[0]), float(lat[0]))
+        return self.frame.project(lon, lat)
+
+    def _size(self):
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            # not mapped yet
+            width = int(self.canvas.cget("width"))
+            height = int(self.canvas.cget("height"))
+        return width, height
+
+    def _screen_arrays(self, x, y):
+        width, height = self._size()
+        return ((np.asarray(x) - self.cx) * self.scale + width / 2,
+                height / 2 - (np.asarray(y) - self.cy) * self.scale)
+
+    def _to_screen(self, x, y):
+        sx, sy = self._screen_arrays(x, y)
+        return float(sx[0]), float(sy[0])
+
+    @staticmethod
+    def _cell(x, y, level):
+        size = 2.0 ** -level
+        return math.floor(x / size), math.floor(y / size)
+
+    def _refit(self):
+        if self._fitted:
+            self.redraw()
+        else:
+            self.fit()
+
+    def _schedule_redraw(self):
+        if self._redraw_job is not None:
+            self.canvas.after_cancel(self._redraw_job)
+        self._redraw_job = self.canvas.after(REDRAW_DELAY_MS, self.redraw)
+
+    def _on_press(self, event):
+        self._drag = (event.x, event.y)
+
+    def _on_drag(self, event):
+        if self._drag is not None:
+            self.pan(event.x - self._drag[0], event.y - self._drag[1])
+            self._drag = (event.x, event.y)
+
+    def _on_release(self, event):
+        if self._drag is not None:
+            self._drag = None
+            self.redraw()
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""Run test missions from a JSON or YAML file, unattended.
+
+A mission is a list of steps that run back to back, each one as soon as
+the previous one is done: commands without a reply are written and the
+next step follows at once, and `wait` polls the status until its
+condition holds instead of sleeping for a fixed time.
+
+    name: regression course
+    repeat: 3
+    steps:
+      - upload: {route: course.kml, speed: 80, range: 2}
+      - bias: {left: 1.0, right: 0.97}
+      - log: {output: "runs/{name}-{run}.jsonl", status: 2, mag: 10}
+      - start
+      - wait: {until: parked, timeout: 900}
+      - stop
+
+Steps:
+
+- `upload`: simplify a KML route (`max_points`, `tolerance`) and send it
+  (intent 5) unless the device already holds it (`route.upload`), so
+  repeated runs do not resend the route. The routes are prepared once
+  when the mission is loaded. Unless `verify: false`, a route sent in
+  full is read back (intent 1) in the background and compared before the
+  next `start` or `goto`.
+- `bias`: motor bias factors `left` / `right` (intent 10).
+- `start`: start the stored route (intent 2); fails unless the device
+  holds 2-48 waypoints (the firmware would end the run at once) and the
+  next status shows the motors handled.
+- `goto`: drive to `lat` / `lon` at `speed` / `range` (intent 7), checked
+  like `start`. For `upload` and `goto`, `speed` is `goTo`'s setpoint,
+  0-100.
+- `wait`: poll the status every `poll` seconds until the robot is
+  `parked` (`motorHandled` false, the default) or `moving`; after
+  `timeout` seconds the run fails, or goes on with `on_timeout: continue`.
+- `log`: record telemetry to `output` (JSON Lines, `{name}` and `{run}`
+  are filled in) at `status` / `mag` Hz until the next `log` step, `log:
+  off` or the end of the run.
+- `stop`: stop the motors and any navigation (intent 3).
+- `send`: any other command as a raw object, e.g. `{intent: 8}`.
+
+Paths are relative to the mission file. Every step's start and duration
+are recorded; a failed step or Ctrl-C stops the robot.
+
+    python mission.py course.yaml COM3 --repeat 20 --report runs/report.jsonl
+
+YAML needs PyYAML; JSON missions work without it.
+"""
+import json
+import time
+from collections import namedtuple
+from pathlib import Path
+
+import geodesy
+import route
+import routecache
+from recorder import Recorder
+from scheduler import Scheduler
+from transport import PROTOCOL_FINGERPRINT, REPLY_INTENTS
+
+try:
+    import yaml
+    YAML_AVAILABLE = True
+except ImportError:
+    YAML_AVAILABLE = False
+
+STOP = {"intent": 3, "setStatus": False}
+ACTIONS = ("upload", "bias", "start", "goto", "wait", "log", "stop", "send")
+CONDITIONS = {"parked": False, "moving": True}
+# waypoint coordinates read back must match within this many degrees (~1 m)
+VERIFY_TOLERANCE = 1e-5
+
+Step = namedtuple("Step", "index action params")
+StepReport = namedtuple("StepReport", "index action started duration ok detail")
+RunReport = namedtuple("RunReport", "mission run started duration ok error steps")
+
+
+class StepFailed(RuntimeError):
+    """A step's condition was not met; the run stops the robot and ends."""
+
+
+class Mission:
+    """Validated steps of a mission file."""
+
+    def __init__(self, name, steps, repeat=1, base=Path(".")):
+        self.name = name
+        self.repeat = repeat
+        self.base = Path(base)
+        self.steps = [self._parse_step(index, raw) for index, raw in enumerate(steps, 1)]
+
+    @classmethod
+    def load(cls, path):
+        """Read a mission from a .json, .yaml or .yml file."""
+        path = Path(path)
+        text = path.read_text(encoding="utf-8")
+        if path.suffix.lower() in (".yaml", ".yml"):
+            if not YAML_AVAILABLE:
+                raise RuntimeError("YAML missions need PyYAML (pip install pyyaml); JSON works without it")
+            doc = yaml.safe_load(text)
+        else:
+            doc = json.loads(text)
+        if not isinstance(doc, dict) or not isinstance(doc.get("steps"), list) or not doc["steps"]:
+            raise ValueError(f"{path}: a mission needs a non-empty `steps` list")
+        repeat = doc.get("repeat", 1)
+        if not isinstance(repeat, int) or repeat < 1:
+            raise ValueError(f"{path}: `repeat` must be a positive integer")
+        return cls(str(doc.get("name", path.stem)), doc["steps"], repeat, path.parent)
+
+    def _parse_step(self, index, raw):
+        if isinstance(raw, str):
+            action, params = raw, {}
+        elif isinstance(raw, dict) and len(raw) == 1:
+            (action, params), = raw.items()
+        else:
+            raise ValueError(f"step {index}: expected an action name or a one-key mapping, got {raw!r}")
+        if action not in ACTIONS:
+            raise ValueError(f"step {index}: unknown action {action!r} (one of {', '.join(ACTIONS)})")
+        if params is None:
+            params = {}
+        if action == "log" and params in ("off", False):
+            params = {"output": None}
+        if not isinstance(params, dict):
+            raise ValueError(f"step {index} ({action}): parameters must be a mapping")
+        try:
+            params = getattr(self, f"_check_{action}", lambda p: p)(dict(params))
+        except KeyError as e:
+            raise ValueError(f"step {index} ({action}): missing parameter {e}") from None
+        except (TypeError, ValueError, OSError) as e:
+            raise ValueError(f"step {index} ({action}): {e}") from None
+        return Step(index, action, params)
+
+    def _check_upload(self, params):
+        path = self.base / params["route"]
+        max_points = params.get("max_points", route.MAX_WAYPOINTS)
+        tolerance = params.get("tolerance")
+        prepared = routecache.prepare(path, max_points, tolerance)
+        if tolerance is not None and prepared.error_m > tolerance:
+            raise ValueError(f"{path} deviates {prepared.error_m:.2f} m with {max_points} waypoints")
+        params["coordinates"] = route.build_coordinates(
+            prepared.lon, prepared.lat, _speed(params), float(params.get("range", 2.0)))
+        params["waypoints"] = len(prepared.lon)
+        params.setdefault("verify", True)
+        return params
+
+    def _check_bias(self, params):
+        return {"left": float(params["left"]), "right": float(params["right"])}
+
+    def _check_goto(self, params):
+        return {"lat": float(params["lat"]), "lon": float(params["lon"]),
+                "speed": _speed(params), "range": float(params.get("range", 2.0))}
+
+    def _check_wait(self, params):
+        until = params.get("until", "parked")
+        if until not in CONDITIONS:
+            raise ValueError(f"`until` must be one of {', '.join(CONDITIONS)}")
+        timeout = params.get("timeout")
+        on_timeout = params.get("on_timeout", "fail")
+        if on_timeout not in ("fail", "continue"):
+            raise ValueError("`on_timeout` must be fail or continue")
+        return {"until": until, "timeout": None if timeout is None else float(timeout),
+                "poll": float(params.get("poll", 0.1)), "on_timeout": on_timeout}
+
+    def _check_log(self, params):
+        output = params.get("output")
+        return {"output": None if output is None else str(self.base / output),
+                "status": float(params.get("status", 1.0)), "mag": float(params.get("mag", 0.0))}
+
+    def _check_send(self, params):
+        if not isinstance(params.get("intent"), int):
+            raise ValueError("`send` needs an integer `intent`")
+        return params
+
+
+class MissionRunner:
+    """Execute a `Mission` over a `Transport`."""
+
+    def __init__(self, link, request_timeout=1.0, max_failures=5):
+        self.link = link
+        self.request_timeout = request_timeout
+        self.max_failures = max_failures
+        self._checks = []
+        self._log = None
+        self._scheduler = None
+
+    def run(self, mission, run=1, on_step=None):
+        """Run all steps once; returns a `RunReport`.
+
+        `on_step(report)` is called after each step. A failed step ends the
+        run with `ok` false; Ctrl-C propagates. Both stop the robot first.
+        """
+        started = time.time()
+        t0 = time.monotonic()
+        steps = []
+        error = None
+        self._checks = []
+        try:
+            for step in mission.steps:
+                t = time.monotonic()
+                try:
+                    detail = getattr(self, f"_do_{step.action}")(step.params, mission, run)
+                    ok = True
+                except StepFailed as e:
+                    detail, ok = str(e), False
+                report = StepReport(step.index, step.action, t - t0, time.monotonic() - t, ok, detail)
+                steps.append(report)
+                if on_step:
+                    on_step(report)
+                if not ok:
+                    error = f"step {step.index} ({step.action}): {detail}"
+                    break
+            if error is None:
+                self._settle()
+        except StepFailed as e:
+            error = str(e)
+        except BaseException:
+            self.link.send(STOP)
+            raise
+        finally:
+            self._stop_log()
+        if error is not None:
+            self.link.send(STOP)
+        return RunReport(mission.name, run, started, time.monotonic() - t0, error is None, error, steps)
+
+    # -- steps --------------------------------------------------------------
+
+    def _do_upload(self, params, mission, run):
+        coordinates = params["coordinates"]
+        result = route.upload(self.link, coordinates, timeout=self.request_timeout)
+        if params["verify"] and result.action == "full":
+            # read back in the background; checked before the robot moves
+            self._checks.append((self.link.request_async({"intent": 1}), coordinates))
+        return f"{params['waypoints']} waypoints, {result.action} upload"
+
+    def _do_bias(self, params, mission, run):
+        self.link.send({"intent": 10, "biasL": params["left"], "biasR": params["right"]})
+        return None
+
+    def _do_start(self, params, mission, run):
+        self._settle()
+        count = self._stored_count()
+        if not route.MIN_WAYPOINTS <= count <= route.MAX_WAYPOINTS:
+            raise StepFailed(f"the device stores {count} waypoints, not a route "
+                             f"of {route.MIN_WAYPOINTS}-{route.MAX_WAYPOINTS}")
+        return self._start({"intent": 2})
+
+    def _do_goto(self, params, mission, run):
+        return self._start({"intent": 7, **params})
+
+    def _do_wait(self, params, mission, run):
+        wanted = CONDITIONS[params["until"]]
+        deadline = None if params["timeout"] is None else time.monotonic() + params["timeout"]
+        polls = 0
+        while True:
+            status = self._status()
+            polls += 1
+            if bool(status.get("motorHandled")) == wanted:
+                return f"{params['until']} after {polls} polls"
+            if deadline is not None and time.monotonic() >= deadline:
+                if params["on_timeout"] == "continue":
+                    return f"not {params['until']} after {params['timeout']:g} s, continuing"
+                raise StepFailed(f"not {params['until']} after {params['timeout']:g} s")
+            time.sleep(params["poll"])
+
+    def _do_log(self, params, mission, run):
+        self._stop_log()
+        if params["output"] is None:
+            return "off"
+        path = Path(params["output"].format(name=mission.name, run=run))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._log = Recorder(path)
+        self._scheduler = Scheduler(self.link)
+        if params["status"] > 0:
+            self._scheduler.add(6, self._log.record, fast=params["status"], slow=params["status"])
+        if params["mag"] > 0:
+            self._scheduler.add(9, self._log.record, fast=params["mag"], slow=params["mag"])
+        self._scheduler.start()
+        return str(path)
+
+    def _do_stop(self, params, mission, run):
+        self.link.send(STOP)
+        return None
+
+    def _do_send(self, params, mission, run):
+        if params["intent"] in REPLY_INTENTS:
+            reply = self.link.request(params, timeout=self.request_timeout)
+            if reply is None:
+                raise StepFailed(f"no reply to intent {params['intent']}")
+            return reply
+        self.link.send(params)
+        return None
+
+    # -- helpers ------------------------------------------------------------
+
+    def _status(self):
+        failures = 0
+        while True:
+            status = self.link.request({"intent": 6}, timeout=self.request_timeout)
+            if status is not None:
+                return status
+            failures += 1
+            if failures >= self.max_failures:
+                raise StepFailed(f"no status reply after {failures} requests")
+
+    def _stored_count(self):
+        """Waypoint count of the device's table (intent 14, or intent 1 on older firmware)."""
+        if self.link.protocol(self.request_timeout) >= PROTOCOL_FINGERPRINT:
+            reply = self.link.request({"intent": 14}, timeout=self.request_timeout)
+            count = None if reply is None else reply.get("count")
+        else:
+            reply = self.link.request({"intent": 1}, timeout=self.request_timeout)
+            count = None if reply is None else (reply.get("coordinates") or [None])[0]
+        if not isinstance(count, (int, float)):
+            raise StepFailed("no reply reading the stored route")
+        return int(count)
+
+    def _start(self, command):
+        """Send intent 2 / 7 between two status requests, all in flight at once."""
+        self._settle()
+        before = self.link.request_async({"intent": 6})
+        self.link.send(command)
+        # the firmware sets motorHandled while handling the command, so this
+        # only shows that it was taken; an unusable route is checked before
+        after = self._status()
+        try:
+            busy = before.result(self.request_timeout).get("motorHandled")
+        except Exception:
+            raise StepFailed("no status reply before starting") from None
+        if busy:
+            raise StepFailed("the platform was busy (motorHandled was already true)")
+        if not after.get("motorHandled"):
+            raise StepFailed("the platform did not start")
+        return None
+
+    def _settle(self):
+        """Wait for the background upload checks."""
+        checks, self._checks = self._checks, []
+        for future, expected in checks:
+            try:
+                reply = future.result(self.request_timeout * self.max_failures)
+            except Exception:
+                raise StepFailed("no reply reading back the uploaded route") from None
+            stored = reply.get("coordinates") or []
+            if not _same_table(stored, expected):
+                raise StepFailed(f"the device stores {stored[:1] or 'no'} waypoints, "
+                                 f"not the {expected[0]} uploaded")
+
+    def _stop_log(self):
+        if self._scheduler is not None:
+            self._scheduler.stop()
+            self._scheduler = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def _speed(params):
+    speed = float(params.get("speed", 1.0))
+    if not 0 <= speed <= geodesy.MAX_SETPOINT:
+        raise ValueError(f"`speed` must be 0-{geodesy.MAX_SETPOINT} (goTo's setpoint range), not {speed:g}")
+    return speed
+
+
+def _same_table(stored, expected):
+    if len(stored) < len(expected) or stored[0] != expected[0]:
+        return False
+    return all(abs(a - b) <= VERIFY_TOLERANCE for a, b in zip(stored[1:len(expected)], expected[1:]))
+
+
+def report_record(report):
+    """A `RunReport` as a JSON-serialisable dict."""
+    record = report._asdict()
+    record["steps"] = [s._asdict() for s in report.steps]
+    return record
+
+
+def main():
+    import argparse
+    import sys
+
+    from transport import Transport, open_port
+
+    parser = argparse.ArgumentParser(description="Run a mission file on the platform without pauses")
+    parser.add_argument("mission", help="mission file (.json, .yaml or .yml)")
+    parser.add_argument("port", help="device name or pyserial URL")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--repeat", type=int, help="number of runs (default: the mission's `repeat`)")
+    parser.add_argument("--report", help="append one JSON line per run to this file")
+    parser.add_argument("--keep-going", action="store_true", help="start the next run after a failed one")
+    args = parser.parse_args()
+
+    try:
+        mission = Mission.load(args.mission)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    repeat = args.repeat or mission.repeat
+
+    link = Transport(open_port(args.port, args.baudrate, timeout=1))
+    runner = MissionRunner(link)
+    failed = 0
+    try:
+        for run in range(1, repeat + 1):
+            print(f"Run {run}/{repeat} of {mission.name}")
+            report = runner.run(mission, run, on_step=lambda s: print(
+                f"  {s.index:2d} {s.action:<7} {s.started:8.2f} s +{s.duration:7.2f} s "
+                f"{'ok' if s.ok else 'FAILED'}" + (f"  {s.detail}" if s.detail is not None else "")))
+            print(f"  {'done' if report.ok else 'failed'} in {report.duration:.1f} s"
+                  + (f": {report.error}" if report.error else ""))
+            if args.report:
+                with open(args.report, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(report_record(report), default=str) + "\n")
+            if not report.ok:
+                failed += 1
+                if not args.keep_going:
+                    break
+    except KeyboardInterrupt:
+        print("\nStopped.")
+        failed += 1
+    finally:
+        link.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
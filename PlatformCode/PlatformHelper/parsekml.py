@@ -1,39 +1,184 @@
-"""Simple KML parser to extract coordinates from a <LineString><coordinates>...</coordinates></LineString> block.
+"""KML parser for the waypoint upload tools.
 
-Returns a flat list of floats (e.g. [lon,lat,alt, lon,lat,alt, ...]).
-This function is intentionally lightweight — it does not validate the KML
-structure strictly but will raise useful errors if the expected block
-is not found.
+`iter_geometries(path)` memory-maps the file and yields every Placemark's
+LineString, Point and Polygon (outer boundary) as a `Geometry` whose
+coordinates are a compact `array('d')` of lon, lat, alt triplets. The file
+is scanned tag by tag and coordinate blocks are converted in bounded
+chunks, so the full text is never held in memory — multi-megabyte survey
+exports parse with a small, constant working set on top of the result.
+
+`parse(path)` keeps the original flat-list API: the first LineString (or
+the first coordinates block) as `[lon, lat, alt, lon, lat, alt, ...]`, or
+`[lon, lat, ...]` when the file has no altitudes.
 """
-from pathlib import Path
+import mmap
 import re
+from array import array
+from collections import namedtuple
+from xml.sax.saxutils import unescape
 
+# tags that matter for the scan, with an optional namespace prefix
+_TAG = re.compile(
+    rb'<(/?)(?:[A-Za-z_][\w.-]*:)?'
+    rb'(Placemark|name|LineString|Point|Polygon|innerBoundaryIs|coordinates)\b[^>]*?(/?)>')
+_GEOMETRIES = (b'LineString', b'Point', b'Polygon')
+_WHITESPACE = b' \t\r\n'
 
-def parse(kmlfilePath: str):
-    text = Path(kmlfilePath).read_text(encoding='utf-8')
-
-    # Try to find the coordinates block inside a LineString
-    m = re.search(r"<LineString>.*?<coordinates>(.*?)</coordinates>.*?</LineString>", text, flags=re.DOTALL | re.IGNORECASE)
-    if not m:
-        # fallback: try to find any <coordinates>...</coordinates>
-        m = re.search(r"<coordinates>(.*?)</coordinates>", text, flags=re.DOTALL | re.IGNORECASE)
-        if not m:
-            raise ValueError("No <coordinates> block found in KML file")
-
-    coords_text = m.group(1)
-
-    # coordinates may be separated by whitespace and/or commas; split on whitespace or commas
-    parts = re.split(r"[\s,]+", coords_text.strip())
-    # filter out empty strings
-    parts = [p for p in parts if p != ""]
-
-    # convert to floats; ignore trailing non-numeric tokens
-    floats = []
-    for p in parts:
+# bytes of coordinate text converted per step
+CHUNK_SIZE = 1 << 20
+
+
+class Geometry(namedtuple("Geometry", "kind name coords has_alt")):
+    """One geometry of a Placemark.
+
+    `kind` is 'LineString', 'Point' or 'Polygon', `name` the Placemark name
+    (or None), `coords` an `array('d')` of lon, lat, alt triplets and
+    `has_alt` whether the source carried altitudes (0.0 is stored if not).
+    """
+    __slots__ = ()
+
+    @property
+    def vertices(self):
+        return len(self.coords) // 3
+
+    def lonlat(self):
+        """Flat `array('d')` of lon, lat pairs."""
+        out = array('d', bytes(16 * self.vertices))
+        out[0::2] = self.coords[0::3]
+        out[1::2] = self.coords[1::3]
+        return out
+
+    def as_numpy(self):
+        """(N, 3) NumPy view of the lon, lat, alt triplets (no copy)."""
+        import numpy as np
+        return np.frombuffer(self.coords, dtype=np.float64).reshape(-1, 3)
+
+
+def _convert(block, coords):
+    """Append the tuples of one whitespace-aligned block to `coords`.
+
+    Returns True if the block contained a tuple with an altitude.
+    """
+    tuples = block.split()
+    if not tuples:
+        return False
+    values = block.replace(b',', b' ').split()
+    n = len(tuples)
+    if len(values) == 3 * n:
+        coords.extend(map(float, values))
+        return True
+    if len(values) == 2 * n:
+        part = array('d', bytes(24 * n))
+        part[0::3] = array('d', map(float, values[0::2]))
+        part[1::3] = array('d', map(float, values[1::2]))
+        coords.extend(part)
+        return False
+    # mixed or malformed tuples: convert one by one, skipping bad values
+    has_alt = False
+    for t in tuples:
+        parts = []
+        for p in t.split(b','):
+            try:
+                parts.append(float(p))
+            except ValueError:
+                continue
+        if len(parts) < 2:
+            continue
+        has_alt = has_alt or len(parts) > 2
+        coords.extend(parts[:3] if len(parts) > 2 else (parts[0], parts[1], 0.0))
+    return has_alt
+
+
+def _read_coordinates(buf, start, end):
+    coords = array('d')
+    has_alt = False
+    pos = start
+    while pos < end:
+        stop = min(pos + CHUNK_SIZE, end)
+        if stop < end:
+            # cut at the last whitespace so no tuple is split
+            cut = max(buf.rfind(b' ', pos, stop), buf.rfind(b'\n', pos, stop),
+                      buf.rfind(b'\t', pos, stop))
+            if cut > pos:
+                stop = cut
+        has_alt = _convert(buf[pos:stop], coords) or has_alt
+        pos = stop
+    return coords, has_alt
+
+
+def _text(buf, start, end):
+    text = buf[start:end].decode('utf-8', errors='replace').strip()
+    if text.startswith('<![CDATA[') and text.endswith(']]>'):
+        return text[9:-3].strip()
+    return unescape(text)
+
+
+def _scan(buf):
+    pos = 0
+    name = None
+    in_placemark = False
+    kind = None
+    inner = False
+    while True:
+        m = _TAG.search(buf, pos)
+        if m is None:
+            return
+        closing, tag, self_closing = m.group(1), m.group(2), m.group(3)
+        pos = m.end()
+        if self_closing:
+            continue
+        if tag == b'Placemark':
+            in_placemark = not closing
+            name = None
+        elif tag == b'name':
+            if not closing and in_placemark and name is None and kind is None:
+                end = buf.find(b'</', pos)
+                if end != -1:
+                    name = _text(buf, pos, end)
+                    pos = end
+        elif tag in _GEOMETRIES:
+            if not closing and kind is None:
+                kind = tag.decode()
+            elif closing and kind == tag.decode():
+                kind = None
+        elif tag == b'innerBoundaryIs':
+            inner = not closing
+        elif tag == b'coordinates' and not closing:
+            end = buf.find(b'<', pos)
+            if end == -1:
+                end = len(buf)
+            if not inner:
+                coords, has_alt = _read_coordinates(buf, pos, end)
+                if coords:
+                    yield Geometry(kind or 'LineString', name, coords, has_alt)
+            pos = end
+
+
+def iter_geometries(kmlfilePath):
+    """Yield a `Geometry` for each coordinates block in the KML file."""
+    with open(kmlfilePath, 'rb') as f:
         try:
-            floats.append(float(p))
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
         except ValueError:
-            # skip values that can't be parsed
-            continue
+            # empty file
+            return
+        try:
+            yield from _scan(buf)
+        finally:
+            buf.close()
+
 
-    return floats
\ No newline at end of file
+def parse(kmlfilePath: str):
+    """Return the first LineString's coordinates as a flat list of floats."""
+    first = None
+    for geometry in iter_geometries(kmlfilePath):
+        if geometry.kind == 'LineString':
+            first = geometry
+            break
+        if first is None:
+            first = geometry
+    if first is None:
+        raise ValueError("No <coordinates> block found in KML file")
+    if first.has_alt:
+        return first.coords.tolist()
+    return first.lonlat().tolist()
@@ -0,0 +1,143 @@
+"""Append-only telemetry recorder.
+
+`Recorder` writes each sample as one JSON line (JSON Lines) as it arrives
+instead of collecting a session in memory and dumping it at the end. Lines
+are buffered and written in batches (every `flush_every` samples or
+`flush_interval` seconds), so memory stays flat however long a session
+runs, and a crash or Ctrl-C loses at most the last unflushed batch.
+
+Files rotate once they exceed `max_bytes` or are older than `max_age`
+seconds: `mag.jsonl`, then `mag.1.jsonl`, `mag.2.jsonl`, ... `read()`
+iterates the records of all segments in order. Like the old `json.dump`
+logs, a new recording replaces an earlier one of the same name, including
+its rotated segments.
+
+    with Recorder("mag.jsonl", max_bytes=16 << 20) as rec:
+        for sample in link.stream(9, 20):
+            rec.record(sample)
+"""
+import glob
+import json
+import re
+import threading
+import time
+from pathlib import Path
+
+MAX_BYTES = 64 << 20
+FLUSH_EVERY = 100
+FLUSH_INTERVAL = 1.0
+
+
+def segment_path(path, index):
+    """Path of segment `index` of a recording (0 is `path` itself)."""
+    path = Path(path)
+    if index == 0:
+        return path
+    return path.with_name(f"{path.stem}.{index}{path.suffix}")
+
+
+def segments(path):
+    """Existing segment files of a recording, oldest first."""
+    path = Path(path)
+    pattern = re.compile(re.escape(path.stem) + r"\.(\d+)" + re.escape(path.suffix) + "$")
+    found = []
+    for p in path.parent.glob(f"{glob.escape(path.stem)}.*{glob.escape(path.suffix)}"):
+        m = pattern.match(p.name)
+        if m:
+            found.append((int(m.group(1)), p))
+    rotated = [p for _, p in sorted(found)]
+    return ([path] if path.exists() else []) + rotated
+
+
+def read(path):
+    """Yield the records of a recording (all segments); bad lines are skipped."""
+    for segment in segments(path):
+        with open(segment, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+class Recorder:
+    """Stream samples to rotating JSON Lines files.
+
+    Each sample gets a `_t` field with the receive time (seconds since the
+    epoch) unless `timestamp=False` or it already has one. `record()` may be
+    called from any thread, e.g. a `Transport` subscription callback.
+    """
+
+    def __init__(self, path, max_bytes=MAX_BYTES, max_age=None, flush_every=FLUSH_EVERY,
+                 flush_interval=FLUSH_INTERVAL, timestamp=True):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.timestamp = timestamp
+        self.count = 0
+        self.paths = []
+        self._lock = threading.Lock()
+        self._pending = []
+        self._file = None
+        self._size = 0
+        self._opened = 0.0
+        self._last_flush = time.monotonic()
+        for old in segments(self.path):
+            old.unlink()
+        self._open(0)
+
+    def record(self, sample):
+        """Append one sample (a JSON-serialisable dict)."""
+        if self.timestamp and "_t" not in sample:
+            sample = dict(sample, _t=time.time())
+        line = json.dumps(sample, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                raise ValueError("recorder is closed")
+            self._pending.append(line)
+            self.count += 1
+            if (len(self._pending) >= self.flush_every
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._flush()
+
+    def close(self):
+        """Write pending samples and close the current file."""
+        with self._lock:
+            if self._file is not None:
+                self._flush(rotate=False)
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open(self, index):
+        path = segment_path(self.path, index)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8")
+        self._size = 0
+        self._opened = time.monotonic()
+        self.paths.append(path)
+
+    def _flush(self, rotate=True):
+        if self._pending:
+            data = "".join(self._pending)
+            self._pending.clear()
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+        self._last_flush = time.monotonic()
+        if rotate and (self._size >= self.max_bytes
+                or (self.max_age is not None and time.monotonic() - self._opened >= self.max_age)):
+            self._file.close()
+            self._open(len(self.paths))
@@ -0,0 +1,180 @@
+"""Route preparation for waypoint upload (intent 5).
+
+The firmware keeps the route in `double coordinateTable[100]` laid out as
+`[count, speed, range, lon1, lat1, lon2, lat2, ...]` and `wpManagerExec`
+only runs routes with `1 < count < 50`. Three header values plus 49 pairs
+would need 101 entries, so the largest route that fits is
+`MAX_WAYPOINTS = 48`.
+
+`simplify()` reduces a long KML route to at most that many waypoints with
+a Douglas-Peucker refinement on NumPy arrays: starting from the end
+points it repeatedly splits the segment whose farthest vertex deviates
+most, so the waypoint budget is spent where the route bends. The result
+reports the largest remaining cross-track deviation in metres, so a
+tolerance can be checked rather than hoped for.
+
+`upload()` sends a built route, unless the device already holds it: from
+protocol 5 the firmware reports a fingerprint of its table (intent 14),
+so re-sending the same route costs one short request, and a route that
+only differs in speed or range is updated without resending waypoints.
+"""
+import heapq
+import json
+from collections import namedtuple
+
+import numpy as np
+
+import parsekml
+import wirecodec
+
+TABLE_SIZE = 100
+HEADER_SIZE = 3
+MAX_WAYPOINTS = (TABLE_SIZE - HEADER_SIZE) // 2
+MIN_WAYPOINTS = 2
+
+# metres per degree of latitude for the local projection
+_M_PER_DEG = 6371009.0 * np.pi / 180.0
+
+Simplified = namedtuple("Simplified", "lon lat indices error_m")
+Route = namedtuple("Route", "lon lat error_m source_vertices")
+Upload = namedtuple("Upload", "action sent")
+
+
+def load_route(kml_path):
+    """Return (lon, lat) float arrays of the first LineString in the file."""
+    first = None
+    for geometry in parsekml.iter_geometries(kml_path):
+        if geometry.kind == 'LineString':
+            first = geometry
+            break
+        if first is None:
+            first = geometry
+    if first is None:
+        raise ValueError("No <coordinates> block found in KML file")
+    xyz = first.as_numpy()
+    return xyz[:, 0].copy(), xyz[:, 1].copy()
+
+
+def project(lon, lat):
+    """Project to a local planar frame in metres (x east, y north)."""
+    lat0 = np.radians(np.mean(lat))
+    x = (lon - lon[0]) * (_M_PER_DEG * np.cos(lat0))
+    y = (lat - lat[0]) * _M_PER_DEG
+    return x, y
+
+
+def _farthest(x, y, a, b):
+    """Index and distance of the vertex in (a, b) farthest from segment a-b."""
+    px = x[a + 1:b] - x[a]
+    py = y[a + 1:b] - y[a]
+    dx = x[b] - x[a]
+    dy = y[b] - y[a]
+    length2 = dx * dx + dy * dy
+    if length2 > 0:
+        t = np.clip((px * dx + py * dy) / length2, 0.0, 1.0)
+        px = px - t * dx
+        py = py - t * dy
+    d2 = px * px + py * py
+    k = int(np.argmax(d2))
+    return a + 1 + k, float(np.sqrt(d2[k]))
+
+
+def simplify(lon, lat, max_points=MAX_WAYPOINTS, tolerance=None):
+    """Reduce a route to at most `max_points` vertices.
+
+    Refinement stops early once every dropped vertex lies within
+    `tolerance` metres of the simplified path. Returns a `Simplified` with
+    the kept coordinates, their indices into the input and `error_m`, the
+    largest distance from any input vertex to the simplified path.
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    n = len(lon)
+    if max_points < MIN_WAYPOINTS:
+        raise ValueError(f"max_points must be at least {MIN_WAYPOINTS}")
+    if n <= 2 or (n <= max_points and tolerance is None):
+        indices = np.arange(n)
+        return Simplified(lon, lat, indices, 0.0)
+
+    x, y = project(lon, lat)
+    keep = [0, n - 1]
+    heap = []
+
+    def push(a, b):
+        if b - a > 1:
+            k, d = _farthest(x, y, a, b)
+            heapq.heappush(heap, (-d, a, b, k))
+
+    push(0, n - 1)
+    limit = tolerance if tolerance is not None else 0.0
+    while heap and len(keep) < max_points and -heap[0][0] > limit:
+        _, a, b, k = heapq.heappop(heap)
+        keep.append(k)
+        push(a, k)
+        push(k, b)
+
+    error = -heap[0][0] if heap else 0.0
+    indices = np.array(sorted(keep))
+    return Simplified(lon[indices], lat[indices], indices, max(error, 0.0))
+
+
+def prepare(kml_path, max_points=MAX_WAYPOINTS, tolerance=None):
+    """Load and simplify a KML route for upload. Returns a `Route`."""
+    lon, lat = load_route(kml_path)
+    simplified = simplify(lon, lat, max_points, tolerance)
+    return Route(simplified.lon, simplified.lat, simplified.error_m, len(lon))
+
+
+def build_coordinates(lon, lat, speed, range_m):
+    """Build the intent 5 `coordinates` list `[count, speed, range, lon, lat, ...]`."""
+    count = len(lon)
+    if not MIN_WAYPOINTS <= count <= MAX_WAYPOINTS:
+        raise ValueError(f"route has {count} waypoints, the device accepts {MIN_WAYPOINTS}-{MAX_WAYPOINTS}")
+    table = np.empty(HEADER_SIZE + 2 * count)
+    table[0] = count
+    table[1] = speed
+    table[2] = range_m
+    table[3::2] = lon
+    table[4::2] = lat
+    coordinates = table.tolist()
+    coordinates[0] = count
+    return coordinates
+
+
+def parse_coordinates(coordinates):
+    """(lon, lat) arrays of an intent 1 / intent 5 `coordinates` list."""
+    count = int(coordinates[0])
+    table = np.asarray(coordinates[HEADER_SIZE:HEADER_SIZE + 2 * count], dtype=np.float64)
+    if len(table) != 2 * count:
+        raise ValueError("coordinates list is shorter than its count")
+    return table[0::2], table[1::2]
+
+
+def _same_f32(a, b):
+    """True if `a` and `b` are equal as float32 (binary uploads store float32)."""
+    return isinstance(a, (int, float)) and np.float32(a) == np.float32(b)
+
+
+def upload(link, coordinates, force=False, timeout=2.0):
+    """Send a `build_coordinates` list unless the device already holds it.
+
+    Returns an `Upload` whose `action` is "unchanged" (nothing sent),
+    "header" (speed / range updated with intent 14) or "full" (intent 5),
+    and `sent` the bytes of that command. Firmware before protocol 5, or
+    `force`, always gets the full route.
+    """
+    from transport import PROTOCOL_FINGERPRINT
+
+    if not force and link.protocol(timeout) >= PROTOCOL_FINGERPRINT:
+        stored = link.request({"intent": 14}, timeout=timeout)
+        if (stored is not None and stored.get("count") == coordinates[0]
+                and stored.get("routeHash") == wirecodec.route_hash(coordinates)):
+            speed, range_m = coordinates[1], coordinates[2]
+            if _same_f32(stored.get("speed"), speed) and _same_f32(stored.get("range"), range_m):
+                return Upload("unchanged", 0)
+            header = {"intent": 14, "speed": speed, "range": range_m}
+            reply = link.request(header, timeout=timeout)
+            if (reply is not None and reply.get("routeHash") == stored["routeHash"]
+                    and _same_f32(reply.get("speed"), speed) and _same_f32(reply.get("range"), range_m)):
+                return Upload("header", len(json.dumps(header)))
+    return Upload("full", len(link.send({"intent": 5, "coordinates": coordinates})))
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""On-disk cache of parsed and prepared routes.
+
+Parsing a KML file and simplifying its route takes longer the bigger the
+file, and every upload used to do both again. `prepare()` and
+`load_route()` here have the signatures of their `route` counterparts but
+keep each result as a small `.npy` file, keyed by a hash of the file's
+bytes and the preparation parameters, so re-uploading or switching
+between the usual routes only hashes the file and loads a few hundred
+bytes. The parsed route is cached as well, so trying another
+`max_points` or `tolerance` on the same file does not parse it again.
+Editing a file changes its hash; its old entries simply age out. Within
+one process a file is hashed again only when its size or modification
+time changes.
+
+Each entry is one float64 array of shape (n + 1, 2): row 0 holds
+(`error_m`, `source_vertices`), the other rows (lon, lat). Once the
+entries exceed `max_bytes`, the least recently used ones (by file
+modification time, refreshed on every hit) are deleted. The cache lives
+in `$OPENMOVER_ROUTE_CACHE`, or `openmover/routes` in the user cache
+directory; if it cannot be written the routes are prepared uncached.
+
+    python routecache.py            # show location, entries and size
+    python routecache.py --clear
+"""
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+
+import route
+
+FORMAT_VERSION = 1
+DEFAULT_MAX_BYTES = 32 << 20
+ENV_DIR = "OPENMOVER_ROUTE_CACHE"
+_HASH_CHUNK = 1 << 20
+
+
+def default_directory():
+    """Cache directory from the environment or the platform's cache location."""
+    if os.environ.get(ENV_DIR):
+        return Path(os.environ[ENV_DIR])
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA")
+    return (Path(base) if base else Path.home() / ".cache") / "openmover" / "routes"
+
+
+_digests = {}
+
+
+def file_digest(path):
+    """BLAKE2 hash of a file's contents (hex)."""
+    st = os.stat(path)
+    memo = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    digest = _digests.get(memo)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = _digests[memo] = h.hexdigest()
+    return digest
+
+
+class RouteCache:
+    """Prepared routes on disk, keyed by file hash and parameters."""
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = Path(directory) if directory is not None else default_directory()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def prepare(self, kml_path, max_points=route.MAX_WAYPOINTS, tolerance=None):
+        """Cached `route.prepare`; returns a `route.Route`."""
+        max_points = int(max_points)
+        tolerance = None if tolerance is None else float(tolerance)
+        digest = file_digest(kml_path)
+        key = self._key(digest, "prepared", max_points, tolerance)
+        table = self._get(key)
+        if table is None:
+            lon, lat = self._parsed(digest, kml_path)
+            simplified = route.simplify(lon, lat, max_points, tolerance)
+            table = _pack(simplified.lon, simplified.lat, simplified.error_m, len(lon))
+            self._put(key, table)
+        lon, lat = _unpack(table)
+        return route.Route(lon, lat, float(table[0, 0]), int(table[0, 1]))
+
+    def load_route(self, kml_path):
+        """Cached `route.load_route`; returns (lon, lat) arrays."""
+        return self._parsed(file_digest(kml_path), kml_path)
+
+    def entries(self):
+        """Cache files, least recently used first."""
+        try:
+            files = [(p.stat().st_mtime, p) for p in self.directory.glob("*.npy")]
+        except OSError:
+            return []
+        return [p for _, p in sorted(files)]
+
+    def size(self):
+        return sum(p.stat().st_size for p in self.entries())
+
+    def clear(self):
+        for path in self.entries():
+            path.unlink(missing_ok=True)
+
+    # -- helpers ------------------------------------------------------------
+
+    def _parsed(self, digest, kml_path):
+        key = self._key(digest, "parsed")
+        table = self._get(key)
+        if table is None:
+            lon, lat = route.load_route(kml_path)
+            table = _pack(lon, lat, 0.0, len(lon))
+            self._put(key, table)
+        return _unpack(table)
+
+    @staticmethod
+    def _key(digest, *params):
+        return hashlib.blake2b(repr((FORMAT_VERSION, digest) + params).encode(), digest_size=16).hexdigest()
+
+    def _get(self, key):
+        path = self.directory / f"{key}.npy"
+        try:
+            table = np.load(path, allow_pickle=False)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if table.ndim != 2 or table.shape[1] != 2 or not len(table):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return table
+
+    def _put(self, key, table):
+        path = self.directory / f"{key}.npy"
+        tmp = path.with_name(f"{key}.{os.getpid()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as f:
+                np.save(f, table)
+            os.replace(tmp, path)
+            self._evict(keep=path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+
+    def _evict(self, keep):
+        entries = []
+        for path in self.directory.glob("*.npy"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path != keep:
+                path.unlink(missing_ok=True)
+                total -= size
+
+
+def _pack(lon, lat, error_m, source_vertices):
+    table = np.empty((len(lon) + 1, 2))
+    table[0] = (error_m, source_vertices)
+    table[1:, 0] = lon
+    table[1:, 1] = lat
+    return table
+
+
+def _unpack(table):
+    return np.ascontiguousarray(table[1:, 0]), np.ascontiguousarray(table[1:, 1])
+
+
+_default = None
+
+
+def default_cache():
+    """The shared `RouteCache` in `default_directory()`."""
+    global _default
+    if _default is None:
+        _default = RouteCache()
+    return _default
+
+
+def prepare(kml_path, max_points=route.MAX_WAYPOINTS, tolerance=None):
+    """`route.prepare` through the default cache."""
+    return default_cache().prepare(kml_path, max_points, tolerance)
+
+
+def load_route(kml_path):
+    """`route.load_route` through the default cache."""
+    return default_cache().load_route(kml_path)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show or clear the prepared route cache")
+    parser.add_argument("--dir", help=f"cache directory (default: {default_directory()})")
+    parser.add_argument("--clear", action="store_true", help="delete all entries")
+    args = parser.parse_args()
+
+    cache = RouteCache(args.dir)
+    if args.clear:
+        cache.clear()
+    print(f"{cache.directory}: {len(cache.entries())} entries, "
+          f"{cache.size() / 1024:.1f} KiB of {cache.max_bytes >> 20} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""Drive routes longer than the device waypoint table in segments.
+
+The firmware holds one route of at most `route.MAX_WAYPOINTS` waypoints.
+`RouteStreamer` splits a long route into consecutive table-sized segments
+and runs them back to back:
+
+1. upload segment 0 (intent 5) and start it (intent 2),
+2. as soon as a status reply (intent 6) shows the task running, upload the
+   next segment: intent 2 hands `wpManagerExec` its own copy of
+   `coordinateTable`, so overwriting the table while it drives is safe (a
+   segment that does not start within `request_timeout * max_failures`
+   raises instead),
+3. poll `motorHandled` and send intent 2 the moment it drops to false, so
+   the hand-off costs one status round trip plus one command.
+
+Each segment is reported with its drive time and the idle time before it
+started (measured from the last status that still showed the previous
+segment running, so it is an upper bound).
+
+    python routestream.py COM3 route.kml --speed 50 --range 2 --tolerance 0.5
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import route
+
+SegmentReport = namedtuple("SegmentReport", "index waypoints started finished duration idle_before")
+
+
+def split_route(lon, lat, segment_size=route.MAX_WAYPOINTS):
+    """Split a route into consecutive segments of at most `segment_size`.
+
+    Segments are balanced so none falls below the device minimum of two
+    waypoints. Returns a list of (lon, lat) array pairs.
+    """
+    n = len(lon)
+    if n < route.MIN_WAYPOINTS:
+        raise ValueError("route needs at least two waypoints")
+    if segment_size < route.MIN_WAYPOINTS:
+        raise ValueError(f"segment_size must be at least {route.MIN_WAYPOINTS}")
+    count = -(-n // segment_size)
+    bounds = np.linspace(0, n, count + 1).round().astype(int)
+    return [(np.asarray(lon[a:b]), np.asarray(lat[a:b])) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+class RouteStreamer:
+    """Upload and run a long route segment by segment over a `Transport`."""
+
+    def __init__(self, link, lon, lat, speed, range_m, segment_size=route.MAX_WAYPOINTS,
+                 poll_interval=0.1, request_timeout=1.0, max_failures=5):
+        self.link = link
+        self.segments = split_route(lon, lat, segment_size)
+        self.speed = speed
+        self.range_m = range_m
+        self.poll_interval = poll_interval
+        self.request_timeout = request_timeout
+        self.max_failures = max_failures
+        self.reports = []
+
+    def _upload(self, index):
+        lon, lat = self.segments[index]
+        self.link.send({"intent": 5, "coordinates": route.build_coordinates(lon, lat, self.speed, self.range_m)})
+
+    def _status(self):
+        failures = 0
+        while True:
+            status = self.link.request({"intent": 6}, timeout=self.request_timeout)
+            if status is not None:
+                return status
+            failures += 1
+            if failures >= self.max_failures:
+                raise RuntimeError(f"no status reply after {failures} requests")
+
+    def _wait_started(self, index):
+        """Status once `motorHandled` shows segment `index` running."""
+        deadline = time.monotonic() + self.request_timeout * self.max_failures
+        while True:
+            status = self._status()
+            if status.get("motorHandled"):
+                return status
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"segment {index + 1} did not start (motorHandled stayed false)")
+            time.sleep(self.poll_interval)
+
+    def stop(self):
+        """Stop the robot (intent 3)."""
+        self.link.send({"intent": 3, "setStatus": False})
+
+    def run(self, on_segment=None):
+        """Run all segments; returns the list of `SegmentReport`.
+
+        `on_segment(report)` is called after each segment finishes. Ctrl-C
+        (or any error) stops the robot before the exception propagates.
+        """
+        status = self._status()
+        if status.get("motorHandled"):
+            raise RuntimeError("the platform is busy (motorHandled is true)")
+        if not status.get("fix"):
+            raise RuntimeError("no GPS fix; the waypoint task would skip every waypoint")
+
+        self.reports = []
+        try:
+            self._upload(0)
+            last_busy = None
+            for index in range(len(self.segments)):
+                self.link.send({"intent": 2})
+                started = time.monotonic()
+                idle = started - last_busy if last_busy is not None else 0.0
+
+                # intent 2 hands the task a copy of the table, so the next
+                # segment can go out once the status confirms the start
+                status = self._wait_started(index)
+                if index + 1 < len(self.segments):
+                    self._upload(index + 1)
+
+                last_busy = started
+                while status.get("motorHandled"):
+                    last_busy = time.monotonic()
+                    time.sleep(self.poll_interval)
+                    status = self._status()
+                finished = time.monotonic()
+
+                report = SegmentReport(index, len(self.segments[index][0]), started, finished,
+                                       finished - started, idle)
+                self.reports.append(report)
+                if on_segment:
+                    on_segment(report)
+        except BaseException:
+            self.stop()
+            raise
+        return self.reports
+
+
+def main():
+    import argparse
+    from transport import Transport, open_port
+
+    parser = argparse.ArgumentParser(description="Stream a long KML route to the platform in segments")
+    parser.add_argument("port", help="serial port or URL (socket://host:port)")
+    parser.add_argument("kml", help="route file")
+    parser.add_argument("--speed", type=float, required=True)
+    parser.add_argument("--range", type=float, required=True, dest="range_m")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="simplify the route to this cross-track deviation in metres first")
+    parser.add_argument("--segment-size", type=int, default=route.MAX_WAYPOINTS)
+    parser.add_argument("--poll", type=float, default=0.1, help="status poll interval in seconds")
+    args = parser.parse_args()
+
+    import routecache
+
+    lon, lat = routecache.load_route(args.kml)
+    if args.tolerance is not None:
+        simplified = route.simplify(lon, lat, max_points=len(lon), tolerance=args.tolerance)
+        print(f"Simplified {len(lon)} vertices to {len(simplified.lon)} (max deviation {simplified.error_m:.2f} m)")
+        lon, lat = simplified.lon, simplified.lat
+
+    link = Transport(open_port(args.port, timeout=1))
+    try:
+        streamer = RouteStreamer(link, lon, lat, args.speed, args.range_m, args.segment_size, args.poll)
+        print(f"Driving {len(lon)} waypoints in {len(streamer.segments)} segment(s)")
+        reports = streamer.run(lambda r: print(
+            f"Segment {r.index + 1}: {r.waypoints} waypoints in {r.duration:.1f} s, idle before {r.idle_before * 1000:.0f} ms"))
+        total_idle = sum(r.idle_before for r in reports)
+        print(f"Done: {sum(r.duration for r in reports):.1f} s driving, {total_idle * 1000:.0f} ms idle between segments")
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        link.close()
+
+
+if __name__ == "__main__":
+    main()
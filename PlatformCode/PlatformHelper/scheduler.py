@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Adaptive telemetry rates for intent 6 / 9 under a link budget.
+
+A `Scheduler` fetches the status (intent 6) and magnetometer (intent 9)
+streams at rates that follow what the robot is doing:
+
+- `fast` while it moves: any status reply seen on the link (whoever asked
+  for it) with `motorHandled` true or a non-zero setpoint makes it active,
+  as does `mark_active()` when the caller sends a motor command, and it
+  stays active for `IDLE_AFTER` seconds (at least two status intervals)
+  after that;
+- `slow` while it is parked;
+- halved for every timeout in a row (down to 1/`MAX_BACKOFF`), back to
+  normal with the next reply.
+
+All streams together stay within `budget` bytes/s, by default half of
+the line rate (`BUDGET_SHARE` of baudrate / 10), so motor commands and
+uploads always find room: when the wanted rates would exceed it, every
+stream is slowed by the same factor. The bytes per sample are measured
+from the replies in the active encoding.
+
+On firmware with pushed streams (intent 12) the rates are set on the
+subscriptions, otherwise the scheduler polls. `rates()` reports the
+target and the effective (measured) rate of every stream:
+
+    python scheduler.py COM3                 # print rates as they adapt
+    python scheduler.py COM3 --budget 2000 --poll
+"""
+import json
+import threading
+import time
+from collections import deque, namedtuple
+
+import wirecodec
+from transport import PROTOCOL_STREAMS, STREAM_INTENTS, classify_reply
+
+# share of the line rate telemetry may use
+BUDGET_SHARE = 0.5
+# seconds without motor activity before streams drop to their slow rate
+IDLE_AFTER = 3.0
+MAX_BACKOFF = 16
+# window for the effective rate
+RATE_WINDOW = 3.0
+# pushed stream rates are only changed by more than this fraction
+RATE_HYSTERESIS = 0.1
+
+NAMES = {6: "status", 9: "mag"}
+DEFAULT_RATES = {6: (5.0, 0.5), 9: (10.0, 1.0)}
+# status rates used just to follow the robot's state when no one asked for status
+STATE_PROBE = (1.0, 0.2)
+# commands that start the robot moving, for `mark_active()`
+MOTION_INTENTS = (2, 4, 7, 8)
+# bytes per reply until one was measured (JSON)
+DEFAULT_REPLY_SIZE = {6: 300, 9: 130}
+
+StreamRate = namedtuple("StreamRate", "target effective backoff bytes_per_sample")
+
+
+class _Stream:
+    def __init__(self, intent, callback, fast, slow):
+        self.intent = intent
+        self.callback = callback
+        self.fast = fast
+        self.slow = slow
+        self.rate = slow
+        self.backoff = 1
+        self.reply_size = DEFAULT_REPLY_SIZE[intent]
+        self.request_size = len(json.dumps({"intent": intent, "id": 255}))
+        self.arrivals = deque()
+        self.future = None
+        self.sent = 0.0
+        self.subscription = None
+        self.last_arrival = None
+
+
+class Scheduler:
+    """Poll or subscribe to intent 6 / 9 at rates adapted to the robot's state."""
+
+    def __init__(self, link, budget=None, push=True, timeout=1.0):
+        self.link = link
+        if budget is None:
+            baudrate = getattr(link.port, "baudrate", None)
+            budget = BUDGET_SHARE * baudrate / 10 if baudrate else None
+        self.budget = budget
+        self.push = push
+        self.timeout = timeout
+        self.active = False
+        # True once started if the firmware pushes the streams
+        self.pushed = False
+        self.started = None
+        self._last_active = None
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+        link.add_listener(self._observe)
+
+    def add(self, intent, callback=None, fast=None, slow=None):
+        """Schedule `intent` (6 or 9) at `fast` / `slow` Hz (moving / parked).
+
+        `callback(msg)` runs on a worker thread for every sample.
+        """
+        if intent not in STREAM_INTENTS:
+            raise ValueError(f"intent {intent} cannot be scheduled")
+        default_fast, default_slow = DEFAULT_RATES[intent]
+        fast = default_fast if fast is None else fast
+        slow = min(default_slow if slow is None else slow, fast)
+        with self._lock:
+            self._streams[intent] = _Stream(intent, callback, fast, slow)
+        self._wake.set()
+
+    def start(self):
+        """Start fetching in a background thread."""
+        if self._running:
+            return self
+        with self._lock:
+            if 6 not in self._streams:
+                self._streams[6] = _Stream(6, None, *STATE_PROBE)
+        self._running = True
+        self.started = time.monotonic()
+        self.pushed = self.push and self.link.protocol() >= PROTOCOL_STREAMS
+        self._thread = threading.Thread(target=self._run, name="telemetry-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop fetching and close any subscriptions."""
+        self._running = False
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self.link.remove_listener(self._observe)
+        with self._lock:
+            streams = list(self._streams.values())
+        for stream in streams:
+            if stream.subscription is not None:
+                stream.subscription.close()
+                stream.subscription = None
+            if stream.future is not None:
+                stream.future.cancel()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def rates(self):
+        """{intent: StreamRate(target Hz, effective Hz, backoff, bytes per sample)}."""
+        now = time.monotonic()
+        out = {}
+        with self._lock:
+            for intent, stream in self._streams.items():
+                while stream.arrivals and stream.arrivals[0] < now - RATE_WINDOW:
+                    stream.arrivals.popleft()
+                span = min(RATE_WINDOW, now - self.started) if self.started else 0
+                effective = len(stream.arrivals) / span if span > 0 else 0.0
+                out[intent] = StreamRate(stream.rate, effective, stream.backoff, self._cost(stream))
+        return out
+
+    def describe(self):
+        """One line with the rate of every stream."""
+        rates = self.rates()
+        parts = [f"{NAMES[intent]} {r.target:.2g} Hz (got {r.effective:.2g})"
+                 + (f" backoff x{r.backoff}" if r.backoff > 1 else "")
+                 for intent, r in sorted(rates.items())]
+        state = "active" if self.active else "idle"
+        used = sum(r.target * r.bytes_per_sample for r in rates.values())
+        budget = f"{used:.0f}/{self.budget:.0f} B/s" if self.budget else f"{used:.0f} B/s"
+        return f"{state}, {budget}: " + ", ".join(parts)
+
+    # -- internals ----------------------------------------------------------
+
+    def _cost(self, stream):
+        """Link bytes per sample (both directions)."""
+        return stream.reply_size + (0 if self._pushed_mode() else stream.request_size)
+
+    def _pushed_mode(self):
+        return self._running and self.pushed
+
+    def mark_active(self):
+        """Switch to the fast rates now, e.g. after sending a motor command."""
+        self._last_active = time.monotonic()
+        if not self.active:
+            self.active = True
+            self._wake.set()
+
+    def _observe(self, msg):
+        if classify_reply(msg) != 6:
+            return
+        if msg.get("motorHandled") or msg.get("setPointL") or msg.get("setPointR"):
+            self.mark_active()
+
+    def _update_rates(self, now):
+        """Target rates from state and backoff, scaled into the budget (lock held)."""
+        if self.active:
+            status = self._streams.get(6)
+            hold = max(IDLE_AFTER, 2.0 / status.rate) if status else IDLE_AFTER
+            if now - self._last_active >= hold:
+                self.active = False
+        wanted = {intent: (s.fast if self.active else s.slow) / s.backoff for intent, s in self._streams.items()}
+        if self.budget:
+            used = sum(rate * self._cost(self._streams[intent]) for intent, rate in wanted.items())
+            if used > self.budget:
+                scale = self.budget / used
+                wanted = {intent: rate * scale for intent, rate in wanted.items()}
+        for intent, rate in wanted.items():
+            self._streams[intent].rate = rate
+
+    def _run(self):
+        while self._running:
+            now = time.monotonic()
+            wait = 0.25
+            with self._lock:
+                self._update_rates(now)
+                streams = list(self._streams.values())
+            for stream in streams:
+                if self.pushed:
+                    wait = min(wait, self._tend_subscription(stream, now))
+                else:
+                    wait = min(wait, self._tend_poll(stream, now))
+            self._wake.wait(max(wait, 0.005))
+            self._wake.clear()
+
+    def _tend_poll(self, stream, now):
+        if stream.future is not None:
+            if not stream.future.done() and now - stream.sent > self.timeout:
+                stream.future.cancel()
+                self._timed_out(stream)
+            elif not stream.future.done():
+                return stream.sent + self.timeout - now
+            stream.future = None
+        due = stream.sent + 1.0 / stream.rate
+        if now < due:
+            return due - now
+        stream.sent = now
+        future = self.link.request_async({"intent": stream.intent})
+        future.add_done_callback(lambda f: self._replied(stream, f))
+        stream.future = future
+        return min(1.0 / stream.rate, self.timeout)
+
+    def _tend_subscription(self, stream, now):
+        if stream.subscription is None:
+            stream.subscription = self.link.subscribe(stream.intent, stream.rate,
+                                                      lambda msg: self._received(stream, msg))
+            stream.last_arrival = now
+        elif abs(stream.rate - stream.subscription.rate) > RATE_HYSTERESIS * stream.subscription.rate:
+            stream.subscription.set_rate(stream.rate)
+        limit = max(2.0 / stream.rate, self.timeout)
+        if now - stream.last_arrival > limit:
+            stream.last_arrival = now
+            self._timed_out(stream)
+        return stream.last_arrival + limit - now
+
+    def _timed_out(self, stream):
+        with self._lock:
+            stream.backoff = min(stream.backoff * 2, MAX_BACKOFF)
+        self._wake.set()
+
+    def _replied(self, stream, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._received(stream, future.result())
+        self._wake.set()
+
+    def _received(self, stream, msg):
+        now = time.monotonic()
+        size = self._reply_size(stream.intent, msg)
+        with self._lock:
+            stream.last_arrival = now
+            stream.arrivals.append(now)
+            stream.reply_size += (size - stream.reply_size) / 8
+            if stream.backoff > 1:
+                stream.backoff = 1
+                self._wake.set()
+        if stream.callback is not None:
+            stream.callback(msg)
+
+    def _reply_size(self, intent, msg):
+        if self.link.binary:
+            try:
+                return len(wirecodec.encode_reply(intent, msg))
+            except (KeyError, TypeError, ValueError):
+                pass
+        return len(json.dumps(msg, separators=(",", ":")))
+
+
+def main():
+    import argparse
+
+    from transport import Transport, open_port
+
+    parser = argparse.ArgumentParser(description="Fetch telemetry at adaptive rates and report them")
+    parser.add_argument("port", help="device name or pyserial URL")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--budget", type=float, help="telemetry bytes/s (default: half the line rate)")
+    parser.add_argument("--poll", action="store_true", help="poll even if the firmware can push")
+    parser.add_argument("--status", type=float, nargs=2, default=DEFAULT_RATES[6], metavar=("FAST", "SLOW"),
+                        help="status rates in Hz while moving / parked")
+    parser.add_argument("--mag", type=float, nargs=2, default=DEFAULT_RATES[9], metavar=("FAST", "SLOW"),
+                        help="magnetometer rates in Hz while moving / parked")
+    args = parser.parse_args()
+
+    link = Transport(open_port(args.port, args.baudrate, timeout=1))
+    scheduler = Scheduler(link, budget=args.budget, push=not args.poll)
+    scheduler.add(6, fast=args.status[0], slow=args.status[1])
+    scheduler.add(9, fast=args.mag[0], slow=args.mag[1])
+    try:
+        with scheduler:
+            while True:
+                time.sleep(1.0)
+                print(scheduler.describe())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        link.close()
+
+
+if __name__ == "__main__":
+    main()
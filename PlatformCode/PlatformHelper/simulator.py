@@ -0,0 +1,689 @@
+#!/usr/bin/env python3
+"""Software model of the OpenMoverPlatform firmware for tests and benchmarks.
+
+`DeviceSimulator` mirrors `serialManager.cpp` on the USB serial path:
+
+- intents 1-14 with the same reply shapes (compact `serializeJson` output,
+  no trailing newline),
+- the `coordinateTable[100]` layout `[count, speed, range, lon1, lat1, ...]`
+  written by intent 5 and returned by intent 1,
+- the `motorHandled` / `directMotorControlSerial` state machine, including
+  intent 3 deleting the running motor task,
+- `wpManagerExec`, `executePlainGoTo` (the `goTo` tank-steering law) and
+  `calibrateMag` as tasks on a virtual clock,
+- GPS fixes sampled every `GPSInterval` from a kinematic model of the robot,
+- `deserializeJson() failed:` followed by an emergency stop on bad input,
+- the binary wire encoding (intent 11, see `wirecodec`) and pushed
+  intent 6/9 streams (intent 12), emitted from `poll()`,
+- the stored hard/soft-iron fit (intent 13, see `magcal`),
+- the route fingerprint and header update (intent 14),
+- request ids: a request's `id` is echoed in its reply (in `seq` for
+  binary frames).
+
+The model runs on virtual time, so thousands of commands per second can be
+pushed through it. It can be used in-process through `SimulatedSerial`
+(a pyserial-like port object that `transport.Transport` accepts) or served
+over TCP (`socket://host:port`, what the GUI's raw socket option expects)
+or a pty:
+
+    python simulator.py --tcp 9000
+    python simulator.py --pty
+"""
+import json
+import math
+import os
+import random
+import select
+import socket
+import threading
+import time
+from collections import deque
+
+import wirecodec
+
+# values from include/config.h and the firmware tasks
+GPS_INTERVAL = 0.920            # GPSInterval
+MAG_CALIBRATION_SPEED = 20      # MagCalibrationSpeed
+TABLE_SIZE = 100                # coordinateTable[100]
+GOTO_PERIOD = 0.5               # vTaskDelay(500) in goTo
+GPS_STALE_AGE = 2.0             # gps.location.age() > 2000 in goTo
+CALIBRATION_PERIOD = 0.02       # vTaskDelay(20) in calibrateMag
+BATTERY_ADC_SCALE = 0.003223443223443
+MAX_STREAM_RATE = 50            # MaxStreamRate
+PROTOCOL_VERSION = 5            # PROTOCOL_VERSION
+
+EARTH_MEAN_RADIUS = 6371009.0   # TinyGPSPlus _GPS_EARTH_MEAN_RADIUS
+
+# kinematic model of the drive units
+WHEEL_SPEED_PER_UNIT = 0.01     # m/s per setpoint unit (100 -> 1 m/s)
+TRACK_WIDTH = 0.45              # m between the tracks
+PHYSICS_STEP = 0.05             # s, integration step
+
+
+def distance_between(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres, as `TinyGPSPlus::distanceBetween`."""
+    delta = math.radians(lon1 - lon2)
+    sdlong = math.sin(delta)
+    cdlong = math.cos(delta)
+    lat1 = math.radians(lat1)
+    lat2 = math.radians(lat2)
+    slat1 = math.sin(lat1)
+    clat1 = math.cos(lat1)
+    slat2 = math.sin(lat2)
+    clat2 = math.cos(lat2)
+    delta = (clat1 * slat2) - (slat1 * clat2 * cdlong)
+    delta = math.sqrt(delta * delta + (clat2 * sdlong) ** 2)
+    denom = (slat1 * slat2) + (clat1 * clat2 * cdlong)
+    return math.atan2(delta, denom) * EARTH_MEAN_RADIUS
+
+
+def course_to(lat1, lon1, lat2, lon2):
+    """Initial course in degrees (0 = north), as `TinyGPSPlus::courseTo`."""
+    dlon = math.radians(lon2 - lon1)
+    lat1 = math.radians(lat1)
+    lat2 = math.radians(lat2)
+    a1 = math.sin(dlon) * math.cos(lat2)
+    a2 = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
+    a2 = math.atan2(a1, a2)
+    if a2 < 0.0:
+        a2 += 2 * math.pi
+    return math.degrees(a2)
+
+
+def steer(course_error, speed):
+    """Tank-steering split used by `goTo`. Returns (left, right) setpoints."""
+    if course_error > 180:
+        course_error -= 360
+    if course_error < -180:
+        course_error += 360
+    left = right = speed
+    if course_error > 0:
+        right = speed - int(abs(course_error) / 180.0 * speed)
+    elif course_error < 0:
+        left = speed - int(abs(course_error) / 180.0 * speed)
+    return min(max(left, 0), 100), min(max(right, 0), 100)
+
+
+def _number(value, default=0.0):
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    return default
+
+
+def _dumps(obj):
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+class DeviceSimulator:
+    """Firmware model driven by bytes in, bytes out.
+
+    `clock` is a callable returning seconds (default `time.monotonic`); the
+    model advances `time_scale` virtual seconds per clock second. Pass
+    `clock=None` to drive time only through `advance()`.
+    """
+
+    def __init__(self, lat=48.137154, lon=11.576124, heading=0.0, clock=time.monotonic,
+                 time_scale=1.0, mag_offset=(35.0, -20.0), mag_field=250.0,
+                 mag_noise=0.5, mag_calibrated=True, mag_soft_iron=None, motor_gain=(1.0, 1.0),
+                 seed=None):
+        self.clock = clock
+        self.time_scale = time_scale
+        self._clock_start = clock() if clock else 0.0
+        self.now = 0.0
+        self._rng = random.Random(seed)
+        self._framer = wirecodec.WireFramer()
+        self._output = bytearray()
+        self._lock = threading.RLock()
+        self.halted = False
+
+        # serialManager state
+        self.coordinate_table = [0.0] * TABLE_SIZE
+        self.motor_handled = False
+        self.direct_motor_control = False
+        self.binary_wire = False
+        self._streams = {}              # intent -> [period, next push]
+        self._request_id = 0            # requestId of the command being handled
+        self._task = None
+        self._task_wake = 0.0
+
+        # motorSet state
+        self.bias_l = 1.0
+        self.bias_r = 1.0
+        self.set_point_l = 0
+        self.set_point_r = 0
+        self.motor_gain = motor_gain
+
+        # kinematic state: true pose
+        self.lat = lat
+        self.lon = lon
+        self.heading = heading % 360.0
+
+        # GPS as seen by TinyGPSPlus
+        self.num_sats = 9
+        self.fix = True
+        self.gps_lat = lat
+        self.gps_lon = lon
+        self._last_fix = 0.0
+        self._next_gps = GPS_INTERVAL
+
+        # magnetometer: raw reading = offset - S @ field * (sin h, cos h),
+        # S the 2x2 soft-iron distortion (row major, identity by default)
+        self.mag_offset = mag_offset
+        self.mag_field = mag_field
+        self.mag_noise = mag_noise
+        self.mag_soft_iron = tuple(mag_soft_iron) if mag_soft_iron else (1.0, 0.0, 0.0, 1.0)
+        # fit installed by intent 13 (MagFitActive, MagOffsetX/Y, MagSoftIron)
+        self.mag_fit = False
+        self.mag_fit_offset = (0.0, 0.0)
+        self.mag_fit_matrix = (1.0, 0.0, 0.0, 1.0)
+        if mag_calibrated:
+            self.mag_x_min = mag_offset[0] - mag_field
+            self.mag_x_max = mag_offset[0] + mag_field
+            self.mag_y_min = mag_offset[1] - mag_field
+            self.mag_y_max = mag_offset[1] + mag_field
+        else:
+            self.mag_x_min = self.mag_x_max = 0.0
+            self.mag_y_min = self.mag_y_max = 0.0
+
+        self.battery_adc = 3900
+
+    # -- byte interface ---------------------------------------------------
+
+    def handle(self, data):
+        """Feed bytes written by the host; returns the bytes written back."""
+        with self._lock:
+            self.sync()
+            if not self.halted:
+                for msg in self._framer.feed(data):
+                    if self.halted:
+                        break
+                    if isinstance(msg, dict):
+                        self._dispatch(msg)
+                    else:
+                        self._println("deserializeJson() failed: InvalidInput")
+                        self._emergency_stop()
+            self._push_streams()
+            return self._drain()
+
+    def poll(self):
+        """Advance to the current clock time; returns any unsolicited output."""
+        with self._lock:
+            self.sync()
+            self._push_streams()
+            return self._drain()
+
+    def sync(self):
+        if self.clock is not None:
+            self._advance_to((self.clock() - self._clock_start) * self.time_scale)
+
+    def advance(self, seconds):
+        """Advance virtual time by `seconds` (used when `clock` is None)."""
+        with self._lock:
+            self._advance_to(self.now + seconds)
+
+    def _drain(self):
+        out = bytes(self._output)
+        self._output.clear()
+        return out
+
+    def _write(self, obj):
+        self._output += _dumps(obj)
+
+    def _reply(self, intent, obj, value=None):
+        if self.binary_wire:
+            self._output += wirecodec.encode_reply(intent, obj if value is None else value,
+                                                   self._request_id & 0xFF)
+        else:
+            self._answer(obj)
+
+    def _answer(self, obj):
+        """Write a JSON reply, echoing the request id."""
+        if self._request_id:
+            obj = dict(obj, id=self._request_id)
+        self._write(obj)
+
+    def _println(self, text):
+        self._output += text.encode('utf-8') + b'\r\n'
+
+    def _emergency_stop(self):
+        self._println("Emergency Stop")
+        self._set_motors(0, 0)
+        self._task = None
+        self.halted = True
+
+    # -- intent handling (serialManager) ----------------------------------
+
+    def _dispatch(self, doc):
+        intent = doc.get("intent")
+        intent = int(intent) if isinstance(intent, (int, float)) and not isinstance(intent, bool) else 0
+        handler = self._handlers.get(intent)
+        if handler is None:
+            self._emergency_stop()
+            return
+        # doc["id"].as<uint32_t>()
+        request_id = doc.get("id")
+        valid = isinstance(request_id, (int, float)) and not isinstance(request_id, bool)
+        self._request_id = int(request_id) if valid and 0 <= request_id <= 0xFFFFFFFF else 0
+        try:
+            handler(self, doc)
+        finally:
+            self._request_id = 0
+
+    def _intent_1(self, doc):
+        self._reply(1, {"coordinates": self.coordinate_table}, self.coordinate_table)
+
+    def _intent_2(self, doc):
+        if not self.motor_handled:
+            self._start_task(self._wp_manager_exec(list(self.coordinate_table)))
+
+    def _intent_3(self, doc):
+        self._task = None
+        status = bool(doc.get("setStatus", False))
+        self.motor_handled = status
+        self.direct_motor_control = status
+        self._set_motors(0, 0)
+
+    def _intent_4(self, doc):
+        if self.motor_handled and self.direct_motor_control:
+            self._set_motors(int(_number(doc.get("leftPWM"))), int(_number(doc.get("rightPWM"))))
+
+    def _intent_5(self, doc):
+        coords = doc.get("coordinates")
+        if isinstance(coords, list):
+            for i, value in enumerate(coords[:TABLE_SIZE]):
+                self.coordinate_table[i] = _number(value)
+
+    def _intent_6(self, doc):
+        status = self.status()
+        if not self.binary_wire:
+            status["protocol"] = PROTOCOL_VERSION
+        self._reply(6, status)
+
+    def _intent_7(self, doc):
+        params = [_number(doc.get(k)) for k in ("lat", "lon", "speed", "range")]
+        if not self.motor_handled:
+            self._start_task(self._execute_plain_goto(*params))
+
+    def _intent_8(self, doc):
+        if not self.motor_handled:
+            self._start_task(self._calibrate_mag())
+
+    def _intent_9(self, doc):
+        mag_x, mag_y = self.read_mag()
+        self._reply(9, {
+            "magXMin": self.mag_x_min,
+            "magXMax": self.mag_x_max,
+            "magYMin": self.mag_y_min,
+            "magYMax": self.mag_y_max,
+            "magX": mag_x,
+            "magY": mag_y,
+        })
+
+    def _intent_10(self, doc):
+        self.bias_l = _number(doc.get("biasL"))
+        self.bias_r = _number(doc.get("biasR"))
+
+    def _intent_11(self, doc):
+        self.binary_wire = doc.get("wire") == wirecodec.WIRE_VERSION
+        self._answer({"wire": wirecodec.WIRE_VERSION if self.binary_wire else 0})
+
+    def _intent_12(self, doc):
+        rate = min(max(_number(doc.get("rate")), 0.0), MAX_STREAM_RATE)
+        stream = int(_number(doc.get("stream")))
+        if stream in (6, 9):
+            if rate > 0:
+                self._streams[stream] = [int(1000.0 / rate) / 1000.0, self.now]
+            else:
+                self._streams.pop(stream, None)
+
+    def _push_streams(self):
+        if self.halted:
+            return
+        for intent, stream in sorted(self._streams.items()):
+            period, due = stream
+            if self.now >= due:
+                stream[1] = self.now + period
+                self._handlers[intent](self, None)
+
+    def _intent_13(self, doc):
+        matrix = doc.get("matrix")
+        if doc.get("reset") is True:
+            self._clear_mag_fit()
+        elif isinstance(matrix, list) and len(matrix) == 4:
+            self.mag_fit = True
+            self.mag_fit_offset = (_number(doc.get("offsetX")), _number(doc.get("offsetY")))
+            self.mag_fit_matrix = tuple(_number(v) for v in matrix)
+        self._answer({
+            "magFit": self.mag_fit,
+            "offsetX": self.mag_fit_offset[0],
+            "offsetY": self.mag_fit_offset[1],
+            "matrix": list(self.mag_fit_matrix),
+        })
+
+    def _intent_14(self, doc):
+        for i, key in ((1, "speed"), (2, "range")):
+            value = doc.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.coordinate_table[i] = float(value)
+        self._answer({
+            "routeHash": wirecodec.route_hash(self.coordinate_table),
+            "count": int(self.coordinate_table[0]),
+            "speed": self.coordinate_table[1],
+            "range": self.coordinate_table[2],
+        })
+
+    def _clear_mag_fit(self):
+        self.mag_fit = False
+        self.mag_fit_offset = (0.0, 0.0)
+        self.mag_fit_matrix = (1.0, 0.0, 0.0, 1.0)
+
+    _handlers = {
+        1: _intent_1, 2: _intent_2, 3: _intent_3, 4: _intent_4, 5: _intent_5,
+        6: _intent_6, 7: _intent_7, 8: _intent_8, 9: _intent_9, 10: _intent_10,
+        11: _intent_11, 12: _intent_12, 13: _intent_13, 14: _intent_14,
+    }
+
+    def status(self):
+        """The intent 6 reply for the current state."""
+        return {
+            "batteryVoltage": self.battery_adc * BATTERY_ADC_SCALE,
+            "numSats": self.num_sats,
+            "fix": self.fix,
+            "locationAge": int((self.now - self._last_fix) * 1000),
+            "lat": self.gps_lat,
+            "lon": self.gps_lon,
+            "heading": self.get_heading(),
+            "serialControl": self.direct_motor_control,
+            "motorHandled": self.motor_handled,
+            "magXMin": self.mag_x_min,
+            "magXMax": self.mag_x_max,
+            "magYMin": self.mag_y_min,
+            "magYMax": self.mag_y_max,
+            "setPointL": self.set_point_l,
+            "setPointR": self.set_point_r,
+        }
+
+    # -- sensors (compass.cpp) --------------------------------------------
+
+    def read_mag(self):
+        h = math.radians(self.heading)
+        noise = self.mag_noise
+        fx = self.mag_field * math.sin(h)
+        fy = self.mag_field * math.cos(h)
+        s = self.mag_soft_iron
+        x = self.mag_offset[0] - (s[0] * fx + s[1] * fy) + self._rng.gauss(0, noise)
+        y = self.mag_offset[1] - (s[2] * fx + s[3] * fy) + self._rng.gauss(0, noise)
+        return x, y
+
+    def get_heading(self):
+        x, y = self.read_mag()
+        dx = x - (self.mag_x_min + (self.mag_x_max - self.mag_x_min) / 2)
+        dy = y - (self.mag_y_min + (self.mag_y_max - self.mag_y_min) / 2)
+        if self.mag_fit:
+            w = self.mag_fit_matrix
+            x -= self.mag_fit_offset[0]
+            y -= self.mag_fit_offset[1]
+            dx, dy = w[0] * x + w[1] * y, w[2] * x + w[3] * y
+        heading = math.atan2(-dx, -dy)
+        if heading < 0:
+            heading += 2 * math.pi
+        return math.degrees(heading)
+
+    # -- motor tasks -------------------------------------------------------
+
+    def _set_motors(self, left, right):
+        self.set_point_l = left
+        self.set_point_r = right
+
+    def _start_task(self, task):
+        self.motor_handled = True
+        self._task = task
+        self._task_wake = self.now
+        self._run_task()
+
+    def _run_task(self):
+        """Run the motor task until it sleeps or finishes (endMotorTask)."""
+        task = self._task
+        try:
+            delay = next(task)
+        except StopIteration:
+            if self._task is task:
+                self._set_motors(0, 0)
+                self.motor_handled = False
+                self._task = None
+            return
+        self._task_wake = self.now + delay
+
+    def _wp_manager_exec(self, table):
+        count = int(table[0])
+        speed = table[1]
+        rng = table[2]
+        if 1 < count < 50:
+            for i in range(count):
+                lon = table[3 + i * 2] if 3 + i * 2 < TABLE_SIZE else 0.0
+                lat = table[4 + i * 2] if 4 + i * 2 < TABLE_SIZE else 0.0
+                yield from self._goto(lat, lon, int(speed), rng)
+
+    def _execute_plain_goto(self, lat, lon, speed, rng):
+        yield from self._goto(lat, lon, int(speed), rng)
+
+    def _goto(self, lat, lon, speed, rng):
+        while self.motor_handled:
+            if not self.fix:
+                self._set_motors(0, 0)
+                return False
+            while self.now - self._last_fix > GPS_STALE_AGE:
+                self._set_motors(0, 0)
+                yield 1.0
+            if distance_between(self.gps_lat, self.gps_lon, lat, lon) <= rng:
+                self._set_motors(0, 0)
+                return True
+            course = course_to(self.gps_lat, self.gps_lon, lat, lon)
+            self._set_motors(*steer(course - self.get_heading(), speed))
+            yield GOTO_PERIOD
+        return False
+
+    def _calibrate_mag(self):
+        self._clear_mag_fit()
+        x, y = self.read_mag()
+        self.mag_x_max, self.mag_x_min = x + 0.1, x
+        self.mag_y_max, self.mag_y_min = y + 0.1, y
+        self._set_motors(MAG_CALIBRATION_SPEED, -MAG_CALIBRATION_SPEED)
+        while self.motor_handled:
+            x, y = self.read_mag()
+            self.mag_x_max = max(self.mag_x_max, x)
+            self.mag_x_min = min(self.mag_x_min, x)
+            self.mag_y_max = max(self.mag_y_max, y)
+            self.mag_y_min = min(self.mag_y_min, y)
+            yield CALIBRATION_PERIOD
+
+    # -- physics -----------------------------------------------------------
+
+    def _advance_to(self, target):
+        while self.now < target:
+            events = [target, self._next_gps]
+            if self._task is not None:
+                events.append(self._task_wake)
+            until = min(events)
+            if self.set_point_l == 0 and self.set_point_r == 0:
+                self.now = until
+            while self.now < until:
+                step = min(PHYSICS_STEP, until - self.now)
+                self._integrate(step)
+                self.now += step
+            if self.now >= self._next_gps:
+                self._gps_update()
+            if self._task is not None and self.now >= self._task_wake:
+                self._run_task()
+
+    def _integrate(self, dt):
+        vl = self.set_point_l * self.bias_l * self.motor_gain[0] * WHEEL_SPEED_PER_UNIT
+        vr = self.set_point_r * self.bias_r * self.motor_gain[1] * WHEEL_SPEED_PER_UNIT
+        if vl == 0 and vr == 0:
+            return
+        v = (vl + vr) / 2
+        self.heading = (self.heading + math.degrees((vl - vr) / TRACK_WIDTH * dt)) % 360.0
+        h = math.radians(self.heading)
+        north = v * math.cos(h) * dt
+        east = v * math.sin(h) * dt
+        self.lat += math.degrees(north / EARTH_MEAN_RADIUS)
+        self.lon += math.degrees(east / (EARTH_MEAN_RADIUS * math.cos(math.radians(self.lat))))
+
+    def _gps_update(self):
+        self.gps_lat = self.lat
+        self.gps_lon = self.lon
+        self._last_fix = self.now
+        self._next_gps = self.now + GPS_INTERVAL
+
+
+class SimulatedSerial:
+    """pyserial-like port connected to a `DeviceSimulator` in-process.
+
+    With `baudrate` set, each write is delayed by the time its bytes and the
+    reply would take on an 8N1 line, so round trips include wire time.
+    With `latency` set, replies become readable that many seconds after the
+    write (USB polling, the firmware loop delay) without holding up further
+    writes, as on a real link.
+    """
+
+    def __init__(self, sim=None, timeout=1, baudrate=None, latency=0.0):
+        self.sim = sim or DeviceSimulator()
+        self.timeout = timeout
+        self.baudrate = baudrate
+        self.latency = latency
+        self.port = "sim://"
+        self.is_open = True
+        self._rx = bytearray()
+        self._delayed = deque()         # (due, bytes) replies still on their way
+        self._cond = threading.Condition()
+
+    @property
+    def in_waiting(self):
+        self._poll()
+        with self._cond:
+            self._arrive()
+            return len(self._rx)
+
+    def write(self, data):
+        out = self.sim.handle(bytes(data))
+        if self.baudrate:
+            time.sleep((len(data) + len(out)) * 10 / self.baudrate)
+        with self._cond:
+            if self.latency:
+                self._delayed.append((time.monotonic() + self.latency, out))
+            else:
+                self._rx += out
+            self._cond.notify_all()
+        return len(data)
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._cond:
+            while self.is_open:
+                self._arrive()
+                if not self._rx:
+                    self._rx += self.sim.poll()
+                if self._rx:
+                    data = bytes(self._rx[:size])
+                    del self._rx[:size]
+                    return data
+                remaining = 0.01 if deadline is None else deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait = min(remaining, 0.01)
+                if self._delayed:
+                    wait = min(wait, max(self._delayed[0][0] - time.monotonic(), 0))
+                self._cond.wait(wait)
+        return b''
+
+    def _arrive(self):
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            self._rx += self._delayed.popleft()[1]
+
+    def close(self):
+        with self._cond:
+            self.is_open = False
+            self._cond.notify_all()
+
+    def _poll(self):
+        out = self.sim.poll()
+        if out:
+            with self._cond:
+                self._rx += out
+                self._cond.notify_all()
+
+
+def _pump(sim, fd_read, write, tick=0.01):
+    """Shuttle bytes between a file descriptor/socket and the simulator."""
+    while True:
+        ready, _, _ = select.select([fd_read], [], [], tick)
+        if ready:
+            data = fd_read.recv(4096) if isinstance(fd_read, socket.socket) else os.read(fd_read, 4096)
+            if not data:
+                return
+            out = sim.handle(data)
+        else:
+            out = sim.poll()
+        if out:
+            write(out)
+
+
+def serve_tcp(sim, host="localhost", port=9000):
+    """Serve the simulator as a raw socket endpoint, one client at a time."""
+    server = socket.create_server((host, port))
+    print(f"Simulator listening on socket://{host}:{port}")
+    with server:
+        while True:
+            conn, addr = server.accept()
+            print(f"Client connected from {addr[0]}:{addr[1]}")
+            with conn:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                try:
+                    _pump(sim, conn, conn.sendall)
+                except OSError:
+                    pass
+            print("Client disconnected")
+
+
+def serve_pty(sim):
+    """Serve the simulator on a pseudo terminal (POSIX only)."""
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    print(f"Simulator on {os.ttyname(slave)}")
+    try:
+        _pump(sim, master, lambda data: os.write(master, data))
+    finally:
+        os.close(master)
+        os.close(slave)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="OpenMoverPlatform device simulator")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--tcp", type=int, metavar="PORT", help="serve on socket://HOST:PORT (default 9000)")
+    group.add_argument("--pty", action="store_true", help="serve on a pseudo terminal")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--lat", type=float, default=48.137154)
+    parser.add_argument("--lon", type=float, default=11.576124)
+    parser.add_argument("--time-scale", type=float, default=1.0, help="virtual seconds per real second")
+    parser.add_argument("--uncalibrated", action="store_true", help="start with zeroed compass calibration")
+    args = parser.parse_args()
+
+    sim = DeviceSimulator(lat=args.lat, lon=args.lon, time_scale=args.time_scale,
+                          mag_calibrated=not args.uncalibrated)
+    try:
+        if args.pty:
+            serve_pty(sim)
+        else:
+            serve_tcp(sim, args.host, args.tcp or 9000)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
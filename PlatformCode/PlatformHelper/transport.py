@@ -0,0 +1,503 @@
+"""Shared serial transport for the helper tools.
+
+A `Transport` owns the port and a dedicated reader thread. Incoming bytes
+are framed by a `JsonFramer` the moment an object's closing brace arrives,
+and replies to intent 1, 6 and 9 are handed to the caller waiting for
+them through a `concurrent.futures.Future`, so several threads (e.g. the
+GUI status and magnetometer loops) can share one connection without
+stealing each other's replies and without sleep-polling the port.
+
+Every request is sent with an `id` (1-255) that firmware from protocol 4
+on echoes in its reply, so replies are matched to their request even
+when several are in flight or one arrives after its caller gave up.
+Replies without an id (older firmware) are matched by their shape (see
+`classify_reply`) in FIFO order per intent. `Pipeline` keeps a window of
+requests in flight and records their latencies.
+
+The reader understands both JSON and the binary frames of `wirecodec`;
+`negotiate()` switches a capable device (and `send()` for intent 5) to
+the binary encoding.
+
+`subscribe()` asks the firmware to push intent 6 or 9 replies at a fixed
+rate (intent 12) and hands them to a callback or iterator; `stream()`
+yields samples at a rate and falls back to polling on older firmware.
+"""
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import wirecodec
+
+# intents the firmware answers
+REPLY_INTENTS = (1, 6, 9, 11, 13, 14)
+# intents the firmware can push periodically (intent 12)
+STREAM_INTENTS = (6, 9)
+
+# `protocol` announced in the JSON status reply; absent on older firmware,
+# which treats the newer intents as unknown and stops the robot
+PROTOCOL_WIRE = 1       # intent 11
+PROTOCOL_STREAMS = 2    # intent 12
+PROTOCOL_MAGCAL = 3     # intent 13
+PROTOCOL_IDS = 4        # `id` echoed in replies
+PROTOCOL_FINGERPRINT = 5  # intent 14
+
+# request ids fit the `seq` byte of binary frames
+MAX_REQUEST_ID = 255
+
+
+def classify_reply(obj):
+    """Return the intent (1, 6, 9, 11, 13 or 14) a device reply answers, or None."""
+    if not isinstance(obj, dict):
+        return None
+    if "coordinates" in obj:
+        return 1
+    if "batteryVoltage" in obj:
+        return 6
+    if "magX" in obj:
+        return 9
+    if "wire" in obj:
+        return 11
+    if "magFit" in obj:
+        return 13
+    if "routeHash" in obj:
+        return 14
+    return None
+
+
+def open_port(port, baudrate=115200, timeout=1):
+    """Open a serial port by device name or pyserial URL.
+
+    Besides plain device names (COM3, /dev/ttyUSB0) this accepts
+    `socket://host:port` (raw socket, e.g. Wokwi or `broker.py`),
+    `rfc2217://host:port` and `unix:///path` (a `broker.py` Unix socket).
+    """
+    if port.startswith("unix://"):
+        from broker import UnixSocketPort
+        return UnixSocketPort(port[len("unix://"):], timeout=timeout)
+    import serial
+    return serial.serial_for_url(port, baudrate=baudrate, timeout=timeout)
+
+
+class Subscription:
+    """Replies of one pushed stream (intent 6 or 9), see `Transport.subscribe`.
+
+    Without a callback, messages are queued for `get()` or iteration; only
+    the newest `maxlen` are kept if the consumer falls behind. Iteration
+    ends when the subscription is closed.
+    """
+
+    def __init__(self, link, stream, rate, callback=None, maxlen=256):
+        self.link = link
+        self.stream = stream
+        self.rate = rate
+        self.callback = callback
+        self.closed = False
+        self._queue = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+
+    def get(self, timeout=None):
+        """Return the next message, or None on timeout or when closed."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._queue and not self.closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._queue.popleft() if self._queue else None
+
+    def __iter__(self):
+        while True:
+            msg = self.get()
+            if msg is None:
+                return
+            yield msg
+
+    def set_rate(self, rate):
+        """Change the rate; the device pushes at the highest rate any subscriber wants."""
+        self.rate = rate
+        self.link._update_stream(self.stream)
+
+    def close(self):
+        """Unsubscribe; the device stops pushing when no one else listens."""
+        self.link.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _deliver(self, msg):
+        if self.callback is not None:
+            self.callback(msg)
+            return
+        with self._cond:
+            self._queue.append(msg)
+            self._cond.notify()
+
+    def _close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class Transport:
+    """Single-reader JSON transport shared by all callers of one port."""
+
+    def __init__(self, port):
+        self.port = port
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending = {intent: deque() for intent in REPLY_INTENTS}
+        self._by_id = {}
+        self._next_id = 0
+        self._listeners = []
+        self._subscriptions = {stream: [] for stream in STREAM_INTENTS}
+        self._stream_rates = {}
+        self._stream_lock = threading.Lock()
+        self._protocol = None
+        self._framer = wirecodec.WireFramer()
+        self.binary = False
+        self._running = True
+        self._thread = threading.Thread(target=self._reader, name="transport-reader", daemon=True)
+        self._thread.start()
+
+    @property
+    def name(self):
+        return getattr(self.port, "port", None) or str(self.port)
+
+    def write(self, data):
+        """Write raw bytes to the port."""
+        with self._write_lock:
+            self.port.write(data)
+
+    def send(self, obj):
+        """Encode `obj` and send it. Returns the bytes written.
+
+        Commands go out as JSON unless binary encoding was negotiated and
+        the command has a binary form (intent 5).
+        """
+        data = wirecodec.encode_request(obj) if self.binary else None
+        if data is None:
+            data = json.dumps(obj).encode("utf-8")
+        self.write(data)
+        return data
+
+    def negotiate(self, binary=True, timeout=2.0):
+        """Switch the device's replies to the binary encoding (or back).
+
+        Older firmware treats intent 11 as unknown and stops the robot, so
+        the protocol version is checked first. Returns True if the
+        requested encoding is now active.
+        """
+        if binary and not self.binary and self.protocol(timeout) < PROTOCOL_WIRE:
+            return False
+        wire = wirecodec.WIRE_VERSION if binary else 0
+        reply = self.request({"intent": 11, "wire": wire}, timeout=timeout)
+        if reply is None or reply.get("wire") != wire:
+            return False
+        self.binary = binary
+        return True
+
+    def protocol(self, timeout=2.0):
+        """Protocol version announced by the firmware (0 for older firmware).
+
+        Asks for a status reply the first time; call before switching to
+        the binary encoding, whose status carries no version.
+        """
+        if self._protocol is None:
+            status = self.request({"intent": 6}, timeout=timeout)
+            if status is None:
+                return 0
+            self._protocol = status.get("protocol", 0)
+        return self._protocol
+
+    def subscribe(self, stream, rate, callback=None, maxlen=256, timeout=2.0):
+        """Have the device push `stream` (6 or 9) replies at `rate` Hz.
+
+        Returns a `Subscription`. `callback(msg)`, if given, runs on the
+        reader thread. Several subscriptions to one stream share it at the
+        highest requested rate. Raises RuntimeError if the firmware has no
+        stream support.
+        """
+        if stream not in STREAM_INTENTS:
+            raise ValueError(f"intent {stream} cannot be streamed")
+        if self.protocol(timeout) < PROTOCOL_STREAMS:
+            raise RuntimeError("the firmware does not support pushed telemetry (intent 12)")
+        subscription = Subscription(self, stream, rate, callback, maxlen)
+        with self._lock:
+            self._subscriptions[stream].append(subscription)
+        self._update_stream(stream)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions[subscription.stream]
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+        subscription._close()
+        self._update_stream(subscription.stream)
+
+    def stream(self, intent, rate, timeout=None):
+        """Yield intent 6 or 9 replies at `rate` Hz until the caller stops.
+
+        Uses a pushed subscription when the firmware supports it and
+        request/sleep polling otherwise. Yields None when nothing arrived
+        within `timeout` (default two periods, at least one second).
+        """
+        period = 1.0 / rate
+        if timeout is None:
+            timeout = max(2 * period, 1.0)
+        if self.protocol() >= PROTOCOL_STREAMS:
+            with self.subscribe(intent, rate) as subscription:
+                while not subscription.closed:
+                    yield subscription.get(timeout)
+            return
+        request = {"intent": intent}
+        due = time.monotonic()
+        while self._running:
+            yield self.request(request, timeout=timeout)
+            due += period
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                due = time.monotonic()
+
+    def _update_stream(self, stream):
+        with self._stream_lock:
+            with self._lock:
+                rate = max((s.rate for s in self._subscriptions[stream]), default=0)
+            if rate != self._stream_rates.get(stream, 0) and self._running:
+                self._stream_rates[stream] = rate
+                self.send({"intent": 12, "stream": stream, "rate": rate})
+
+    def request_async(self, obj):
+        """Send `obj` and return a Future resolved with the matching reply.
+
+        `obj` goes out with a fresh `id` (any `id` it has is replaced);
+        `future.request_id` holds it. Cancelling the Future gives up on the
+        reply.
+        """
+        intent = obj.get("intent")
+        if intent not in self._pending:
+            raise ValueError(f"intent {intent} has no reply")
+        future = Future()
+        future.add_done_callback(lambda f: f.cancelled() and self._discard(intent, f))
+        with self._lock:
+            future.request_id = self._allocate_id()
+            self._by_id[future.request_id] = future
+            self._pending[intent].append(future)
+        try:
+            self.send(dict(obj, id=future.request_id))
+        except Exception as e:
+            self._discard(intent, future)
+            future.set_exception(e)
+        return future
+
+    def request(self, obj, timeout=2.0):
+        """Send `obj` and block until its reply arrives.
+
+        Returns the parsed reply, or None if none arrived within `timeout`.
+        """
+        future = self.request_async(obj)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            self._discard(obj["intent"], future)
+            return None
+
+    def add_listener(self, callback):
+        """Call `callback(msg)` from the reader thread for every message.
+
+        `msg` is a decoded object, or a str for text that is not JSON
+        (e.g. the firmware's `deserializeJson() failed:` lines).
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def close(self):
+        """Stop any pushed streams, the reader thread and close the port."""
+        with self._lock:
+            subscriptions = [s for subs in self._subscriptions.values() for s in subs]
+        for subscription in subscriptions:
+            try:
+                subscription.close()
+            except Exception:
+                pass
+        self._running = False
+        try:
+            self.port.close()
+        except Exception:
+            pass
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        with self._lock:
+            pending = [f for queue in self._pending.values() for f in queue]
+            for queue in self._pending.values():
+                queue.clear()
+            self._by_id.clear()
+        for future in pending:
+            future.cancel()
+
+    def _allocate_id(self):
+        """Next request id not in flight (caller holds the lock)."""
+        for _ in range(MAX_REQUEST_ID):
+            self._next_id = self._next_id % MAX_REQUEST_ID + 1
+            if self._next_id not in self._by_id:
+                return self._next_id
+        raise RuntimeError(f"more than {MAX_REQUEST_ID} requests in flight")
+
+    def _discard(self, intent, future):
+        with self._lock:
+            if self._by_id.get(future.request_id) is future:
+                del self._by_id[future.request_id]
+            try:
+                self._pending[intent].remove(future)
+            except ValueError:
+                pass
+
+    def _reader(self):
+        while self._running:
+            try:
+                data = self.port.read(self.port.in_waiting or 1)
+            except Exception as e:
+                if self._running:
+                    self._notify(f"Read error: {e}")
+                break
+            if data:
+                for msg in self._framer.feed(data):
+                    self._dispatch(msg)
+
+    def _dispatch(self, msg):
+        future = None
+        intent = classify_reply(msg)
+        request_id = msg.get("id") if intent is not None else None
+        with self._lock:
+            queue = self._pending.get(intent)
+            if request_id is not None:
+                # an unknown id answers a request that was given up on
+                candidate = self._by_id.get(request_id)
+                if candidate is not None and candidate in queue:
+                    del self._by_id[request_id]
+                    queue.remove(candidate)
+                    if not candidate.done():
+                        future = candidate
+            elif (self._protocol or 0) < PROTOCOL_IDS:
+                # firmware without ids answers in order
+                while queue:
+                    candidate = queue.popleft()
+                    self._by_id.pop(candidate.request_id, None)
+                    if not candidate.done():
+                        future = candidate
+                        break
+            subscriptions = list(self._subscriptions.get(intent, ()))
+            listeners = list(self._listeners)
+        if future is not None:
+            future.set_result(msg)
+        for subscription in subscriptions:
+            try:
+                subscription._deliver(msg)
+            except Exception:
+                pass
+        for callback in listeners:
+            try:
+                callback(msg)
+            except Exception:
+                pass
+
+    def _notify(self, text):
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(text)
+            except Exception:
+                pass
+
+
+class Pipeline:
+    """Keep up to `window` requests in flight on a `Transport` and time them.
+
+    Requests are written back to back instead of waiting for each reply,
+    so a burst costs about one round trip plus its bytes on the wire.
+    Latency (send to reply, seconds) is recorded per intent in `latencies`.
+    The default window stays well inside the ESP32's 256 byte receive
+    buffer for status, magnetometer and coordinate requests.
+    """
+
+    def __init__(self, link, window=8):
+        self.link = link
+        self.window = window
+        self.latencies = {}
+        self._slots = threading.Semaphore(window)
+        self._lock = threading.Lock()
+
+    def submit(self, obj):
+        """Send `obj` once a slot is free; returns the reply Future.
+
+        `future.sent` is the `time.perf_counter()` at which it was sent.
+        """
+        self._slots.acquire()
+        return self._send(obj)
+
+    def run(self, requests, timeout=2.0):
+        """Send all `requests` pipelined; returns their replies in order.
+
+        A request unanswered after `timeout` seconds is given up (its
+        reply is None) and frees its slot.
+        """
+        futures = []
+        for obj in requests:
+            while not self._slots.acquire(timeout=timeout):
+                # all slots busy for `timeout`: the oldest request is overdue
+                oldest = next((f for f in futures if not f.done()), None)
+                if oldest is not None:
+                    oldest.cancel()
+            futures.append(self._send(obj))
+        replies = []
+        for future in futures:
+            try:
+                replies.append(future.result(max(future.sent + timeout - time.perf_counter(), 0)))
+            except FutureTimeout:
+                future.cancel()
+                replies.append(None)
+            except Exception:
+                replies.append(None)
+        return replies
+
+    def summary(self):
+        """{intent: (count, mean, median, p95, max)} of the latencies in milliseconds."""
+        out = {}
+        with self._lock:
+            items = [(intent, sorted(values)) for intent, values in self.latencies.items()]
+        for intent, values in sorted(items):
+            n = len(values)
+            out[intent] = (n, 1000 * sum(values) / n, 1000 * values[n // 2],
+                           1000 * values[min(int(n * 0.95), n - 1)], 1000 * values[-1])
+        return out
+
+    def _send(self, obj):
+        sent = time.perf_counter()
+        try:
+            future = self.link.request_async(obj)
+        except Exception:
+            self._slots.release()
+            raise
+        future.sent = sent
+        future.add_done_callback(lambda f: self._done(obj["intent"], f))
+        return future
+
+    def _done(self, intent, future):
+        self._slots.release()
+        if not future.cancelled() and future.exception() is None:
+            latency = time.perf_counter() - future.sent
+            with self._lock:
+                self.latencies.setdefault(intent, []).append(latency)
@@ -0,0 +1,276 @@
+"""Compact binary wire encoding for the bulky intents.
+
+JSON spends most of an intent 6 reply on key names and most of an intent 5
+upload on float text. After negotiation (intent 11, see
+`Transport.negotiate`) the firmware's USB serial path accepts intent 5 as
+a binary frame and answers intents 1, 6 and 9 with binary frames; every
+other command stays JSON. Frames and JSON can be mixed on one stream.
+
+Frame layout (little endian, matching `wireCodec.h`):
+
+    A5 5A | type u8 | seq u8 | length u16 | payload | CRC-16/CCITT-FALSE u16
+
+The CRC covers type through payload. `type` is the intent number; `seq`
+carries the low byte of the request `id` a reply answers (0 for none and
+for pushed replies, see `Transport.request_async`). Payloads are fixed
+struct layouts:
+
+- type 5 (host to device) and type 1 (device to host), a route:
+  count u8, speed f32, range f32, then count x (lon i32, lat i32) in 1e-7
+  degrees (about 1 cm). Intent 1 only carries the `count` valid pairs of
+  the table, not all 100 values.
+- type 6, status: batteryVoltage f32, numSats u8, flags u8 (bit 0 fix,
+  bit 1 serialControl, bit 2 motorHandled), locationAge u32, lat i32,
+  lon i32 (1e-7 degrees), heading f32, magXMin, magXMax, magYMin,
+  magYMax f32, setPointL i16, setPointR i16.
+- type 9, magnetometer: magXMin, magXMax, magYMin, magYMax, magX, magY f32.
+
+The firmware's fingerprint of its stored route (intent 14) is computed by
+`route_hash()` over the same E7 values.
+
+Decoded frames are returned as the same dicts the JSON encoding produces
+(with `id` set from a non-zero `seq`), so callers do not care which
+encoding is active.
+"""
+import math
+import struct
+from binascii import crc_hqx
+
+from jsonframer import JsonFramer
+
+WIRE_VERSION = 1
+
+MAGIC = b'\xa5\x5a'
+HEADER = struct.Struct('<2sBBH')
+CRC = struct.Struct('<H')
+MAX_PAYLOAD = 512
+
+TYPE_TABLE = 1
+TYPE_COORDINATES = 5
+TYPE_STATUS = 6
+TYPE_MAG = 9
+
+_ROUTE = struct.Struct('<Bff')
+_PAIR = struct.Struct('<ii')
+_STATUS = struct.Struct('<fBBIiif4fhh')
+_MAG = struct.Struct('<6f')
+
+_SCALE = 1e7
+# pairs that fit coordinateTable[100] after the three header values
+_MAX_PAIRS = (100 - 3) // 2
+_FNV_OFFSET = 0x811C9DC5
+_FNV_PRIME = 0x01000193
+_MAG_KEYS = ("magXMin", "magXMax", "magYMin", "magYMax")
+
+
+def crc16(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE, as `wireCrc16()` in the firmware."""
+    return crc_hqx(data, crc)
+
+
+def encode_frame(frame_type, payload, seq=0):
+    body = bytes((frame_type, seq)) + len(payload).to_bytes(2, 'little') + payload
+    return MAGIC + body + CRC.pack(crc16(body))
+
+
+def _e7(value):
+    return int(round(value * _SCALE))
+
+
+def _clamp(value, low, high):
+    return min(max(int(value), low), high)
+
+
+def encode_route(coordinates):
+    """Route payload for a `[count, speed, range, lon, lat, ...]` list.
+
+    Returns None if the list cannot be represented (count does not match
+    the pairs that follow, or more pairs than the device table holds).
+    """
+    if len(coordinates) < 3:
+        return None
+    count = coordinates[0]
+    pairs = (len(coordinates) - 3) // 2
+    if count != int(count) or int(count) != pairs or pairs > _MAX_PAIRS or len(coordinates) % 2 == 0:
+        return None
+    values = [_e7(v) for v in coordinates[3:]]
+    return _ROUTE.pack(pairs, coordinates[1], coordinates[2]) + struct.pack(f'<{len(values)}i', *values)
+
+
+def decode_route(payload):
+    count, speed, range_m = _ROUTE.unpack_from(payload)
+    if len(payload) != _ROUTE.size + count * _PAIR.size:
+        raise ValueError("route payload length does not match its count")
+    values = struct.unpack_from(f'<{2 * count}i', payload, _ROUTE.size)
+    return [count, speed, range_m] + [v / _SCALE for v in values]
+
+
+def _lround_e7(value):
+    """`lround(value * 1e7)`: halves round away from zero, unlike `_e7`."""
+    scaled = abs(value * _SCALE)
+    return int(math.copysign(math.floor(scaled + 0.5), value))
+
+
+def route_hash(table):
+    """FNV-1a 32 of a route's count and E7 pairs, as `wireRouteHash()`.
+
+    `table` is a `[count, speed, range, lon, lat, ...]` list or the whole
+    `coordinateTable`; speed and range are not part of the hash.
+    """
+    count = int(table[0])
+    pairs = count if 0 <= count and 3 + 2 * count <= len(table) else 0
+    values = [_lround_e7(v) for v in table[3:3 + 2 * pairs]]
+    h = _FNV_OFFSET
+    for byte in struct.pack(f'<{1 + len(values)}i', count, *values):
+        h = ((h ^ byte) * _FNV_PRIME) & 0xFFFFFFFF
+    return h
+
+
+def encode_table(table):
+    """Intent 1 payload for a full `coordinateTable`: header plus valid pairs."""
+    count = table[0]
+    valid = count == int(count) and 0 <= count <= _MAX_PAIRS and 3 + 2 * count <= len(table)
+    pairs = int(count) if valid else 0
+    values = [_e7(v) for v in table[3:3 + 2 * pairs]]
+    return (_ROUTE.pack(_clamp(count, 0, 255), table[1], table[2])
+            + struct.pack(f'<{len(values)}i', *values))
+
+
+def decode_table(payload):
+    count, speed, range_m = _ROUTE.unpack_from(payload)
+    pairs = (len(payload) - _ROUTE.size) // _PAIR.size
+    values = struct.unpack_from(f'<{2 * pairs}i', payload, _ROUTE.size)
+    return [count, speed, range_m] + [v / _SCALE for v in values]
+
+
+def encode_status(status):
+    flags = (bool(status["fix"]) | bool(status["serialControl"]) << 1
+             | bool(status["motorHandled"]) << 2)
+    return _STATUS.pack(
+        status["batteryVoltage"], _clamp(status["numSats"], 0, 255), flags,
+        _clamp(status["locationAge"], 0, 0xFFFFFFFF), _e7(status["lat"]), _e7(status["lon"]),
+        status["heading"], *(status[k] for k in _MAG_KEYS),
+        _clamp(status["setPointL"], -32768, 32767), _clamp(status["setPointR"], -32768, 32767))
+
+
+def decode_status(payload):
+    (battery, sats, flags, age, lat, lon, heading,
+     x_min, x_max, y_min, y_max, left, right) = _STATUS.unpack(payload)
+    return {
+        "batteryVoltage": battery,
+        "numSats": sats,
+        "fix": bool(flags & 1),
+        "locationAge": age,
+        "lat": lat / _SCALE,
+        "lon": lon / _SCALE,
+        "heading": heading,
+        "serialControl": bool(flags & 2),
+        "motorHandled": bool(flags & 4),
+        "magXMin": x_min,
+        "magXMax": x_max,
+        "magYMin": y_min,
+        "magYMax": y_max,
+        "setPointL": left,
+        "setPointR": right,
+    }
+
+
+def encode_mag(mag):
+    return _MAG.pack(*(mag[k] for k in _MAG_KEYS), mag["magX"], mag["magY"])
+
+
+def decode_mag(payload):
+    values = _MAG.unpack(payload)
+    return dict(zip(_MAG_KEYS + ("magX", "magY"), values))
+
+
+def encode_request(obj, seq=0):
+    """Binary frame for a host command, or None if it has no binary form."""
+    if obj.get("intent") != 5 or not isinstance(obj.get("coordinates"), list):
+        return None
+    payload = encode_route(obj["coordinates"])
+    return None if payload is None else encode_frame(TYPE_COORDINATES, payload, seq)
+
+
+_REPLY_ENCODERS = {TYPE_TABLE: encode_table, TYPE_STATUS: encode_status, TYPE_MAG: encode_mag}
+
+
+def encode_reply(intent, value, seq=0):
+    """Binary frame for the reply to `intent` (1: table, 6: status dict, 9: mag dict)."""
+    return encode_frame(intent, _REPLY_ENCODERS[intent](value), seq)
+
+
+def decode_payload(frame_type, payload):
+    """Decode a frame payload into the equivalent JSON message."""
+    if frame_type == TYPE_COORDINATES:
+        return {"intent": 5, "coordinates": decode_route(payload)}
+    if frame_type == TYPE_TABLE:
+        return {"coordinates": decode_table(payload)}
+    if frame_type == TYPE_STATUS:
+        return decode_status(payload)
+    if frame_type == TYPE_MAG:
+        return decode_mag(payload)
+    raise ValueError(f"unknown frame type {frame_type}")
+
+
+class WireFramer:
+    """`JsonFramer` that also recognises binary frames between objects.
+
+    `feed()` returns decoded messages in stream order: dicts for JSON
+    objects and valid frames, str for text. A magic sequence inside a JSON
+    object is object data; a frame with a bad length or CRC is passed on
+    byte by byte as text, so the stream resynchronises.
+    """
+
+    def __init__(self, max_payload=MAX_PAYLOAD):
+        self.max_payload = max_payload
+        self._json = JsonFramer()
+        self._buf = bytearray()
+
+    def feed(self, data) -> list:
+        buf = self._buf
+        buf += data
+        out = []
+        json = self._json
+        while buf:
+            start = buf.find(MAGIC[0])
+            if start == -1:
+                out += json.feed(buf)
+                buf.clear()
+                break
+            if start:
+                out += json.feed(buf[:start])
+                del buf[:start]
+            if not json.idle or buf[1:2] not in (b'', MAGIC[1:]):
+                # inside an object, or not a magic sequence
+                out += json.feed(buf[:1])
+                del buf[:1]
+                continue
+            if len(buf) < HEADER.size:
+                break
+            _, frame_type, seq, length = HEADER.unpack_from(buf)
+            if length > self.max_payload:
+                out += json.feed(buf[:1])
+                del buf[:1]
+                continue
+            end = HEADER.size + length + CRC.size
+            if len(buf) < end:
+                break
+            body = bytes(buf[2:HEADER.size + length])
+            if CRC.unpack_from(buf, end - CRC.size)[0] != crc16(body):
+                out += json.feed(buf[:1])
+                del buf[:1]
+                continue
+            del buf[:end]
+            try:
+                msg = decode_payload(frame_type, body[4:])
+                if seq:
+                    msg["id"] = seq
+                out.append(msg)
+            except (ValueError, struct.error):
+                out.append(f"Undecodable frame of type {frame_type}")
+        return out
+
+    def reset(self):
+        self._buf.clear()
+        self._json.reset()